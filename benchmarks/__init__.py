@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Benchmarks measure the working tree, not an installed copy of tinytune
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
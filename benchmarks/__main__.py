@@ -0,0 +1,63 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.cases import Cases
+
+
+def Revision() -> dict[str, object]:
+    root = Path(__file__).resolve().parent.parent
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True).stdout.strip())
+
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+
+    return {"commit": commit, "dirty": dirty}
+
+
+def Main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the tinytune benchmarks against local fake servers.")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run. All by default: {', '.join(Cases)}.")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations and smaller inputs.")
+    parser.add_argument("--output", "-o", help="File to write the JSON results to. Defaults to stdout.")
+    options = parser.parse_args()
+
+    unknown = [name for name in options.cases if name not in Cases]
+
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    report = {
+        **Revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "quick": options.quick,
+        "results": {},
+    }
+
+    for name in options.cases or Cases:
+        started = time.perf_counter()
+        report["results"][name] = {metric: round(value, 4) for metric, value in Cases[name](options.quick).items()}
+
+        print(f"{name}: {time.perf_counter() - started:.1f}s {report['results'][name]}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+
+    if options.output:
+        Path(options.output).write_text(output + "\n")
+    else:
+        print(output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(Main())
@@ -0,0 +1,501 @@
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from benchmarks.fakeserver import FakeServer
+
+from tinytune.contexts.openaicontext import ChatMessage, OpenAICompatibleContext
+from tinytune.llmcontext import Message
+from tinytune.memoize import Memoized
+from tinytune.pipeline import Pipeline
+from tinytune.prompt import prompt_job
+from tinytune.scheduler import RequestScheduler
+from tinytune.tool import ToolRegistry, tool
+
+
+# Registered benchmark cases by name, in the order they run
+Cases: dict[str, Callable[[bool], dict[str, float]]] = {}
+
+
+def benchmark(name: str):
+    """
+    Decorator registering a benchmark case. A case takes whether the run is quick and returns its
+    metrics. Metric names end in their unit: _ms, _us, _s and _bytes are lower-is-better, _per_s higher-is-better.
+
+    Parameters:
+    - name (str): The case name.
+    """
+    def wrapper(case: Callable[[bool], dict[str, float]]):
+        Cases[name] = case
+
+        return case
+
+    return wrapper
+
+
+def Context(server: FakeServer, **kwargs) -> OpenAICompatibleContext:
+    return OpenAICompatibleContext("fake", "fake", baseUrl=server.URL, **kwargs)
+
+
+def History(size: int) -> list[ChatMessage]:
+    return [ChatMessage("user" if index % 2 == 0 else "assistant", f"message {index} " + "lorem ipsum " * 8) for index in range(size)]
+
+
+def Median(samples: list[float]) -> float:
+    return statistics.median(samples)
+
+
+@benchmark("history_turns")
+def HistoryTurns(quick: bool) -> dict[str, float]:
+    """
+    Time of a turn on top of long histories, with a server that answers instantly.
+    """
+    metrics = {}
+    turns = 10 if quick else 30
+
+    with FakeServer(tokens=8) as server:
+        for size in (100, 1000) if quick else (100, 1000, 10000):
+            context = Context(server)
+            context.Messages = History(size)
+
+            # Warm up the connection and the history's wire cache
+            context.Prompt(ChatMessage("user", "warm up")).Run()
+
+            samples = []
+
+            for turn in range(turns):
+                started = time.perf_counter()
+                context.Prompt(ChatMessage("user", f"turn {turn}")).Run()
+                samples.append(time.perf_counter() - started)
+
+            metrics[f"turn_{size}_ms"] = Median(samples) * 1e3
+
+    return metrics
+
+
+@benchmark("message_memory")
+def MessageMemory(quick: bool) -> dict[str, float]:
+    """
+    Memory per message, before and after its wire dict is built, and serialization throughput.
+    Contents are shared, so only the messages themselves are measured.
+    """
+    count = 50000 if quick else 200000
+    content = "lorem ipsum " * 4
+
+    tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+    messages = [Message("user", content) for _ in range(count)]
+    created = tracemalloc.get_traced_memory()[0]
+
+    for message in messages:
+        message.ToDict()
+
+    serialized = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+
+    fresh = [Message("user", content) for _ in range(count)]
+
+    started = time.perf_counter()
+
+    for message in fresh:
+        message.ToDict()
+
+    first = time.perf_counter() - started
+
+    started = time.perf_counter()
+
+    for message in fresh:
+        dict(message.ToDict())
+
+    copies = time.perf_counter() - started
+
+    return {
+        "message_bytes": (created - before) / count,
+        "serialized_message_bytes": (serialized - before) / count,
+        "to_dict_per_s": count / first,
+        "dict_copy_per_s": count / copies,
+    }
+
+
+@benchmark("streaming")
+def Streaming(quick: bool) -> dict[str, float]:
+    """
+    Client-side streaming throughput against an unthrottled server, and time to first token and
+    token rate against a paced one.
+    """
+    metrics = {}
+    tokens = 512
+
+    with FakeServer(tokens=tokens) as server:
+        context = Context(server)
+        samples = []
+
+        for _ in range(3 if quick else 10):
+            started = time.perf_counter()
+            count = sum(1 for _ in context.Spawn().Stream(ChatMessage("user", "stream")))
+            samples.append(time.perf_counter() - started)
+
+        metrics["chunks_per_s"] = count / Median(samples)
+
+    with FakeServer(latency=0.05, tokenRate=500, tokens=100) as server:
+        context = Context(server)
+        firsts, rates = [], []
+
+        for _ in range(2 if quick else 5):
+            started = time.perf_counter()
+            first = None
+            count = 0
+
+            for _ in context.Spawn().Stream(ChatMessage("user", "stream")):
+                if first is None:
+                    first = time.perf_counter()
+
+                count += 1
+
+            ended = time.perf_counter()
+            firsts.append(first - started)
+            rates.append((count - 1) / (ended - first))
+
+        metrics["ttft_ms"] = Median(firsts) * 1e3
+        metrics["paced_tokens_per_s"] = Median(rates)
+
+    return metrics
+
+
+@benchmark("pipeline_fanout")
+def PipelineFanout(quick: bool) -> dict[str, float]:
+    """
+    Wall time of a graph pipeline with one root job and many jobs depending on it, each making a
+    50 ms request. The ideal is two request latencies.
+    """
+    metrics = {}
+    width = 8 if quick else 32
+    latency = 0.05
+
+    with FakeServer(latency=latency, tokens=8) as server:
+        context = Context(server)
+
+        def Build() -> Pipeline:
+            @prompt_job(id="root", context=context.Spawn())
+            def Root(id, context, prevResult, *args):
+                return context.Prompt(ChatMessage("user", "root")).Run().Top()
+
+            pipeline = Pipeline(context, maxWorkers=width)
+            pipeline.AddJob(Root)
+
+            for index in range(width):
+                @prompt_job(id=f"leaf-{index}", context=context.Spawn(), dependsOn=["root"])
+                def Leaf(id, context, prevResult, *args):
+                    return context.Prompt(ChatMessage("user", f"{id}: {prevResult.Content}")).Run().Top()
+
+                pipeline.AddJob(Leaf)
+
+            return pipeline
+
+        samples = []
+
+        for _ in range(2 if quick else 5):
+            pipeline = Build()
+            started = time.perf_counter()
+            pipeline.Run()
+            samples.append(time.perf_counter() - started)
+
+        metrics["graph_ms"] = Median(samples) * 1e3
+
+        samples = []
+
+        for _ in range(2 if quick else 5):
+            pipeline = Build()
+            started = time.perf_counter()
+            asyncio.run(pipeline.RunAsync())
+            samples.append(time.perf_counter() - started)
+
+        metrics["graph_async_ms"] = Median(samples) * 1e3
+        metrics["ideal_ms"] = 2 * latency * 1e3
+
+    return metrics
+
+
+@benchmark("pipeline_streaming")
+def PipelineStreaming(quick: bool) -> dict[str, float]:
+    """
+    Time to the first output of a two-job chain, where the second job prompts on every 10 deltas of
+    the first, run blocking and as a streaming pipeline. Replies take 50 ms plus 40 tokens at 200/s.
+    """
+    metrics = {}
+
+    with FakeServer(latency=0.05, tokenRate=200, tokens=40) as server:
+        context = Context(server)
+
+        def Build(streaming: bool) -> Pipeline:
+            pipeline = Pipeline(context)
+
+            if streaming:
+                @prompt_job(id="write", context=context.Spawn())
+                async def Write(id, context, prevResult, *args):
+                    async for delta in context.StreamAsync(ChatMessage("user", "write")):
+                        yield delta
+
+                @prompt_job(id="rewrite", context=context.Spawn())
+                async def Rewrite(id, context, prevResult, *args):
+                    batch = []
+
+                    async for delta in prevResult:
+                        batch.append(delta)
+
+                        if len(batch) == 10:
+                            async for rewritten in context.Spawn().StreamAsync(ChatMessage("user", "".join(batch))):
+                                yield rewritten
+
+                            batch = []
+            else:
+                @prompt_job(id="write", context=context.Spawn())
+                async def Write(id, context, prevResult, *args):
+                    return (await context.Prompt(ChatMessage("user", "write")).RunAsync(stream=True)).Top()
+
+                @prompt_job(id="rewrite", context=context.Spawn())
+                async def Rewrite(id, context, prevResult, *args):
+                    words = prevResult.Content.split(" ")
+                    parts = [" ".join(words[index:index + 10]) for index in range(0, len(words), 10)]
+
+                    return [(await context.Spawn().Prompt(ChatMessage("user", part)).RunAsync(stream=True)).Top() for part in parts]
+
+            pipeline.AddJob(Write).AddJob(Rewrite)
+
+            return pipeline
+
+        async def Measure(streaming: bool) -> tuple[float, float]:
+            started = time.perf_counter()
+
+            if not streaming:
+                await Build(False).RunAsync()
+                elapsed = time.perf_counter() - started
+
+                # Nothing is available before the pipeline returns
+                return elapsed, elapsed
+
+            first = None
+
+            async for _ in Build(True).StreamAsync():
+                if first is None:
+                    first = time.perf_counter() - started
+
+            return first, time.perf_counter() - started
+
+        async def Run():
+            # Warm up the event loop's client
+            await Measure(True)
+
+            for streaming, name in ((False, "blocking"), (True, "streaming")):
+                samples = [await Measure(streaming) for _ in range(2 if quick else 5)]
+
+                metrics[f"{name}_first_ms"] = Median([first for first, _ in samples]) * 1e3
+                metrics[f"{name}_total_ms"] = Median([total for _, total in samples]) * 1e3
+
+        asyncio.run(Run())
+
+    return metrics
+
+
+@benchmark("job_overhead")
+def JobOverhead(quick: bool) -> dict[str, float]:
+    """
+    Per-invocation overhead of a PromptJob whose callback does nothing, with one initialization
+    argument and two initialization keyword arguments, against a plain function call.
+    """
+    calls = 20000 if quick else 200000
+
+    def Callback(id, context, prevResult, *args, limit=1, mode="a"):
+        return None
+
+    job = prompt_job("job", None, 1, limit=2, mode="b")(Callback)
+
+    def Time(call: Callable[[], Any]) -> float:
+        started = time.perf_counter()
+
+        for _ in range(calls):
+            call()
+
+        return (time.perf_counter() - started) / calls * 1e6
+
+    return {
+        "plain_call_us": Time(lambda: Callback("job", None, None, 1, limit=2, mode="b")),
+        "job_call_us": Time(lambda: job()),
+        "job_args_us": Time(lambda: job("x", "y")),
+        "job_kwargs_us": Time(lambda: job("x", stream=True, limit=3)),
+    }
+
+
+def MakeTool(index: int) -> Callable:
+    def Function(query: str, limit: int) -> str:
+        return f"{index}:{query}:{limit}"
+
+    Function.__name__ = f"Tool{index}"
+    Function.__doc__ = f"""
+    Tool number {index}.
+
+    Args:
+        query - Search query
+        limit - Maximum results
+    """
+
+    return Function
+
+
+@benchmark("tool_dispatch")
+def ToolDispatch(quick: bool) -> dict[str, float]:
+    """
+    Cost of defining tools, serializing their definitions for a prompt, and dispatching calls parsed
+    from model output by name.
+    """
+    count = 200
+    calls = 2000 if quick else 20000
+    functions = [MakeTool(index) for index in range(count)]
+    registry = ToolRegistry()
+
+    started = time.perf_counter()
+
+    for function in functions:
+        tool(function, registry=registry)
+
+    decorate = time.perf_counter() - started
+
+    started = time.perf_counter()
+
+    for _ in range(100):
+        registry.Serialize()
+
+    serialize = (time.perf_counter() - started) / 100
+
+    replies = [json.dumps({"function": f"Tool{index % count}", "params": {"query": "q", "limit": index}}) for index in range(calls)]
+
+    started = time.perf_counter()
+
+    for reply in replies:
+        call = json.loads(reply)
+        registry.Dispatch(call["function"], call["params"])
+
+    dispatch = (time.perf_counter() - started) / calls
+
+    return {
+        "define_per_tool_us": decorate / count * 1e6,
+        "serialize_200_tools_us": serialize * 1e6,
+        "dispatch_us": dispatch * 1e6,
+    }
+
+
+@benchmark("tool_memoization")
+def ToolMemoization(quick: bool) -> dict[str, float]:
+    """
+    Cost of a memoized tool call served from the in-memory and on-disk caches, against the 5 ms the
+    call itself takes, and the calls made by a burst of identical concurrent calls.
+    """
+    calls = 2000 if quick else 20000
+    made = []
+
+    def Fetch(url: str, limit: int = 5) -> str:
+        made.append(url)
+        time.sleep(0.005)
+
+        return f"{url}:{limit}"
+
+    metrics = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for backend, cache in (("memory", None), ("disk", os.path.join(directory, "tools.db"))):
+            memoized = Memoized(Fetch, cache=cache)
+            memoized("https://example.com", limit=5)
+
+            started = time.perf_counter()
+
+            for _ in range(calls):
+                memoized("https://example.com", limit=5)
+
+            metrics[f"{backend}_hit_us"] = (time.perf_counter() - started) / calls * 1e6
+
+            if cache is not None:
+                memoized.Cache.Close()
+
+    made.clear()
+    memoized = Memoized(Fetch)
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        list(pool.map(lambda _: memoized("https://example.com/burst"), range(32)))
+
+    metrics["burst_calls_made"] = len(made)
+
+    return metrics
+
+
+@benchmark("persistence")
+def Persistence(quick: bool) -> dict[str, float]:
+    """
+    Per-turn checkpoint cost of a long conversation saved as JSON and as a journal, and load times.
+    """
+    metrics = {}
+    size = 2000 if quick else 10000
+    turns = 10 if quick else 30
+
+    with tempfile.TemporaryDirectory() as directory:
+        for suffix in ("json", "jsonl"):
+            path = os.path.join(directory, f"history.{suffix}")
+            context = OpenAICompatibleContext("fake", "fake", baseUrl="http://127.0.0.1:1/v1")
+            context.Messages = History(size)
+            context.Save(path)
+
+            samples = []
+
+            for turn in range(turns):
+                context.Messages.append(ChatMessage("user", f"turn {turn}"))
+                context.Messages.append(ChatMessage("assistant", f"reply {turn}"))
+
+                started = time.perf_counter()
+                context.Save(path)
+                samples.append(time.perf_counter() - started)
+
+            metrics[f"save_{suffix}_us"] = Median(samples) * 1e6
+
+            loaded = context.Spawn()
+
+            started = time.perf_counter()
+            loaded.LoadMessages(path)
+            metrics[f"load_{suffix}_ms"] = (time.perf_counter() - started) * 1e3
+
+            if loaded.Journal is not None:
+                loaded.Journal.Close()
+
+            if context.Journal is not None:
+                context.Journal.Close()
+
+    return metrics
+
+
+@benchmark("retries")
+def Retries(quick: bool) -> dict[str, float]:
+    """
+    A batch against a server failing a seeded 20% of requests with 503, retried by the scheduler.
+    """
+    requests = 50 if quick else 200
+
+    with FakeServer(latency=0.01, tokens=8, errorRate=0.2, errorStatus=503) as server:
+        context = Context(server)
+        context.Scheduler = RequestScheduler(maxConcurrency=32, baseDelay=0.01, maxDelay=0.1)
+
+        started = time.perf_counter()
+        results = context.RunBatch([[ChatMessage("user", f"request {index}")] for index in range(requests)], concurrency=32)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "batch_ms": elapsed * 1e3,
+            "requests_per_s": requests / elapsed,
+            "success_rate": sum(result.Ok for result in results) / requests,
+            "server_requests_per_request": server.Requests / requests,
+        }
@@ -0,0 +1,66 @@
+import argparse
+import json
+import sys
+
+from pathlib import Path
+
+
+def Direction(metric: str) -> int:
+    """
+    Get whether a metric improves downwards or upwards, from its unit suffix.
+
+    Parameters:
+    - metric (str): The metric name.
+
+    Returns:
+    - int: -1 if lower is better, 1 if higher is better, 0 if neither.
+    """
+    if metric.endswith("_per_s"):
+        return 1
+
+    if metric.endswith(("_ms", "_us", "_s", "_bytes")):
+        return -1
+
+    return 0
+
+
+def Main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression. Defaults to 0.1.")
+    parser.add_argument("--fail", action="store_true", help="Exit with status 1 if anything regressed.")
+    options = parser.parse_args()
+
+    baseline = json.loads(Path(options.baseline).read_text())
+    candidate = json.loads(Path(options.candidate).read_text())
+    regressions = 0
+
+    print(f"{'metric':<48} {'baseline':>12} {'candidate':>12} {'change':>8}")
+
+    for case, metrics in candidate["results"].items():
+        for metric, value in metrics.items():
+            before = baseline["results"].get(case, {}).get(metric)
+            name = f"{case}.{metric}"
+
+            if before is None:
+                print(f"{name:<48} {'-':>12} {value:>12.4g} {'new':>8}")
+                continue
+
+            change = (value - before) / before if before else 0.0
+            flag = ""
+
+            if Direction(metric) * change < -options.threshold:
+                flag = "  regressed"
+                regressions += 1
+
+            elif Direction(metric) * change > options.threshold:
+                flag = "  improved"
+
+            print(f"{name:<48} {before:>12.4g} {value:>12.4g} {change:>+8.1%}{flag}")
+
+    return 1 if options.fail and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(Main())
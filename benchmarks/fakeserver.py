@@ -0,0 +1,237 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Without it small SSE writes wait on delayed ACKs and every request gains ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        return
+
+    def Send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def Chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.Send(200, {"object": "list", "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "fake"}]})
+        else:
+            self.Send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        # Clients stop reading streams early, e.g. cancelled hedges or pipelines
+        try:
+            self.Respond()
+
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def Respond(self):
+        server: FakeServer = self.server.Fake
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+        status = server.Admit()
+
+        if status is not None:
+            self.Send(status, {"error": {"message": "injected error", "type": "server_error", "code": status}})
+            return
+
+        if server.Latency:
+            time.sleep(server.Latency)
+
+        messages = request.get("messages", [])
+        model = request.get("model", "fake")
+        promptTokens = sum(len(str(message.get("content") or "")) // 4 + 4 for message in messages)
+        calls = server.ToolCalls(request)
+        tokens = [] if calls else server.Tokens(messages)
+        usage = {"prompt_tokens": promptTokens, "completion_tokens": len(tokens), "total_tokens": promptTokens + len(tokens)}
+
+        if not request.get("stream"):
+            message: dict[str, Any] = {"role": "assistant", "content": "".join(tokens) if not calls else None}
+
+            if calls:
+                message["tool_calls"] = calls
+
+            self.Send(200, {
+                "id": "fake",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if calls else "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def Event(delta: dict, finish: str | None = None):
+            chunk = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.Chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        interval = 1 / server.TokenRate if server.TokenRate else 0
+        started = time.perf_counter()
+
+        Event({"role": "assistant", "content": ""})
+
+        if calls:
+            Event({"tool_calls": [{"index": index, **call} for index, call in enumerate(calls)]})
+
+        for index, token in enumerate(tokens):
+            # Paced against the start, so sleep overshoot doesn't accumulate
+            if interval:
+                delay = started + index * interval - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+            Event({"content": token})
+
+        Event({}, "tool_calls" if calls else "stop")
+
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self.Chunk(f"data: {json.dumps({'id': 'fake', 'object': 'chat.completion.chunk', 'created': 0, 'model': model, 'choices': [], 'usage': usage})}\n\n".encode())
+
+        self.Chunk(b"data: [DONE]\n\n")
+        self.Chunk(b"")
+
+
+class FakeServer:
+    """
+    A local OpenAI-compatible chat completions server with deterministic output, for benchmarks.
+    Replies have a fixed number of tokens derived from the last message, streamed at a configurable
+    rate after a fixed latency. A seeded fraction of requests fails with an injected status code.
+    When the request offers tools and the last message isn't a tool result, every tool is called once.
+    """
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokenRate: float | None = None,
+        tokens: int = 32,
+        errorRate: float = 0.0,
+        errorStatus: int = 500,
+        seed: int = 0,
+        port: int = 0,
+    ):
+        """
+        Initialize a FakeServer object.
+
+        Parameters:
+        - latency (float): Seconds before the first token.
+        - tokenRate (float | None): Tokens per second of streamed replies. None to send them as fast as possible.
+        - tokens (int): Tokens per reply.
+        - errorRate (float): Fraction of requests that fail.
+        - errorStatus (int): Status code of failed requests.
+        - seed (int): Seed of the error injection.
+        - port (int): The port to listen on. 0 for any free port.
+        """
+        self.Latency: float = latency
+        self.TokenRate: float | None = tokenRate
+        self.TokenCount: int = tokens
+        self.ErrorRate: float = errorRate
+        self.ErrorStatus: int = errorStatus
+        self.Random: random.Random = random.Random(seed)
+        self.Lock: threading.Lock = threading.Lock()
+
+        self.Requests: int = 0
+        self.Errors: int = 0
+
+        ThreadingHTTPServer.request_queue_size = 1024
+
+        self.Server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", port), FakeHandler)
+        self.Server.daemon_threads = True
+        self.Server.Fake = self
+        self.Thread: threading.Thread | None = None
+
+    @property
+    def URL(self) -> str:
+        return f"http://127.0.0.1:{self.Server.server_address[1]}/v1"
+
+    def Admit(self) -> int | None:
+        with self.Lock:
+            self.Requests += 1
+
+            if self.ErrorRate and self.Random.random() < self.ErrorRate:
+                self.Errors += 1
+                return self.ErrorStatus
+
+        return None
+
+    def Tokens(self, messages: list[dict]) -> list[str]:
+        # The reply starts with the start of the last message, so replies differ per prompt
+        first = str(messages[-1].get("content") or "")[:16] if messages else ""
+
+        return [first or "ok"] + [f" t{index}" for index in range(1, self.TokenCount)]
+
+    def ToolCalls(self, request: dict) -> list[dict]:
+        tools = request.get("tools")
+        messages = request.get("messages", [])
+
+        if not tools or (messages and messages[-1].get("role") == "tool"):
+            return []
+
+        calls = []
+
+        for index, tool in enumerate(tools):
+            function = tool.get("function", {})
+            properties = function.get("parameters", {}).get("properties", {})
+            arguments = {name: 1 if schema.get("type") in ("integer", "number") else "x" for name, schema in properties.items()}
+
+            calls.append({"id": f"call_{index}", "type": "function", "function": {"name": function.get("name"), "arguments": json.dumps(arguments)}})
+
+        return calls
+
+    def Start(self):
+        self.Thread = threading.Thread(target=self.Server.serve_forever, daemon=True, name="fake-llm")
+        self.Thread.start()
+
+        return self
+
+    def Stop(self):
+        self.Server.shutdown()
+        self.Server.server_close()
+
+    def __enter__(self):
+        return self.Start()
+
+    def __exit__(self, *args):
+        self.Stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible server.")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-rate", type=float, default=None)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8000)
+    options = parser.parse_args()
+
+    server = FakeServer(options.latency, options.token_rate, options.tokens, options.error_rate, options.error_status, options.seed, options.port).Start()
+    print(server.URL, flush=True)
+
+    try:
+        server.Thread.join()
+    except KeyboardInterrupt:
+        server.Stop()
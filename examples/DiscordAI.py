@@ -1,7 +1,7 @@
 from tinytune.prompt import PromptJob, prompt_job
 from tinytune.llmcontext import Model
 from tinytune.pipeline import Pipeline
-from gptcontext import GPTContext, GPTMessage
+from tinytune.contexts.gptcontext import GPTContext, GPTMessage
 
 from ReplicateContext import ReplicateContext, ReplicateMessage
 
@@ -5,7 +5,7 @@ from groq import Groq
 
 
 class WebGroqMessage(Message):
-    __slots__ = ("Role", "Content", "Type")
+    __slots__ = ("Type",)
 
     def __init__(self, role: str, content: str, type: str = "message"):
         super().__init__(role, content)
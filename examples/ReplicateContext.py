@@ -6,7 +6,7 @@ from tinytune.llmcontext import LLMContext, Model, Message
 from typing import Callable, Any
 
 class ReplicateMessage(Message):
-    __slots__ = ("Role", "Content")
+    __slots__ = ()
 
     def __init__(self, role: str, content: str):
         super().__init__(role, content)
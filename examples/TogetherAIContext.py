@@ -1,10 +0,0 @@
-import tinytune
-from tinytune.llmcontext import LLMContext
-from tinytune.prompt import prompt_job
-
-class TogetherAIContext[LLMContext]:
-    def __init__(self, apiKey: str) -> None:
-        pass
-
-    def Prompt(self):
-        return
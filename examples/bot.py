@@ -1,5 +1,5 @@
 import os
-from gptcontext import GPTContext
+from tinytune.contexts.gptcontext import GPTContext
 
 running: bool = False
 def RunBot():
@@ -8,18 +8,21 @@ class ParallelRunner:
     Represents a parallel runner for executing jobs concurrently.
     """
 
-    def __init__(self, llm: LLMContext) -> None:
+    def __init__(self, llm: LLMContext, maxWorkers: int | None = None) -> None:
         """
         Initialize a ParallelRunner object.
 
         Parameters:
         - gpt (LLMContext): The GPT context.
+        - maxWorkers (int | None): Maximum number of jobs run at once. Provider rate limits are
+          enforced by the context's Scheduler, so this only bounds the number of threads.
         """
         self.Jobs: list[Callable[[LLMContext, list[Any]], Any]] = []
         self.Futures: list[Future]
         self.Pool: ThreadPoolExecutor = None
         self.GPT: LLMContext = llm
         self.Results: list = []
+        self.MaxWorkers: int | None = maxWorkers
 
     def GetCompleted(self, onWait: Callable[[Any], Any] = None):
         """
@@ -73,7 +76,7 @@ class ParallelRunner:
         - bool: True if successful, False otherwise.
         """
         try:
-            self.Pool = ThreadPoolExecutor(max_workers=len(self.Jobs))
+            self.Pool = ThreadPoolExecutor(max_workers=self.MaxWorkers or len(self.Jobs))
             self.Futures = [self.Pool.submit(job, self.GPT) for job in self.Jobs]
 
             for future in self.GetCompleted(onWait):
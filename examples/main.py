@@ -8,16 +8,14 @@ sys.path.append("../")
 from dotenv import load_dotenv
 from typing import Any
 from tinytune.llmcontext import LLMContext
-from tinytune.contexts.gptcontext import GPTContext, Model, GPTMessage
-from examples.ollama_context import OllamaContext, OllamaMessage
+from tinytune.contexts.gptcontext import GPTContext, GPTMessage
+from tinytune.contexts import OllamaContext, PerplexityContext, ChatMessage
 from tinytune.pipeline import Pipeline
 from tinytune.prompt import prompt_job, PromptJob
 
-from PerplexityContext import PerplexityContext, PerplexityMessage
-
 load_dotenv()
 
-# gptContext = OllamaContext(f"https://api.cloudflare.com/client/v4/accounts/{os.getenv("CLOUDFLARE_ID")}/ai/v1", "@cf/meta/llama-3.1-70b-instruct", str(os.getenv("CLOUDFLARE_KEY")))
+# gptContext = CloudflareContext("@cf/meta/llama-3.1-70b-instruct", str(os.getenv("CLOUDFLARE_KEY")), str(os.getenv("CLOUDFLARE_ID")))
 
 print(os.getenv("OPENAI_KEY"))
 gptContext = GPTContext(model="gpt-4o-mini", apiKey=os.getenv("OPENAI_KEY"))
@@ -34,7 +32,7 @@ gptContext.OnGenerate = Callback
 
 
 def Main():
-    gptContext = OllamaContext("http://localhost:11434/v1/", "llama3.2:1b")
+    gptContext = OllamaContext("llama3.2:1b")
     pContext = PerplexityContext(
         "llama-3-sonar-large-32k-online", str(os.getenv("PERPLEXITY_KEY"))
     )
@@ -52,7 +50,7 @@ def Main():
     def Job(id: str, context: GPTContext, prevResult: Any):
         (
             context.Prompt(
-                OllamaMessage(
+                ChatMessage(
                     "user", f"Get me the latest top most news on f{sys.argv[1]}. "
                 )
             ).Run(stream=True)
@@ -64,7 +62,7 @@ def Main():
     def Job1(id: str, context: GPTContext, prevResult: Any):
         (
             context.Prompt(
-                OllamaMessage(
+                ChatMessage(
                     "user",
                     f"""{prevResult.Content} extract this data into JSON, and only return the JSON, no formatting, backticks, or explanation""",
                 )
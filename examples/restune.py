@@ -2,7 +2,7 @@ import os
 
 from tinytune.llmcontext import Message
 from tinytune.prompt import prompt_job
-from examples.gptcontext import GPTContext, GPTMessage, Model
+from tinytune.contexts.gptcontext import GPTContext, GPTMessage
 from tinytune.pipeline import Pipeline, PromptJob
 
 context = GPTContext("gpt-4-0125-preview", str(os.getenv("OPENAI_KEY")))
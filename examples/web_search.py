@@ -6,7 +6,7 @@ import html.parser
 import time
 
 import requests
-from gptcontext import GPTContext, GPTMessage
+from tinytune.contexts.gptcontext import GPTContext, GPTMessage
 from tinytune.prompt import PromptJob, prompt_job
 
 from tinytune import Pipeline
@@ -0,0 +1,242 @@
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+class ResponseCache(ABC):
+    """
+    Base class for response caches. Backends implement Load, Store and Clear;
+    hit and miss counters are kept here.
+    """
+    def __init__(self):
+        """
+        Initialize a ResponseCache object.
+        """
+        self.Hits: int = 0
+        self.Misses: int = 0
+        self.Evictions: int = 0
+        self.Lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def Key(request: dict, digest: str | None = None) -> str:
+        """
+        Build a stable cache key from a request body, so requests only share a response when
+        everything sent with them, such as the tools and sampling options, is the same.
+
+        Parameters:
+        - request (dict): The request body.
+        - digest (str | None): A digest of the request's messages, e.g. the history's incrementally built Digest(). Used instead of hashing the messages again.
+
+        Returns:
+        - str: The cache key.
+        """
+        if digest is not None:
+            request = {**request, "messages": digest}
+
+        return hashlib.sha256(json.dumps(request, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+    def Get(self, key: str) -> Any | None:
+        """
+        Look up a cached response.
+
+        Parameters:
+        - key (str): The cache key.
+
+        Returns:
+        - Any | None: The cached response, or None on a miss.
+        """
+        value = self.Load(key)
+
+        with self.Lock:
+            if value is None:
+                self.Misses += 1
+            else:
+                self.Hits += 1
+
+        return value
+
+    def Set(self, key: str, value: Any):
+        """
+        Cache a response. None values are not cached.
+
+        Parameters:
+        - key (str): The cache key.
+        - value (Any): The response to cache.
+        """
+        if value is not None:
+            self.Store(key, value)
+
+    def Stats(self) -> dict[str, int]:
+        """
+        Get the cache counters.
+
+        Returns:
+        - dict[str, int]: Hits, misses and evictions.
+        """
+        with self.Lock:
+            return {"hits": self.Hits, "misses": self.Misses, "evictions": self.Evictions}
+
+    @abstractmethod
+    def Load(self, key: str) -> Any | None:
+        """
+        Read a cached response from the backend.
+
+        Parameters:
+        - key (str): The cache key.
+
+        Returns:
+        - Any | None: The cached response, or None if it's missing or expired.
+        """
+
+    @abstractmethod
+    def Store(self, key: str, value: Any):
+        """
+        Write a response to the backend.
+
+        Parameters:
+        - key (str): The cache key.
+        - value (Any): The response.
+        """
+
+    @abstractmethod
+    def Clear(self):
+        """
+        Remove every cached response.
+        """
+
+
+class MemoryCache(ResponseCache):
+    """
+    In-memory LRU response cache with optional size and time-to-live eviction.
+    """
+    def __init__(self, maxSize: int | None = 1024, ttl: float | None = None):
+        """
+        Initialize a MemoryCache object.
+
+        Parameters:
+        - maxSize (int | None): Maximum number of cached responses. None for no limit.
+        - ttl (float | None): Seconds a response stays valid. None for no expiry.
+        """
+        super().__init__()
+
+        self.MaxSize: int | None = maxSize
+        self.TTL: float | None = ttl
+        self.Entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def Load(self, key: str) -> Any | None:
+        with self.Lock:
+            entry = self.Entries.get(key)
+
+            if entry is None:
+                return None
+
+            if self.TTL is not None and time.monotonic() - entry[0] > self.TTL:
+                del self.Entries[key]
+                self.Evictions += 1
+                return None
+
+            self.Entries.move_to_end(key)
+
+            return entry[1]
+
+    def Store(self, key: str, value: Any):
+        with self.Lock:
+            self.Entries[key] = (time.monotonic(), value)
+            self.Entries.move_to_end(key)
+
+            while self.MaxSize is not None and len(self.Entries) > self.MaxSize:
+                self.Entries.popitem(last=False)
+                self.Evictions += 1
+
+    def Clear(self):
+        with self.Lock:
+            self.Entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.Entries)
+
+
+class SQLiteCache(ResponseCache):
+    """
+    On-disk response cache backed by SQLite, so cached responses survive across runs.
+    Values are pickled. Least recently used entries are evicted beyond maxSize.
+    """
+    def __init__(self, path: str = "tinytune-cache.db", maxSize: int | None = None, ttl: float | None = None):
+        """
+        Initialize a SQLiteCache object.
+
+        Parameters:
+        - path (str): The database file path.
+        - maxSize (int | None): Maximum number of cached responses. None for no limit.
+        - ttl (float | None): Seconds a response stays valid. None for no expiry.
+        """
+        super().__init__()
+
+        self.Path: str = path
+        self.MaxSize: int | None = maxSize
+        self.TTL: float | None = ttl
+        self.Connection: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self.Lock, self.Connection:
+            self.Connection.execute("PRAGMA journal_mode=WAL")
+            self.Connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.Connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def Load(self, key: str) -> Any | None:
+        with self.Lock, self.Connection:
+            row = self.Connection.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                return None
+
+            now = time.time()
+
+            if self.TTL is not None and now - row[1] > self.TTL:
+                self.Connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.Evictions += 1
+                return None
+
+            self.Connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        return pickle.loads(row[0])
+
+    def Store(self, key: str, value: Any):
+        now = time.time()
+
+        with self.Lock, self.Connection:
+            self.Connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), now, now),
+            )
+
+            if self.MaxSize is not None:
+                evicted = self.Connection.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.MaxSize,),
+                ).rowcount
+
+                self.Evictions += max(evicted, 0)
+
+    def Clear(self):
+        with self.Lock, self.Connection:
+            self.Connection.execute("DELETE FROM responses")
+
+    def Close(self):
+        """
+        Close the database connection.
+        """
+        self.Connection.close()
+
+    def __len__(self) -> int:
+        with self.Lock:
+            return self.Connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
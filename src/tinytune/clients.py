@@ -0,0 +1,145 @@
+import asyncio
+import importlib.util
+import threading
+import weakref
+
+import httpx
+import openai
+
+
+class ClientRegistry:
+    """
+    Shares OpenAI-compatible clients, and with them their HTTP connection pools, between contexts.
+    Contexts pointed at the same base URL with the same API key reuse warm keep-alive connections
+    instead of opening their own. Async clients are kept per event loop, since their connections
+    are bound to the loop they were opened on.
+    """
+    def __init__(
+        self,
+        maxConnections: int = 100,
+        maxKeepalive: int = 20,
+        keepaliveExpiry: float = 60.0,
+        timeout: float = 600.0,
+        connectTimeout: float = 10.0,
+        http2: bool = False,
+        maxRetries: int = 2,
+    ):
+        """
+        Initialize a ClientRegistry object.
+
+        Parameters:
+        - maxConnections (int): Maximum number of connections per pool.
+        - maxKeepalive (int): Maximum number of idle keep-alive connections per pool.
+        - keepaliveExpiry (float): Seconds an idle connection is kept open.
+        - timeout (float): Read, write and pool timeout of a request, in seconds.
+        - connectTimeout (float): Timeout for opening a connection, in seconds.
+        - http2 (bool): Use HTTP/2 when the h2 package is installed.
+        - maxRetries (int): Retries the clients do on their own.
+        """
+        self.MaxConnections: int = maxConnections
+        self.MaxKeepalive: int = maxKeepalive
+        self.KeepaliveExpiry: float = keepaliveExpiry
+        self.Timeout: float = timeout
+        self.ConnectTimeout: float = connectTimeout
+        self.HTTP2: bool = http2 and importlib.util.find_spec("h2") is not None
+        self.MaxRetries: int = maxRetries
+
+        self.Clients: dict[tuple[str | None, str | None], openai.OpenAI] = {}
+        self.AsyncClients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[str | None, str | None], openai.AsyncOpenAI]] = weakref.WeakKeyDictionary()
+        self.Lock: threading.Lock = threading.Lock()
+
+    def Limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.MaxConnections,
+            max_keepalive_connections=self.MaxKeepalive,
+            keepalive_expiry=self.KeepaliveExpiry,
+        )
+
+    def Timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.Timeout, connect=self.ConnectTimeout)
+
+    def Get(self, baseUrl: str | None = None, apiKey: str | None = None) -> openai.OpenAI:
+        """
+        Get the shared client for an endpoint, creating it on first use.
+
+        Parameters:
+        - baseUrl (str | None): The API base URL. None for the OpenAI default.
+        - apiKey (str | None): The API key.
+
+        Returns:
+        - openai.OpenAI: The client.
+        """
+        key = (baseUrl, apiKey)
+
+        with self.Lock:
+            client = self.Clients.get(key)
+
+            if client is None:
+                client = openai.OpenAI(
+                    api_key=apiKey,
+                    base_url=baseUrl,
+                    max_retries=self.MaxRetries,
+                    timeout=self.Timeouts(),
+                    http_client=httpx.Client(limits=self.Limits(), timeout=self.Timeouts(), http2=self.HTTP2),
+                )
+
+                self.Clients[key] = client
+
+            return client
+
+    def GetAsync(self, baseUrl: str | None = None, apiKey: str | None = None) -> openai.AsyncOpenAI:
+        """
+        Get the shared async client for an endpoint on the running event loop, creating it on first use.
+
+        Parameters:
+        - baseUrl (str | None): The API base URL. None for the OpenAI default.
+        - apiKey (str | None): The API key.
+
+        Returns:
+        - openai.AsyncOpenAI: The client.
+        """
+        loop = asyncio.get_running_loop()
+        key = (baseUrl, apiKey)
+
+        with self.Lock:
+            clients = self.AsyncClients.setdefault(loop, {})
+            client = clients.get(key)
+
+            if client is None:
+                client = openai.AsyncOpenAI(
+                    api_key=apiKey,
+                    base_url=baseUrl,
+                    max_retries=self.MaxRetries,
+                    timeout=self.Timeouts(),
+                    http_client=httpx.AsyncClient(limits=self.Limits(), timeout=self.Timeouts(), http2=self.HTTP2),
+                )
+
+                clients[key] = client
+
+            return client
+
+    def Close(self):
+        """
+        Close the shared sync clients and their connections.
+        Async clients are bound to their event loop and are closed from it with CloseAsync.
+        """
+        with self.Lock:
+            for client in self.Clients.values():
+                client.close()
+
+            self.Clients.clear()
+
+    async def CloseAsync(self):
+        """
+        Close the async clients of the running event loop and their connections.
+        Call it before the loop is closed, e.g. at the end of the coroutine passed to asyncio.run.
+        """
+        with self.Lock:
+            clients = self.AsyncClients.pop(asyncio.get_running_loop(), {})
+
+        for client in clients.values():
+            await client.close()
+
+
+# Registry used by contexts that aren't given one
+Clients: ClientRegistry = ClientRegistry()
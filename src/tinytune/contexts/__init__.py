@@ -0,0 +1,7 @@
+from tinytune.contexts.openaicontext import OpenAICompatibleContext, ChatMessage
+from tinytune.contexts.gptcontext import GPTContext, O1Context, GPTMessage
+from tinytune.contexts.groqcontext import GroqContext
+from tinytune.contexts.perplexitycontext import PerplexityContext
+from tinytune.contexts.togethercontext import TogetherAIContext
+from tinytune.contexts.ollamacontext import OllamaContext
+from tinytune.contexts.cloudflarecontext import CloudflareContext
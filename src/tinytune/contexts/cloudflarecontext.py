@@ -0,0 +1,25 @@
+from tinytune.clients import ClientRegistry
+from tinytune.contexts.openaicontext import OpenAICompatibleContext
+
+
+class CloudflareContext(OpenAICompatibleContext):
+    """
+    Workers AI through its OpenAI-compatible endpoint. Models are named like "@cf/meta/llama-3.1-8b-instruct".
+    """
+    Owner: str = "cloudflare"
+
+    def __init__(self, model: str, apiKey: str, accountId: str, promptFile: str | None = None, baseUrl: str | None = None, clients: ClientRegistry | None = None):
+        """
+        Initialize a CloudflareContext object.
+
+        Parameters:
+        - model (str): The model name.
+        - apiKey (str): The API token.
+        - accountId (str): The Cloudflare account ID.
+        - promptFile (str | None): The file messages are saved to.
+        - baseUrl (str | None): The API base URL. Defaults to the account's Workers AI endpoint.
+        - clients (ClientRegistry | None): The registry clients are drawn from. Defaults to the shared registry.
+        """
+        self.AccountID: str = accountId
+
+        super().__init__(model, apiKey, promptFile, baseUrl or f"https://api.cloudflare.com/client/v4/accounts/{accountId}/ai/v1", clients)
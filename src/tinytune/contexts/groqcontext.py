@@ -0,0 +1,6 @@
+from tinytune.contexts.openaicontext import OpenAICompatibleContext
+
+
+class GroqContext(OpenAICompatibleContext):
+    Owner: str = "groq"
+    DefaultBaseURL: str | None = "https://api.groq.com/openai/v1"
@@ -0,0 +1,11 @@
+from tinytune.clients import ClientRegistry
+from tinytune.contexts.openaicontext import OpenAICompatibleContext
+
+
+class OllamaContext(OpenAICompatibleContext):
+    Owner: str = "ollama"
+    DefaultBaseURL: str | None = "http://localhost:11434/v1"
+
+    def __init__(self, model: str, apiKey: str = "ollama", promptFile: str | None = None, baseUrl: str | None = None, clients: ClientRegistry | None = None):
+        # Ollama ignores the key, but the client requires one
+        super().__init__(model, apiKey, promptFile, baseUrl, clients)
@@ -0,0 +1,523 @@
+import asyncio
+import json
+import openai
+from tinytune.clients import ClientRegistry, Clients
+from tinytune.llmcontext import LLMContext, Model, Message, BatchResult, SerializeMessage
+from tinytune.metrics import Instruments, NoSpan
+from typing import Any, Iterator, AsyncIterator, Sequence
+
+
+class ChatMessage(Message):
+    __slots__ = ()
+
+    def __init__(self, role: str, content: str):
+        super().__init__(role, content)
+
+
+def WriteBatchFile(context: "OpenAICompatibleContext", batch: Sequence[Sequence[Message | dict]], batchFile: str = "batch.jsonl") -> str:
+    """
+    Write a batch of conversations as an OpenAI Batch API input file, one chat completion request per line.
+    The custom_id of each request is its index in the batch.
+
+    Parameters:
+    - context (OpenAICompatibleContext): The context whose model and request options are used.
+    - batch (Sequence[Sequence[Message | dict]]): The messages of each conversation.
+    - batchFile (str): The file path to write the requests to.
+
+    Returns:
+    - str: The file path.
+    """
+    with open(batchFile, "w") as fp:
+        for index, messages in enumerate(batch):
+            request = {
+                "custom_id": f"request-{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": context.RequestBody([SerializeMessage(message) for message in messages]),
+            }
+
+            fp.write(json.dumps(request, separators=(",", ":")) + "\n")
+
+    return batchFile
+
+
+def LoadBatchResults(outputFile: str, messageClass: type = ChatMessage) -> list[BatchResult]:
+    """
+    Load an OpenAI Batch API output or error file written for a batch from WriteBatchFile.
+
+    Parameters:
+    - outputFile (str): The file path of the batch output.
+    - messageClass (type): The message type results are returned as.
+
+    Returns:
+    - list[BatchResult]: The results, ordered by their index in the batch.
+    """
+    results: list[BatchResult] = []
+
+    with open(outputFile, "r") as fp:
+        for line in fp:
+            if not line.strip():
+                continue
+
+            entry = json.loads(line)
+            index = int(str(entry["custom_id"]).rsplit("-", 1)[-1])
+            response = entry.get("response") or {}
+            error = entry.get("error")
+
+            if error is None and response.get("status_code", 200) != 200:
+                error = response.get("body", {}).get("error", response.get("body"))
+
+            if error is not None:
+                results.append(BatchResult(index, None, None, Exception(str(error))))
+                continue
+
+            content = response["body"]["choices"][0]["message"]["content"]
+
+            results.append(BatchResult(index, None, messageClass("assistant", str(content))))
+
+    results.sort(key=lambda result: result.Index)
+
+    return results
+
+
+class OpenAICompatibleContext(LLMContext[ChatMessage]):
+    """
+    Base context for providers with an OpenAI-compatible chat completions API.
+    Streaming, connection pooling, caching, scheduling and retries are handled here once;
+    provider contexts only set their owner, default base URL and request options.
+    """
+    MessageClass: type = ChatMessage
+
+    # Model owner and default endpoint of the provider
+    Owner: str = "openai"
+    DefaultBaseURL: str | None = None
+
+    # Sampling temperature sent with each request. None to leave it to the provider.
+    Temperature: float | None = 0
+
+    # Whether the provider accepts prompt_cache_key
+    PromptCacheKey: bool = False
+
+    def __init__(self, model: str, apiKey: str, promptFile: str | None = None, baseUrl: str | None = None, clients: ClientRegistry | None = None):
+        """
+        Initialize an OpenAICompatibleContext object.
+
+        Parameters:
+        - model (str): The model name.
+        - apiKey (str): The API key.
+        - promptFile (str | None): The file messages are saved to.
+        - baseUrl (str | None): The API base URL. Defaults to the provider's endpoint.
+        - clients (ClientRegistry | None): The registry clients are drawn from. Defaults to the shared registry.
+        """
+        super().__init__(Model(self.Owner, model))
+
+        self.APIKey: str = apiKey
+        self.PromptFile: str | None = promptFile
+        self.QueuePointer: int = 0
+
+        self.BaseURL: str | None = baseUrl or self.DefaultBaseURL
+        self.Clients: ClientRegistry = clients or Clients
+        self.Client: openai.OpenAI = self.Clients.Get(self.BaseURL, self.APIKey)
+
+        # A ToolEngine whose tools are offered to the model with each request
+        self.Tools: Any = None
+
+    def RequestBody(self, messages: list[dict]) -> dict:
+        body = {
+            "model": self.Model.Name,
+            "messages": messages,
+        }
+
+        if self.Temperature is not None:
+            body["temperature"] = self.Temperature
+
+        if self.Tools is not None:
+            body["tools"] = self.Tools.Schemas()
+
+        return body
+
+    def CacheRequest(self, messages: list[dict]) -> dict:
+        # The prompt cache key only routes the request, so forks still share responses
+        return {**self.RequestBody(messages), **self.ToolOptions(0)}
+
+    def RequestOptions(self, kwargs: dict) -> dict:
+        # Forks of a conversation share a cache key, so the provider routes them to the same prompt cache
+        if self.PromptCacheKey:
+            prefixKey = self.PrefixKey()
+
+            if prefixKey is not None:
+                kwargs.setdefault("prompt_cache_key", prefixKey)
+
+        return kwargs
+
+    def WriteBatchFile(self, batch: list[list[ChatMessage | dict]], batchFile: str = "batch.jsonl") -> str:
+        return WriteBatchFile(self, batch, batchFile)
+
+    def Prompt(self, message: ChatMessage | dict):
+        self.MessageQueue.append(message)
+
+        return self
+
+    def ToolOptions(self, rounds: int) -> dict:
+        # The last round forbids further calls, so the model has to answer
+        if self.Tools is not None and rounds >= self.Tools.MaxRounds:
+            return {"tool_choice": "none"}
+
+        return {}
+
+    def CallTools(self, content: str | None, calls: list[dict]):
+        """
+        Execute the tool calls of a reply and add the reply and the results to the history.
+
+        Parameters:
+        - content (str | None): The text of the reply.
+        - calls (list[dict]): The tool calls, in wire format.
+        """
+        self.Messages.append(self.Tools.AssistantMessage(content, calls))
+        self.Messages.extend(self.Tools.Execute(calls))
+
+    async def CallToolsAsync(self, content: str | None, calls: list[dict]):
+        """
+        Asynchronous counterpart of CallTools.
+
+        Parameters:
+        - content (str | None): The text of the reply.
+        - calls (list[dict]): The tool calls, in wire format.
+        """
+        self.Messages.append(self.Tools.AssistantMessage(content, calls))
+        self.Messages.extend(await self.Tools.ExecuteAsync(calls))
+
+    def Create(self, span: Any = NoSpan, hold: bool = False, **kwargs) -> Any:
+        # The scheduler owns retries, so the client's own retries are turned off under it
+        client = self.Client if self.Scheduler is None else self.Client.with_options(max_retries=0)
+        kwargs = self.RequestOptions(kwargs)
+
+        # Streams hold their scheduler slot until they're read, released by the caller
+        return self.Submit(
+            lambda: client.chat.completions.create(**self.RequestBody(self.RequestMessages()), **kwargs),
+            span,
+            hold,
+        )
+
+    async def CreateAsync(self, span: Any = NoSpan, hold: bool = False, **kwargs) -> Any:
+        # Async connections belong to the running event loop, so the client is looked up per call
+        client = self.Clients.GetAsync(self.BaseURL, self.APIKey)
+
+        if self.Scheduler is not None:
+            client = client.with_options(max_retries=0)
+
+        kwargs = self.RequestOptions(kwargs)
+
+        return await self.SubmitAsync(
+            lambda: client.chat.completions.create(**self.RequestBody(self.RequestMessages()), **kwargs),
+            span,
+            hold,
+        )
+
+    def Run(self, *args, **kwargs):
+        stream: bool | None = kwargs.get("stream")
+
+        with Instruments.Start("run", model=self.Model.Name):
+            if stream:
+                for _ in self.Stream():
+                    pass
+
+                return self
+
+            while self.QueuePointer < len(self.MessageQueue):
+                start = len(self.Messages)
+                self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+                key, content = self.CacheLookup()
+                rounds: int = 0
+
+                try:
+                    while content is None:
+                        with Instruments.Start("request", model=self.Model.Name, provider=self.Owner) as span:
+                            response = self.Create(span=span, **self.ToolOptions(rounds))
+                            usage = getattr(response, "usage", None)
+
+                            if usage is not None:
+                                span.Finish(promptTokens=usage.prompt_tokens, completionTokens=usage.completion_tokens)
+
+                        message = response.choices[0].message
+                        calls = self.Tools.ReadCalls(message) if self.Tools is not None else []
+
+                        if calls and self.Tools is not None and rounds < self.Tools.MaxRounds:
+                            self.CallTools(message.content, calls)
+                            rounds += 1
+                            continue
+
+                        content = str(message.content)
+
+                        # Replies that depend on tool results aren't cached, so tools run again next time
+                        if not rounds:
+                            self.CacheStore(key, content)
+
+                # A failed turn leaves the message queued, to be sent again by the next run
+                except BaseException:
+                    self.Rollback(start)
+                    raise
+
+                self.Messages.append(self.MessageClass("assistant", content))
+
+                self.QueuePointer += 1
+
+        return self
+
+    def Stream(self, message: ChatMessage | dict | None = None, *args, **kwargs) -> Iterator[str]:
+        if message is not None:
+            self.Prompt(message)
+
+        while self.QueuePointer < len(self.MessageQueue):
+            start = len(self.Messages)
+            self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+            key, content = self.CacheLookup()
+
+            if content is not None:
+                self.OnGenerate(content)
+                self.Messages.append(self.MessageClass("assistant", content))
+                self.QueuePointer += 1
+
+                yield content
+                continue
+
+            rounds: int = 0
+            pending: bool = True
+
+            try:
+                while pending:
+                    span = Instruments.Start("request", model=self.Model.Name, provider=self.Owner, stream=True)
+
+                    scheduler = self.Scheduler
+
+                    try:
+                        response = self.Create(stream=True, hold=True, span=span, **self.ToolOptions(rounds))
+
+                    except Exception as e:
+                        span.Finish(e)
+                        raise
+
+                    chunks: list[str] = []
+                    calls: dict[int, dict] = {}
+                    complete: bool = False
+                    usage: Any = None
+
+                    try:
+                        for chunk in response:
+                            if not chunk.choices:
+                                # Providers asked to include usage send it in a final chunk without choices
+                                usage = getattr(chunk, "usage", None) or usage
+                                continue
+
+                            delta = chunk.choices[0].delta
+
+                            if delta.tool_calls and self.Tools is not None:
+                                self.Tools.Accumulate(calls, delta.tool_calls)
+
+                            content = delta.content
+
+                            self.OnGenerate(content)
+
+                            if content != None:
+                                if not chunks:
+                                    span.First()
+
+                                chunks.append(content)
+                                yield content
+
+                        complete = True
+
+                    except GeneratorExit:
+                        response.close()
+                        raise
+
+                    except Exception as e:
+                        span.Finish(e)
+                        raise
+
+                    finally:
+                        # The stream is drained or closed, so its scheduler slot is free again
+                        if scheduler is not None:
+                            scheduler.Release()
+
+                        content = "".join(chunks)
+
+                        # Without reported usage, chunks stand in for completion tokens
+                        span.Finish(
+                            promptTokens=usage.prompt_tokens if usage is not None else None,
+                            completionTokens=usage.completion_tokens if usage is not None else len(chunks),
+                        )
+
+                        pending = complete and bool(calls) and self.Tools is not None and rounds < self.Tools.MaxRounds
+
+                        # Only a complete reply joins the history
+                        if complete and not pending:
+                            self.Messages.append(self.MessageClass("assistant", content))
+                            self.QueuePointer += 1
+
+                            if not rounds:
+                                self.CacheStore(key, content)
+
+                    if pending:
+                        self.CallTools(content, [calls[index] for index in sorted(calls)])
+                        rounds += 1
+
+            # A failed or abandoned turn leaves the message queued, to be sent again by the next run
+            except BaseException:
+                self.Rollback(start)
+                raise
+
+    async def RunAsync(self, *args, **kwargs):
+        stream: bool | None = kwargs.get("stream")
+
+        with Instruments.Start("run", model=self.Model.Name):
+            if stream:
+                async for _ in self.StreamAsync():
+                    pass
+
+                return self
+
+            while self.QueuePointer < len(self.MessageQueue):
+                start = len(self.Messages)
+                self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+                key, content = self.CacheLookup()
+                rounds: int = 0
+
+                try:
+                    while content is None:
+                        with Instruments.Start("request", model=self.Model.Name, provider=self.Owner) as span:
+                            response = await self.CreateAsync(span=span, **self.ToolOptions(rounds))
+                            usage = getattr(response, "usage", None)
+
+                            if usage is not None:
+                                span.Finish(promptTokens=usage.prompt_tokens, completionTokens=usage.completion_tokens)
+
+                        message = response.choices[0].message
+                        calls = self.Tools.ReadCalls(message) if self.Tools is not None else []
+
+                        if calls and self.Tools is not None and rounds < self.Tools.MaxRounds:
+                            await self.CallToolsAsync(message.content, calls)
+                            rounds += 1
+                            continue
+
+                        content = str(message.content)
+
+                        if not rounds:
+                            self.CacheStore(key, content)
+
+                # A failed turn leaves the message queued, to be sent again by the next run
+                except BaseException:
+                    self.Rollback(start)
+                    raise
+
+                self.Messages.append(self.MessageClass("assistant", content))
+
+                self.QueuePointer += 1
+
+        return self
+
+    async def StreamAsync(self, message: ChatMessage | dict | None = None, *args, **kwargs) -> AsyncIterator[str]:
+        if message is not None:
+            self.Prompt(message)
+
+        while self.QueuePointer < len(self.MessageQueue):
+            start = len(self.Messages)
+            self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+            key, content = self.CacheLookup()
+
+            if content is not None:
+                self.OnGenerate(content)
+                self.Messages.append(self.MessageClass("assistant", content))
+                self.QueuePointer += 1
+
+                yield content
+                continue
+
+            rounds: int = 0
+            pending: bool = True
+
+            try:
+                while pending:
+                    span = Instruments.Start("request", model=self.Model.Name, provider=self.Owner, stream=True)
+
+                    scheduler = self.Scheduler
+
+                    try:
+                        response = await self.CreateAsync(stream=True, hold=True, span=span, **self.ToolOptions(rounds))
+
+                    except Exception as e:
+                        span.Finish(e)
+                        raise
+
+                    chunks: list[str] = []
+                    calls: dict[int, dict] = {}
+                    complete: bool = False
+                    usage: Any = None
+
+                    try:
+                        async for chunk in response:
+                            if not chunk.choices:
+                                usage = getattr(chunk, "usage", None) or usage
+                                continue
+
+                            delta = chunk.choices[0].delta
+
+                            if delta.tool_calls and self.Tools is not None:
+                                self.Tools.Accumulate(calls, delta.tool_calls)
+
+                            content = delta.content
+
+                            self.OnGenerate(content)
+
+                            if content != None:
+                                if not chunks:
+                                    span.First()
+
+                                chunks.append(content)
+                                yield content
+
+                        complete = True
+
+                    # A cancelled task, e.g. a losing hedged request, closes its response too
+                    except (GeneratorExit, asyncio.CancelledError):
+                        await response.close()
+                        raise
+
+                    except Exception as e:
+                        span.Finish(e)
+                        raise
+
+                    finally:
+                        # The stream is drained or closed, so its scheduler slot is free again
+                        if scheduler is not None:
+                            scheduler.Release()
+
+                        content = "".join(chunks)
+
+                        span.Finish(
+                            promptTokens=usage.prompt_tokens if usage is not None else None,
+                            completionTokens=usage.completion_tokens if usage is not None else len(chunks),
+                        )
+
+                        pending = complete and bool(calls) and self.Tools is not None and rounds < self.Tools.MaxRounds
+
+                        # Only a complete reply joins the history
+                        if complete and not pending:
+                            self.Messages.append(self.MessageClass("assistant", content))
+                            self.QueuePointer += 1
+
+                            if not rounds:
+                                self.CacheStore(key, content)
+
+                    if pending:
+                        await self.CallToolsAsync(content, [calls[index] for index in sorted(calls)])
+                        rounds += 1
+
+            # A failed or abandoned turn leaves the message queued, to be sent again by the next run
+            except BaseException:
+                self.Rollback(start)
+                raise
@@ -0,0 +1,6 @@
+from tinytune.contexts.openaicontext import OpenAICompatibleContext
+
+
+class PerplexityContext(OpenAICompatibleContext):
+    Owner: str = "perplexity"
+    DefaultBaseURL: str | None = "https://api.perplexity.ai"
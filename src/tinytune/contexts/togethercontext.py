@@ -0,0 +1,6 @@
+from tinytune.contexts.openaicontext import OpenAICompatibleContext
+
+
+class TogetherAIContext(OpenAICompatibleContext):
+    Owner: str = "together"
+    DefaultBaseURL: str | None = "https://api.together.xyz/v1"
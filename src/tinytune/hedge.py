@@ -0,0 +1,380 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Iterator
+
+from tinytune.llmcontext import LLMContext, Message, MessageHistory, Model
+
+
+class Attempt:
+    """
+    One request of a hedged turn, sent to one backend context.
+    """
+    def __init__(self, index: int, context: Any, started: float):
+        self.Index: int = index
+        self.Context: Any = context
+        self.Started: float = started
+        self.Cancelled: threading.Event = threading.Event()
+        self.Task: asyncio.Task | None = None
+        # Whether the attempt's time to first token was recorded
+        self.Timed: bool = False
+
+
+class HedgedContext(LLMContext[Message]):
+    """
+    Sends each turn to a primary context and, if it hasn't produced a first token within a delay,
+    a duplicate request to the next context, and so on. The first attempt to start streaming wins;
+    the others are cancelled. An attempt that fails before its first token starts the next one at
+    once, so hedging also fails over. Backends can be any LLMContext, such as a GPTContext backed
+    by a GroqContext. Under StreamAsync losers are cancelled at once; under Stream their threads
+    stop and close their response at their next delta.
+    """
+    def __init__(self, contexts: list[Any], delay: float | None = 0.5, quantile: float = 0.95, window: int = 100):
+        """
+        Initialize a HedgedContext object.
+
+        Parameters:
+        - contexts (list[LLMContext]): The backends, primary first.
+        - delay (float | None): Seconds to wait for a first token before hedging. None to use a quantile of the primary's observed time to first token.
+        - quantile (float): The quantile used when delay is None.
+        - window (int): Number of recent first-token times the quantile is taken over.
+        """
+        super().__init__(Model("hedge", "+".join(context.Model.Name for context in contexts)))
+
+        if not contexts:
+            raise ValueError("A hedged context needs at least one backend.")
+
+        self.Contexts: list[Any] = contexts
+        self.Delay: float | None = delay
+        self.Quantile: float = quantile
+        self.FirstTokenTimes: deque[float] = deque(maxlen=window)
+        self.Lock: threading.Lock = threading.Lock()
+
+        self.Requests: int = 0
+        self.Hedges: int = 0
+        self.Failures: int = 0
+        self.Wins: list[int] = [0] * len(contexts)
+
+    def HedgeDelay(self) -> float:
+        """
+        Get the time to wait for a first token before the next attempt is sent.
+
+        Returns:
+        - float: The delay in seconds.
+        """
+        if self.Delay is not None:
+            return self.Delay
+
+        with self.Lock:
+            times = sorted(self.FirstTokenTimes)
+
+        # Until enough first-token times are recorded, hedge after a second
+        if len(times) < 10:
+            return 1.0
+
+        return times[min(len(times) - 1, int(len(times) * self.Quantile))]
+
+    def Begin(self, index: int, request: list[dict]) -> Attempt:
+        context = self.Contexts[index].Spawn()
+
+        # Losing attempts must not reach the user's callbacks
+        context.OnGenerate = lambda content: None
+        context.Messages = MessageHistory(request[:-1])
+        context.Prompt(request[-1])
+
+        if index > 0:
+            with self.Lock:
+                self.Hedges += 1
+
+        return Attempt(index, context, time.monotonic())
+
+    def OnFirstToken(self, attempt: Attempt):
+        # Only the primary's times set the delay, recorded once per turn whether it wins or not.
+        # A primary cancelled before its first token records the time it waited, a lower bound.
+        with self.Lock:
+            if attempt.Index == 0 and not attempt.Timed:
+                attempt.Timed = True
+                self.FirstTokenTimes.append(time.monotonic() - attempt.Started)
+
+    def OnWin(self, attempt: Attempt):
+        with self.Lock:
+            self.Wins[attempt.Index] += 1
+
+        # A reply without deltas wins when it completes
+        self.OnFirstToken(attempt)
+
+    def Stream(self, message: Message | dict | None = None, *args, **kwargs) -> Iterator[Any]:
+        if message is not None:
+            self.Prompt(message)
+
+        while self.QueuePointer < len(self.MessageQueue):
+            start = len(self.Messages)
+            self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+            key, content = self.CacheLookup()
+
+            if content is not None:
+                self.OnGenerate(content)
+                self.Messages.append(Message("assistant", content))
+                self.QueuePointer += 1
+
+                yield content
+                continue
+
+            with self.Lock:
+                self.Requests += 1
+
+            request = self.RequestMessages()
+            events: queue.Queue[tuple[Attempt, Any, Exception | None]] = queue.Queue()
+            attempts: list[Attempt] = []
+            winner: Attempt | None = None
+            failed = 0
+
+            def Work(attempt: Attempt):
+                stream = attempt.Context.Stream()
+
+                try:
+                    for delta in stream:
+                        # Timed even once cancelled, so a primary that loses still reports its first token
+                        self.OnFirstToken(attempt)
+
+                        if attempt.Cancelled.is_set():
+                            break
+
+                        events.put((attempt, delta, None))
+
+                    events.put((attempt, StopIteration, None))
+
+                except Exception as e:
+                    events.put((attempt, None, e))
+
+                finally:
+                    # Closing the generator closes the provider response of a cancelled attempt
+                    stream.close()
+
+            def Launch():
+                attempt = self.Begin(len(attempts), request)
+                attempts.append(attempt)
+                threading.Thread(target=Work, args=(attempt,), daemon=True, name=f"hedge-{attempt.Index}").start()
+
+            Launch()
+
+            try:
+                while winner is None:
+                    canHedge = len(attempts) < len(self.Contexts)
+
+                    try:
+                        attempt, delta, e = events.get(timeout=self.HedgeDelay() if canHedge else None)
+
+                    except queue.Empty:
+                        Launch()
+                        continue
+
+                    if e is not None:
+                        failed += 1
+
+                        with self.Lock:
+                            self.Failures += 1
+
+                        if failed == len(self.Contexts):
+                            raise e
+
+                        if canHedge and failed == len(attempts):
+                            Launch()
+
+                        continue
+
+                    winner = attempt
+                    self.OnWin(attempt)
+
+                    for other in attempts:
+                        if other is not winner:
+                            other.Cancelled.set()
+
+                    if delta is StopIteration:
+                        break
+
+                    self.OnGenerate(delta)
+                    yield delta
+
+                while True:
+                    attempt, delta, e = events.get()
+
+                    if attempt is not winner:
+                        continue
+
+                    if e is not None:
+                        raise e
+
+                    if delta is StopIteration:
+                        break
+
+                    self.OnGenerate(delta)
+                    yield delta
+
+            # A failed or abandoned turn leaves the message queued, to be sent again by the next run
+            except BaseException:
+                self.Rollback(start)
+                raise
+
+            finally:
+                for attempt in attempts:
+                    attempt.Cancelled.set()
+
+            reply = winner.Context.Top()
+
+            self.Messages.append(reply)
+            self.QueuePointer += 1
+            self.CacheStore(key, reply.Content if isinstance(reply, Message) else reply.get("content"))
+
+    async def StreamAsync(self, message: Message | dict | None = None, *args, **kwargs) -> AsyncIterator[Any]:
+        if message is not None:
+            self.Prompt(message)
+
+        while self.QueuePointer < len(self.MessageQueue):
+            start = len(self.Messages)
+            self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+            key, content = self.CacheLookup()
+
+            if content is not None:
+                self.OnGenerate(content)
+                self.Messages.append(Message("assistant", content))
+                self.QueuePointer += 1
+
+                yield content
+                continue
+
+            with self.Lock:
+                self.Requests += 1
+
+            request = self.RequestMessages()
+            events: asyncio.Queue[tuple[Attempt, Any, Exception | None]] = asyncio.Queue()
+            attempts: list[Attempt] = []
+            winner: Attempt | None = None
+            failed = 0
+
+            async def Work(attempt: Attempt):
+                try:
+                    async for delta in attempt.Context.StreamAsync():
+                        self.OnFirstToken(attempt)
+                        events.put_nowait((attempt, delta, None))
+
+                    events.put_nowait((attempt, StopIteration, None))
+
+                except asyncio.CancelledError:
+                    self.OnFirstToken(attempt)
+                    raise
+
+                except Exception as e:
+                    events.put_nowait((attempt, None, e))
+
+            def Launch():
+                attempt = self.Begin(len(attempts), request)
+                attempt.Task = asyncio.create_task(Work(attempt))
+                attempts.append(attempt)
+
+            Launch()
+
+            try:
+                while winner is None:
+                    canHedge = len(attempts) < len(self.Contexts)
+
+                    try:
+                        attempt, delta, e = await asyncio.wait_for(events.get(), self.HedgeDelay() if canHedge else None)
+
+                    except asyncio.TimeoutError:
+                        Launch()
+                        continue
+
+                    if e is not None:
+                        failed += 1
+
+                        with self.Lock:
+                            self.Failures += 1
+
+                        if failed == len(self.Contexts):
+                            raise e
+
+                        if canHedge and failed == len(attempts):
+                            Launch()
+
+                        continue
+
+                    winner = attempt
+                    self.OnWin(attempt)
+
+                    # Cancelling the task closes the loser's provider response
+                    for other in attempts:
+                        if other is not winner and other.Task is not None:
+                            other.Task.cancel()
+
+                    if delta is StopIteration:
+                        break
+
+                    self.OnGenerate(delta)
+                    yield delta
+
+                while True:
+                    attempt, delta, e = await events.get()
+
+                    if attempt is not winner:
+                        continue
+
+                    if e is not None:
+                        raise e
+
+                    if delta is StopIteration:
+                        break
+
+                    self.OnGenerate(delta)
+                    yield delta
+
+            # A failed or abandoned turn leaves the message queued, to be sent again by the next run
+            except BaseException:
+                self.Rollback(start)
+                raise
+
+            finally:
+                for attempt in attempts:
+                    if attempt.Task is not None:
+                        attempt.Task.cancel()
+
+            reply = winner.Context.Top()
+
+            self.Messages.append(reply)
+            self.QueuePointer += 1
+            self.CacheStore(key, reply.Content if isinstance(reply, Message) else reply.get("content"))
+
+    def Run(self, *args, **kwargs):
+        for _ in self.Stream():
+            pass
+
+        return self
+
+    async def RunAsync(self, *args, **kwargs):
+        async for _ in self.StreamAsync():
+            pass
+
+        return self
+
+    def Stats(self) -> dict[str, Any]:
+        """
+        Get the hedging counters.
+
+        Returns:
+        - dict[str, Any]: Requests, hedges fired, hedges won, failed attempts and wins per backend.
+        """
+        delay = self.HedgeDelay()
+
+        with self.Lock:
+            return {
+                "requests": self.Requests,
+                "hedges": self.Hedges,
+                "hedge_wins": sum(self.Wins[1:]),
+                "failures": self.Failures,
+                "wins": list(self.Wins),
+                "delay": delay,
+            }
@@ -0,0 +1,190 @@
+import json
+import os
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+
+def EncodeRecord(message: Any) -> bytes:
+    """
+    Encode a message as one journal line.
+
+    Parameters:
+    - message (Message | dict): The message.
+
+    Returns:
+    - bytes: The compact JSON record, newline terminated.
+    """
+    data = message.ToDict() if hasattr(message, "ToDict") else message
+
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class MessageJournal:
+    """
+    An append-only JSONL file of messages, one record per line.
+    Appends are flushed to the OS immediately and fsynced in batches, so a crash of the process
+    loses nothing and a power loss at most the last unsynced batch. A torn trailing record left by
+    an interrupted write is ignored when reading and cut off before the next append.
+    """
+    def __init__(self, path: str, syncEvery: int = 64, syncInterval: float | None = 1.0):
+        """
+        Initialize a MessageJournal object.
+
+        Parameters:
+        - path (str): The journal file path.
+        - syncEvery (int): Number of appended records after which the file is fsynced.
+        - syncInterval (float | None): Seconds after which pending records are fsynced on the next append. None to sync by count only.
+        """
+        self.Path: str = path
+        self.SyncEvery: int = syncEvery
+        self.SyncInterval: float | None = syncInterval
+        self.File: Any = None
+        self.Count: int = 0
+        self.Pending: int = 0
+        self.LastSync: float = time.monotonic()
+
+    def Open(self):
+        """
+        Open the journal for appending, recovering from a torn trailing record.
+        """
+        if self.File is not None:
+            return
+
+        self.File = open(self.Path, "ab+")
+        self.File.seek(0)
+
+        count = 0
+        end = 0
+        offset = 0
+
+        while chunk := self.File.read(1 << 20):
+            count += chunk.count(b"\n")
+            last = chunk.rfind(b"\n")
+
+            if last != -1:
+                end = offset + last + 1
+
+            offset += len(chunk)
+
+        if end != offset:
+            self.File.truncate(end)
+
+        self.Count = count
+
+    def Append(self, messages: Iterable[Any]) -> int:
+        """
+        Append messages to the journal.
+
+        Parameters:
+        - messages (Iterable[Message | dict]): The messages to append.
+
+        Returns:
+        - int: The number of records appended.
+        """
+        self.Open()
+
+        records = [EncodeRecord(message) for message in messages]
+
+        if not records:
+            return 0
+
+        self.File.write(b"".join(records))
+        self.File.flush()
+
+        self.Count += len(records)
+        self.Pending += len(records)
+
+        if self.Pending >= self.SyncEvery or (self.SyncInterval is not None and time.monotonic() - self.LastSync >= self.SyncInterval):
+            self.Sync()
+
+        return len(records)
+
+    def Sync(self):
+        """
+        Flush pending records to disk.
+        """
+        if self.File is not None and self.Pending:
+            self.File.flush()
+            os.fsync(self.File.fileno())
+
+        self.Pending = 0
+        self.LastSync = time.monotonic()
+
+    def Read(self, factory: Callable[[dict], Any] | None = None) -> Iterator[Any]:
+        """
+        Stream the records of the journal without loading the whole file.
+
+        Parameters:
+        - factory (Callable[[dict], Any] | None): Builds a message from each record. None to yield dictionaries.
+
+        Returns:
+        - Iterator[Any]: The messages, in the order they were appended.
+        """
+        if not os.path.exists(self.Path):
+            return
+
+        with open(self.Path, "rb") as fp:
+            for line in fp:
+                # A torn record can only be the last one
+                if not line.endswith(b"\n"):
+                    break
+
+                data = json.loads(line)
+
+                yield factory(data) if factory is not None else data
+
+    def Compact(self, messages: Iterable[Any]):
+        """
+        Atomically replace the journal with the given messages, dropping history that was
+        edited or removed since it was appended.
+
+        Parameters:
+        - messages (Iterable[Message | dict]): The messages the journal should hold.
+        """
+        self.Close()
+
+        temporary = f"{self.Path}.compact"
+        count = 0
+
+        with open(temporary, "wb") as fp:
+            for message in messages:
+                fp.write(EncodeRecord(message))
+                count += 1
+
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        os.replace(temporary, self.Path)
+
+        # Make the rename itself durable
+        if hasattr(os, "O_DIRECTORY"):
+            directory = os.open(os.path.dirname(os.path.abspath(self.Path)), os.O_RDONLY | os.O_DIRECTORY)
+
+            try:
+                os.fsync(directory)
+
+            finally:
+                os.close(directory)
+
+        self.File = open(self.Path, "ab+")
+        self.Count = count
+
+    def Close(self):
+        """
+        Sync and close the journal file.
+        """
+        if self.File is not None:
+            self.Sync()
+            self.File.close()
+            self.File = None
+
+    def __enter__(self):
+        self.Open()
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def __len__(self) -> int:
+        self.Open()
+        return self.Count
@@ -1,12 +1,28 @@
 from logging import WARN
-from typing import Callable, Any
+from typing import Callable, Any, Iterator, AsyncIterator, Sequence, SupportsIndex
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import hashlib
+import inspect
 from dataclasses import dataclass
 import json
+import operator
+import os
+import weakref
+from tinytune.cache import ResponseCache
+from tinytune.scheduler import RequestScheduler, EstimateTokens
+from tinytune.journal import MessageJournal
+from tinytune.metrics import Instruments, NoSpan, Dispatching
 
 class Message:
     """
     Represents a message with a role and content.
+    Messages are slotted; their wire-format dictionary is built on first use and kept in sync
+    when the role or content change, so serializing a message never copies it.
     """
+    __slots__ = ("_Role", "_Content", "_Wire", "_Owners")
+
     def __init__(self, role: str, content: str):
         """
         Initialize a Message object.
@@ -15,23 +31,303 @@ class Message:
         - role (str): The role of the message.
         - content (str): The content of the message.
         """
-        self.Role = role
-        self.Content = content
+        self._Role = role
+        self._Content = content
+        self._Wire: dict | None = None
+        # Weak references to the histories holding the serialized message, told about in-place edits
+        self._Owners: list[weakref.ref] | None = None
+
+    @property
+    def Role(self) -> str:
+        return self._Role
+
+    @Role.setter
+    def Role(self, role: str):
+        self._Role = role
+
+        if self._Wire is not None:
+            self._Wire["role"] = role
+            self.Edited()
+
+    @property
+    def Content(self) -> str:
+        return self._Content
+
+    @Content.setter
+    def Content(self, content: str):
+        self._Content = content
+
+        if self._Wire is not None:
+            self._Wire["content"] = content
+            self.Edited()
+
+    def Watch(self, owner: Any):
+        """
+        Register a history to be told when the message is edited in place.
+
+        Parameters:
+        - owner (Any): The history. Its Edits counter is bumped on every edit.
+        """
+        if self._Owners is None:
+            self._Owners = []
+
+        elif any(reference() is owner for reference in self._Owners):
+            return
+
+        self._Owners.append(weakref.ref(owner))
+
+    def Edited(self):
+        # Histories that were collected are dropped along the way
+        owners = [reference for reference in self._Owners or () if reference() is not None]
 
-    def ToDict(self):
+        for reference in owners:
+            owner = reference()
+
+            if owner is not None:
+                owner.Edits += 1
+
+        self._Owners = owners or None
+
+    def ToDict(self) -> dict:
         """
         Convert the message to a dictionary.
+        The dictionary is shared with the message and must be treated as read-only.
 
         Returns:
         - dict: A dictionary representation of the message.
         """
-        return {
-            "role": self.Role,
-            "content": self.Content
-        }
+        if self._Wire is None:
+            self._Wire = {
+                "role": self._Role,
+                "content": self._Content
+            }
+
+        return self._Wire
+
+    @classmethod
+    def FromDict(cls, data: dict) -> Any:
+        """
+        Create a message from its dictionary representation.
+
+        Parameters:
+        - data (dict): The dictionary, as returned by ToDict.
+
+        Returns:
+        - Message: The message.
+        """
+        return cls(data["role"], data["content"])
 
     def __iter__(self):
-        yield from [ (item[0].lower(), item[1]) for item in self.__dict__.items() ]
+        return iter(self.ToDict().items())
+
+    def __getstate__(self):
+        state = object.__getstate__(self)
+
+        # Copies and unpickled messages build their own wire dictionary and belong to no history
+        if isinstance(state, tuple) and state[1]:
+            state[1]["_Wire"] = None
+            state[1]["_Owners"] = None
+
+        return state
+
+
+def GetContent(message: Message | dict | Any) -> Any:
+    """
+    Get the content of a message.
+
+    Parameters:
+    - message (Message | dict | Any): The message.
+
+    Returns:
+    - Any: The content of the message, or the message itself if it has no content.
+    """
+    if isinstance(message, Message):
+        return message.Content
+
+    if isinstance(message, dict):
+        return message.get("content")
+
+    return message
+
+
+def SerializeMessage(message: Message | dict, owner: Any = None) -> dict:
+    """
+    Convert a message to the wire format sent to the provider.
+
+    Parameters:
+    - message (Message | dict): The message to convert.
+    - owner (Any): The history the message is serialized for, told when the message is edited in place.
+
+    Returns:
+    - dict: The message as a dictionary. Dictionaries are returned as is.
+    """
+    if isinstance(message, dict):
+        return message
+
+    if isinstance(message, Message):
+        if owner is not None:
+            message.Watch(owner)
+
+        return message.ToDict()
+
+    if hasattr(message, "ToDict"):
+        return message.ToDict()
+
+    return dict(message)
+
+
+def ChainDigest(previous: bytes, message: dict) -> bytes:
+    """
+    Chain a wire-format message onto the digest of the messages before it.
+
+    Parameters:
+    - previous (bytes): The digest of the preceding messages. Empty for the first message.
+    - message (dict): The message, in wire format.
+
+    Returns:
+    - bytes: The digest of the messages up to and including this one.
+    """
+    encoded = json.dumps(message, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+    return hashlib.blake2b(previous + encoded, digest_size=16).digest()
+
+
+class MessageHistory(list):
+    """
+    A list of messages that keeps a cached wire-format view of its contents.
+    Appended messages are serialized once, when the view is next requested; any other
+    mutation invalidates the view from the first index it touches. Edits made to a Message
+    in place are reflected through its shared wire dictionary.
+    """
+    def __init__(self, messages=()):
+        """
+        Initialize a MessageHistory object.
+
+        Parameters:
+        - messages (Iterable): The initial messages.
+        """
+        super().__init__(messages)
+        self.WireMessages: list[dict] = []
+        self.Synced: int = 0
+        self.Digests: list[bytes] = []
+        self.Hashed: int = 0
+        # Bumped by the messages of the history when they're edited in place
+        self.Edits: int = 0
+        self.HashedEdits: int = 0
+        self.Persisted: int = 0
+        self.PersistedEdits: int = 0
+        self.Tokens: Any = None
+        self.Counted: int = 0
+
+    def Invalidate(self, index: int = 0):
+        """
+        Invalidate the cached wire view from an index onwards.
+
+        Parameters:
+        - index (int): The first index whose wire entry is stale.
+        """
+        self.Synced = min(self.Synced, max(index, 0))
+        self.Persisted = min(self.Persisted, max(index, 0))
+        self.Counted = min(self.Counted, max(index, 0))
+
+    def IndexOf(self, index: SupportsIndex | slice) -> int:
+        # First index a mutation can change. Empty simple slices still insert at their start
+        if isinstance(index, slice):
+            if index.step in (None, 1):
+                return index.indices(len(self))[0]
+
+            return min(range(*index.indices(len(self))), default=len(self))
+
+        index = operator.index(index)
+
+        return index + len(self) if index < 0 else index
+
+    def Wire(self) -> list[dict]:
+        """
+        Get the wire-format view of the history. Only messages appended or changed since the last
+        call are serialized. The returned list is owned by the history and must not be modified.
+
+        Returns:
+        - list[dict]: The serialized messages.
+        """
+        wire = self.WireMessages
+
+        if self.Synced < len(wire):
+            del wire[self.Synced:]
+
+        self.Hashed = min(self.Hashed, self.Synced)
+
+        if len(wire) < len(self):
+            wire.extend(SerializeMessage(message, self) for message in self[len(wire):])
+
+        self.Synced = len(wire)
+
+        return wire
+
+    def Digest(self) -> str:
+        """
+        Get a stable hash of the history. Each message is chained onto the hash of the messages
+        before it, so only messages appended or changed since the last call are hashed.
+        Dictionary messages are assumed not to be edited in place once they have been hashed.
+
+        Returns:
+        - str: The hex digest of the history.
+        """
+        wire = self.Wire()
+        digests = self.Digests
+
+        # A message of the history was edited in place, so the chain can't be trusted
+        if self.HashedEdits != self.Edits:
+            self.Hashed = 0
+            self.HashedEdits = self.Edits
+
+        del digests[self.Hashed:]
+
+        previous = digests[-1] if digests else b""
+
+        for message in wire[len(digests):]:
+            previous = ChainDigest(previous, message)
+            digests.append(previous)
+
+        self.Hashed = len(digests)
+
+        return previous.hex()
+
+    def __setitem__(self, index, value):
+        self.Invalidate(self.IndexOf(index))
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self.Invalidate(self.IndexOf(index))
+        super().__delitem__(index)
+
+    def __imul__(self, value):
+        self.Invalidate(0)
+        return super().__imul__(value)
+
+    def insert(self, index, value):
+        self.Invalidate(self.IndexOf(index))
+        super().insert(index, value)
+
+    def pop(self, index: SupportsIndex = -1):
+        self.Invalidate(self.IndexOf(index))
+        return super().pop(index)
+
+    def remove(self, value):
+        self.Invalidate(self.index(value))
+        super().remove(value)
+
+    def clear(self):
+        self.Invalidate(0)
+        super().clear()
+
+    def sort(self, *args, **kwargs):
+        self.Invalidate(0)
+        super().sort(*args, **kwargs)
+
+    def reverse(self):
+        self.Invalidate(0)
+        super().reverse()
 
 
 class Model:
@@ -49,10 +345,37 @@ class Model:
         self.Owner: str = owner
         self.Name: str = name
 
+class BatchResult:
+    """
+    Represents the outcome of one conversation in a batch run.
+    """
+    def __init__(self, index: int, context: Any = None, result: Any = None, error: Exception | None = None):
+        """
+        Initialize a BatchResult object.
+
+        Parameters:
+        - index (int): Position of the conversation in the batch.
+        - context (LLMContext | None): The context the conversation ran in.
+        - result (Any): The final message of the conversation.
+        - error (Exception | None): The exception raised while running the conversation, if any.
+        """
+        self.Index: int = index
+        self.Context: Any = context
+        self.Result: Any = result
+        self.Error: Exception | None = error
+
+    @property
+    def Ok(self) -> bool:
+        return self.Error is None
+
+
 class LLMContext[MessageType]:
     """
     Represents a context for a language model with support for a specific message type.
     """
+    # Type stored messages are loaded as
+    MessageClass: type = Message
+
     def __init__(self, model: Model):
         """
         Initialize an LLMContext object.
@@ -60,12 +383,162 @@ class LLMContext[MessageType]:
         Parameters:
         - model (Model): The model associated with the context.
         """
-        self.Messages: list[MessageType | dict] = []
+        self.Messages = MessageHistory()
         self.MessageQueue: list[MessageType | dict] = []
         self.Model: Model = model
         self.QueuePointer: int = 0
         self.CallbackStack: dict[int, list[Callable]] = {}
+        self.Cache: ResponseCache | None = None
+        self.Scheduler: RequestScheduler | None = None
+        self.Journal: MessageJournal | None = None
+        # A ContextWindow limiting the messages sent with each request
+        self.Window: Any = None
+        # A Summarizer folding older turns into a summary
+        self.Summarizer: Any = None
+
+    @property
+    def Messages(self) -> Any:
+        """
+        The conversation history: a MessageHistory, or a history such as a MessageTree or
+        StoredMessages. Assigned lists are wrapped in a MessageHistory; histories are used as they are.
+        """
+        return self.History
+
+    @Messages.setter
+    def Messages(self, messages: Sequence[MessageType | dict]):
+        self.History: Any = messages if hasattr(messages, "Wire") else MessageHistory(messages)
+
+    def Spawn(self) -> Any:
+        """
+        Create a context with the same configuration and client, and an empty conversation.
+
+        Returns:
+        - Any: The new LLMContext object.
+        """
+        context = copy.copy(self)
+
+        context.Messages = MessageHistory()
+        context.MessageQueue = []
+        context.QueuePointer = 0
+        context.CallbackStack = {}
+        context.Journal = None
+
+        if self.Summarizer is not None:
+            context.Summarizer = self.Summarizer.Spawn()
+
+        return context
+
+    def Fork(self) -> Any:
+        """
+        Create a context that continues the conversation independently of this one.
+        The history is turned into a MessageTree on the first fork; from then on forking is O(1),
+        and both contexts share every message so far. Queued messages that haven't run yet are
+        carried over with their callbacks.
+
+        Returns:
+        - Any: The new LLMContext object.
+        """
+        # Imported here since the tree builds on the history classes of this module
+        from tinytune.tree import MessageTree
+
+        if not isinstance(self.Messages, MessageTree):
+            self.Messages = MessageTree(self.Messages)
+
+        context = copy.copy(self)
+
+        context.Messages = self.Messages.Fork()
+        context.MessageQueue = self.MessageQueue[self.QueuePointer:]
+        context.QueuePointer = 0
+        context.CallbackStack = { key - self.QueuePointer: list(callbacks) for key, callbacks in self.CallbackStack.items() if key >= self.QueuePointer }
+        context.Journal = None
+
+        if self.Summarizer is not None:
+            context.Summarizer = self.Summarizer.Spawn()
+
+        return context
+
+    def PrefixKey(self) -> str | None:
+        """
+        Get the key of the prefix this conversation shares with its forks, for provider-side prompt caching.
+
+        Returns:
+        - str | None: The key, or None if the conversation was never forked.
+        """
+        prefixKey = getattr(self.Messages, "PrefixKey", None)
+
+        return prefixKey() if prefixKey is not None else None
+
+    def PrepareBatchItem(self, messages: list[MessageType | dict]) -> Any:
+        """
+        Create the context a batch conversation runs in. All but the last message become the
+        history and the last one is queued, so each conversation costs a single request.
+
+        Parameters:
+        - messages (list[MessageType | dict]): The messages of the conversation.
+
+        Returns:
+        - Any: The LLMContext object.
+        """
+        context = self.Spawn()
+
+        context.Messages.extend(messages[:-1])
+
+        if messages:
+            context.Prompt(messages[-1])
+
+        return context
+
+    def RunBatch(self, batch: list[list[MessageType | dict]], concurrency: int = 8, *args, **kwargs) -> list[BatchResult]:
+        """
+        Run many independent conversations through contexts spawned from this one, on a bounded thread pool.
+
+        Parameters:
+        - batch (list[list[MessageType | dict]]): The messages of each conversation.
+        - concurrency (int): Maximum number of conversations in flight.
+
+        Returns:
+        - list[BatchResult]: One result per conversation, in batch order. Failures are captured in BatchResult.Error.
+        """
+        def RunItem(index: int, messages: list[MessageType | dict]) -> BatchResult:
+            context = self.PrepareBatchItem(messages)
+
+            try:
+                context.Run(*args, **kwargs)
+
+                return BatchResult(index, context, context.Top())
+
+            except Exception as e:
+                return BatchResult(index, context, None, e)
+
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+            return list(pool.map(RunItem, range(len(batch)), batch))
 
+    async def RunBatchAsync(self, batch: list[list[MessageType | dict]], concurrency: int = 64, *args, **kwargs) -> list[BatchResult]:
+        """
+        Asynchronous counterpart of RunBatch, with at most concurrency conversations in flight on the event loop.
+
+        Parameters:
+        - batch (list[list[MessageType | dict]]): The messages of each conversation.
+        - concurrency (int): Maximum number of conversations in flight.
+
+        Returns:
+        - list[BatchResult]: One result per conversation, in batch order. Failures are captured in BatchResult.Error.
+        """
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def RunItem(index: int, messages: list[MessageType | dict]) -> BatchResult:
+            async with semaphore:
+                context = self.PrepareBatchItem(messages)
+
+                try:
+                    await context.RunAsync(*args, **kwargs)
+
+                    return BatchResult(index, context, context.Top())
+
+                except Exception as e:
+                    return BatchResult(index, context, None, e)
+
+        return list(await asyncio.gather(*[RunItem(index, messages) for index, messages in enumerate(batch)]))
 
     def Top(self) -> MessageType | dict:
         """
@@ -75,6 +548,17 @@ class LLMContext[MessageType]:
         """
         return self.Messages[len(self.Messages) - 1]
 
+    def Rollback(self, length: int):
+        """
+        Remove the messages a failed turn added to the history, so a truncated reply never becomes part
+        of it. The queue pointer isn't advanced by a failed turn, so its message is sent again by the next run.
+
+        Parameters:
+        - length (int): The length of the history before the turn.
+        """
+        if len(self.Messages) > length:
+            del self.Messages[length:]
+
     def Prompt(self, message: MessageType | dict) -> Any:
         """
         Add a message to the message queue.
@@ -88,23 +572,132 @@ class LLMContext[MessageType]:
         self.MessageQueue.append(message)
         return self
 
-    def Save(self, promptFile: str = "prompts.json") -> Any:
+    def LoadMessages(self, promptFile: str = "prompts.json") -> None:
+        """
+        Load messages into the context from a JSON file, or stream them from a JSONL journal.
+        A loaded journal is kept open, so later calls to Save only append new messages to it.
+
+        Parameters:
+        - promptFile (str): The file path to load the messages from.
+        """
+        self.PromptFile = promptFile
+
+        if promptFile.endswith(".jsonl"):
+            journal = MessageJournal(promptFile)
+
+            self.Messages = MessageHistory(journal.Read(self.LoadMessage))
+            self.Messages.Persisted = len(self.Messages)
+            self.Journal = journal
+
+            return
+
+        with open(promptFile, "r") as fp:
+            self.Messages = [ self.LoadMessage(message) for message in json.load(fp) ]
+
+    def OpenStore(self, path: str, **kwargs) -> Any:
+        """
+        Use a memory-mapped conversation store as the history. Messages are read lazily from the
+        store and new ones are appended to it.
+
+        Parameters:
+        - path (str): The store's data file path. Existing JSONL journals can be opened as stores.
+        - **kwargs: Options passed to ConversationStore.
+
+        Returns:
+        - Any: The LLMContext object.
+        """
+        # Imported here since the store builds on the history classes of this module
+        from tinytune.store import ConversationStore, StoredMessages
+
+        if self.Journal is not None:
+            self.Journal.Close()
+            self.Journal = None
+
+        self.PromptFile = path
+        self.Messages = StoredMessages(ConversationStore(path, **kwargs), self.LoadMessage)
+
+        return self
+
+    def LoadMessage(self, data: dict) -> MessageType | dict:
+        """
+        Create a message of the context's message type from a stored dictionary. Dictionaries with
+        fields beyond role and content are kept as they are, so no data is lost.
+
+        Parameters:
+        - data (dict): The stored message.
+
+        Returns:
+        - MessageType | dict: The message.
+        """
+        if data.keys() != {"role", "content"}:
+            return data
+
+        return self.MessageClass.FromDict(data)
+
+    def Save(self, promptFile: str = "prompts.json", sync: bool = False) -> Any:
         """
-        Save the messages in the context to a JSON file.
+        Save the messages in the context to a JSON file, or to an append-only JSONL journal if the
+        path ends in .jsonl. Journals are only appended the messages added since the last save,
+        and are compacted when earlier messages were edited or removed.
 
         Parameters:
         - promptFile (str): The file path to save the messages to.
+        - sync (bool): Flush a journal to disk before returning, instead of in batches.
 
         Returns:
         - Any: The LLMContext object.
         """
         try:
+            if promptFile.endswith(".jsonl"):
+                self.SaveJournal(promptFile, sync)
+                return self
+
             with open(promptFile, "w") as fp:
-                json.dump([ message.ToDict() if type(message) == MessageType else message for message in self.Messages ], fp, indent=2)
+                json.dump(self.Messages.Wire(), fp, indent=2)
 
         except Exception as e:
             print(f"An error occurred in saving messages: {e.args[0]}")
-            return self
+
+        return self
+
+    def SaveJournal(self, path: str, sync: bool = False):
+        """
+        Bring a JSONL journal up to date with the history.
+
+        Parameters:
+        - path (str): The journal file path.
+        - sync (bool): Flush the journal to disk before returning.
+        """
+        history = self.Messages
+        store = getattr(history, "Store", None)
+
+        # A stored history is already on disk
+        if store is not None and os.path.abspath(store.Path) == os.path.abspath(path):
+            if sync:
+                store.Sync()
+
+            return
+
+        if self.Journal is None or self.Journal.Path != path:
+            if self.Journal is not None:
+                self.Journal.Close()
+
+            # A journal the history wasn't loaded from may hold anything, so it starts from a full write
+            self.Journal = MessageJournal(path)
+            history.Persisted = -1
+
+        journal = self.Journal
+
+        if history.Persisted != len(journal) or history.PersistedEdits != history.Edits:
+            journal.Compact(history.Wire())
+        else:
+            journal.Append(history.Wire()[history.Persisted:])
+
+        history.Persisted = len(history)
+        history.PersistedEdits = history.Edits
+
+        if sync:
+            journal.Sync()
 
     def Then(self, callback: Callable):
         key = len(self.MessageQueue) - 1
@@ -117,6 +710,153 @@ class LLMContext[MessageType]:
 
         return self
 
+    def Stream(self, message: MessageType | dict | None = None, *args, **kwargs) -> Iterator[Any]:
+        """
+        Run the queued messages and yield the generated content as it arrives.
+        Contexts that don't generate incrementally yield the final response as a single delta.
+
+        Parameters:
+        - message (MessageType | dict | None): An optional message to queue before running.
+
+        Returns:
+        - Iterator[Any]: The generated deltas.
+        """
+        if message is not None:
+            self.Prompt(message)
+
+        self.Run(*args, **kwargs)
+
+        yield GetContent(self.Top())
+
+    async def StreamAsync(self, message: MessageType | dict | None = None, *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Asynchronous counterpart of Stream.
+
+        Parameters:
+        - message (MessageType | dict | None): An optional message to queue before running.
+
+        Returns:
+        - AsyncIterator[Any]: The generated deltas.
+        """
+        if message is not None:
+            self.Prompt(message)
+
+        await self.RunAsync(*args, **kwargs)
+
+        yield GetContent(self.Top())
+
+    def CacheLookup(self) -> tuple[str | None, Any | None]:
+        """
+        Look up the response to the current history in the response cache.
+        A cache should only be set on contexts whose requests are deterministic, e.g. temperature=0.
+
+        Returns:
+        - tuple[str | None, Any | None]: The cache key, or None when caching is disabled, and the cached response, or None on a miss.
+        """
+        if self.Cache is None:
+            return None, None
+
+        messages = self.RequestMessages()
+        digest = getattr(self.Messages, "Digest", None)
+
+        # When the whole history is sent, its incrementally built digest stands in for the messages
+        key = self.Cache.Key(self.CacheRequest(messages), digest() if digest is not None and messages is self.Messages.Wire() else None)
+
+        return key, self.Cache.Get(key)
+
+    def CacheRequest(self, messages: list[dict]) -> dict:
+        """
+        Get the request body response cache keys are built from. Contexts sending more than the model
+        and messages, such as tools or sampling options, include them here.
+
+        Parameters:
+        - messages (list[dict]): The messages sent with the request.
+
+        Returns:
+        - dict: The request body.
+        """
+        return {"model": self.Model.Name, "messages": messages}
+
+    def CacheStore(self, key: str | None, response: Any):
+        """
+        Store the response to a history in the response cache.
+
+        Parameters:
+        - key (str | None): The key returned by CacheLookup.
+        - response (Any): The response to cache.
+        """
+        if key is not None and self.Cache is not None:
+            self.Cache.Set(key, response)
+
+    def PromptTokens(self) -> int:
+        """
+        Estimate the number of tokens the current history costs as a prompt.
+
+        Returns:
+        - int: The estimated token count.
+        """
+        return EstimateTokens(self.RequestMessages())
+
+    def RequestMessages(self) -> list[dict]:
+        """
+        Get the wire-format messages to send with the next request, with older turns summarized and
+        limited to the context window when a summarizer or window is set.
+
+        Returns:
+        - list[dict]: The messages.
+        """
+        if self.Summarizer is not None:
+            messages = self.Summarizer.Apply(self.Messages)
+
+            if self.Window is None:
+                return messages
+
+            # Counted incrementally while nothing is summarized yet
+            return self.Window.Apply(self.Messages) if messages is self.Messages.Wire() else self.Window.Fit(messages)
+
+        if self.Window is not None:
+            return self.Window.Apply(self.Messages)
+
+        return self.Messages.Wire()
+
+    def Submit(self, request: Callable[[], Any], span: Any = NoSpan, hold: bool = False) -> Any:
+        """
+        Send a provider request, through the scheduler when one is set.
+
+        Parameters:
+        - request (Callable[[], Any]): Sends the request and returns the response.
+        - span (Span | NullSpan): The request's span, marked when the request leaves the scheduler queue.
+        - hold (bool): Keep the scheduler's concurrency slot after the request, until the caller releases it with Scheduler.Release().
+
+        Returns:
+        - Any: The response.
+        """
+        if self.Scheduler is None:
+            span.Dispatch()
+
+            return request()
+
+        return self.Scheduler.Submit(Dispatching(request, span), self.PromptTokens() if self.Scheduler.Tokens is not None else 0, hold)
+
+    async def SubmitAsync(self, request: Callable[[], Any], span: Any = NoSpan, hold: bool = False) -> Any:
+        """
+        Asynchronous counterpart of Submit.
+
+        Parameters:
+        - request (Callable[[], Awaitable[Any]]): Sends the request and returns the response.
+        - span (Span | NullSpan): The request's span, marked when the request leaves the scheduler queue.
+        - hold (bool): Keep the scheduler's concurrency slot after the request, until the caller releases it.
+
+        Returns:
+        - Any: The response.
+        """
+        if self.Scheduler is None:
+            span.Dispatch()
+
+            return await request()
+
+        return await self.Scheduler.SubmitAsync(Dispatching(request, span), self.PromptTokens() if self.Scheduler.Tokens is not None else 0, hold)
+
     def OnGenerate(self, content: Any):
         return
 
@@ -124,6 +864,16 @@ class LLMContext[MessageType]:
 
         return
 
+    async def OnRunAsync(self, *args, **kwargs) -> Any:
+        """
+        Asynchronous counterpart of OnRun. By default OnRun is executed on a worker thread,
+        so contexts that only implement OnRun can still be awaited without blocking the event loop.
+
+        Returns:
+        - Any: Result of running the model.
+        """
+        return await asyncio.to_thread(self.OnRun, *args, **kwargs)
+
     def Run(self, *args, **kwargs):
         """
         Placeholder method for running the model.
@@ -131,22 +881,85 @@ class LLMContext[MessageType]:
         Returns:
         - Any: Result of running the model.
         """
-        while self.QueuePointer < len(self.MessageQueue):
-            self.Messages.append(self.MessageQueue[self.QueuePointer])
+        with Instruments.Start("run", model=self.Model.Name):
+            while self.QueuePointer < len(self.MessageQueue):
+                start = len(self.Messages)
+                self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+                key, result = self.CacheLookup()
+
+                if result is None:
+                    try:
+                        with Instruments.Start("request", model=self.Model.Name) as span:
+                            result = self.Submit(lambda: self.OnRun(args, kwargs), span)
+
+                    except BaseException:
+                        self.Rollback(start)
+                        raise
+
+                    self.CacheStore(key, result)
+                else:
+                    result = copy.copy(result)
+
+                callbacks = self.CallbackStack.get(self.QueuePointer)
+
+                if callbacks:
+                    result = self.Messages[-1]
+
+                    for callback in callbacks:
+                        with Instruments.Start("callback", model=self.Model.Name):
+                            result = callback(self, result)
+
+                    self.CallbackStack.pop(self.QueuePointer)
+
+                self.Messages.append(result)
+                self.QueuePointer += 1
+
+        return self
+
+    async def RunAsync(self, *args, **kwargs):
+        """
+        Asynchronous counterpart of Run. Processes the message queue with the same
+        Prompt/Then semantics, awaiting OnRunAsync and any coroutine callbacks.
+
+        Returns:
+        - Any: The LLMContext object.
+        """
+        with Instruments.Start("run", model=self.Model.Name):
+            while self.QueuePointer < len(self.MessageQueue):
+                start = len(self.Messages)
+                self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+                key, result = self.CacheLookup()
+
+                if result is None:
+                    try:
+                        with Instruments.Start("request", model=self.Model.Name) as span:
+                            result = await self.SubmitAsync(lambda: self.OnRunAsync(args, kwargs), span)
+
+                    except BaseException:
+                        self.Rollback(start)
+                        raise
+
+                    self.CacheStore(key, result)
+                else:
+                    result = copy.copy(result)
 
-            result = self.OnRun(args, kwargs)
+                callbacks = self.CallbackStack.get(self.QueuePointer)
 
-            callbacks = self.CallbackStack.get(self.QueuePointer)
+                if callbacks:
+                    result = self.Messages[-1]
 
-            if callbacks:
-                result = self.Messages[-1]
+                    for callback in callbacks:
+                        with Instruments.Start("callback", model=self.Model.Name):
+                            result = callback(self, result)
 
-                for callback in callbacks:
-                    result = callback(self, result)
+                            if inspect.isawaitable(result):
+                                result = await result
 
-                self.CallbackStack.pop(self.QueuePointer)
+                    self.CallbackStack.pop(self.QueuePointer)
 
-            self.Messages.append(result)
-            self.QueuePointer += 1
+                self.Messages.append(result)
+                self.QueuePointer += 1
 
         return self
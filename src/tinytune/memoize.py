@@ -0,0 +1,353 @@
+import asyncio
+import enum
+import hashlib
+import inspect
+import json
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Any, Callable
+
+from tinytune.cache import MemoryCache, ResponseCache, SQLiteCache
+from tinytune.prompt import PromptJob
+from tinytune.tool import JobParameters
+
+
+def NormalizeValue(value: Any) -> Any:
+    """
+    Convert a value JSON can't encode into one it can, for building cache keys.
+
+    Parameters:
+    - value (Any): The value.
+
+    Returns:
+    - Any: Sets as sorted lists, enums as their values.
+    """
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+
+    if isinstance(value, enum.Enum):
+        return value.value
+
+    # Anything else has no stable key, e.g. objects whose repr is their address
+    raise TypeError(f"Unkeyable argument of type {type(value).__name__}.")
+
+
+# Built once, since json.dumps builds an encoder per call when given options
+KeyEncoder: json.JSONEncoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=NormalizeValue)
+
+
+class Memoized:
+    """
+    Caches the results of a tool by its arguments. Calls are bound to the tool's signature with its
+    defaults applied, so positional, keyword and omitted-default calls share a key. Concurrent calls
+    with the same key are deduplicated: one runs, the others wait for its result. Failures aren't cached,
+    and calls with arguments that have no stable key, e.g. arbitrary objects, bypass the cache.
+    A PromptJob is also keyed by its previous result, its initialization arguments and the model and
+    conversation of its context, so a job is only answered from the cache in the same state.
+    Results are shared between callers and must not be modified.
+    """
+    def __init__(
+        self,
+        function: Callable,
+        ttl: float | None = None,
+        maxSize: int | None = 1024,
+        cache: ResponseCache | str | None = None,
+        ignore: tuple[str, ...] = (),
+        name: str | None = None,
+    ):
+        """
+        Initialize a Memoized object.
+
+        Parameters:
+        - function (Callable | PromptJob): The tool. Coroutine functions are supported.
+        - ttl (float | None): Seconds a result stays valid. None for no expiry.
+        - maxSize (int | None): Maximum number of results kept by the cache created here. None for no limit.
+        - cache (ResponseCache | str | None): The cache backend, or the path of an SQLite cache file. Defaults to an in-memory LRU cache.
+        - ignore (tuple[str, ...]): Parameters left out of the key, e.g. "self".
+        - name (str | None): The name keys are prefixed with, so tools can share a cache. Defaults to the tool's name.
+        """
+        callback = function.Callback if isinstance(function, PromptJob) else function
+        signature = inspect.signature(callback)
+
+        # Jobs fill in their own parameters, so calls only bind the rest
+        if isinstance(function, PromptJob):
+            signature = signature.replace(parameters=[parameter for parameter in signature.parameters.values() if parameter.name not in JobParameters])
+
+        if isinstance(cache, str):
+            cache = SQLiteCache(cache, maxSize=maxSize)
+
+        self.Function: Callable = function
+        self.Job: PromptJob | None = function if isinstance(function, PromptJob) else None
+        self.Signature: inspect.Signature = signature
+
+        parameters = list(signature.parameters.values())
+
+        # Signatures without *args, **kwargs or positional-only parameters are bound without inspect
+        self.Simple: bool = all(parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY) for parameter in parameters)
+        self.Positional: tuple[str, ...] = tuple(parameter.name for parameter in parameters if parameter.kind == parameter.POSITIONAL_OR_KEYWORD)
+        self.Names: frozenset[str] = frozenset(parameter.name for parameter in parameters)
+        self.Required: frozenset[str] = frozenset(parameter.name for parameter in parameters if parameter.default is parameter.empty)
+        self.Defaults: dict[str, Any] = {parameter.name: parameter.default for parameter in parameters if parameter.default is not parameter.empty}
+        self.Cache: ResponseCache = cache if cache is not None else MemoryCache(maxSize)
+        self.TTL: float | None = ttl
+        self.Ignore: frozenset[str] = frozenset(ignore)
+        self.Name: str = name or getattr(function, "__name__", None) or callback.__name__
+        self.IsCoroutine: bool = inspect.iscoroutinefunction(callback)
+
+        self.Lock: threading.Lock = threading.Lock()
+        self.Flights: dict[str, Future] = {}
+
+        self.Hits: int = 0
+        self.Misses: int = 0
+        self.Shared: int = 0
+        self.Bypassed: int = 0
+
+        self.__name__ = self.Name
+        self.__doc__ = callback.__doc__
+        self.__wrapped__ = function
+
+        if self.IsCoroutine:
+            inspect.markcoroutinefunction(self)
+
+    def Key(self, args: tuple, kwargs: dict) -> str | None:
+        """
+        Build the cache key of a call.
+
+        Parameters:
+        - args (tuple): The positional arguments.
+        - kwargs (dict): The keyword arguments.
+
+        Returns:
+        - str | None: The key, or None if the arguments don't bind to the signature or can't be keyed.
+        """
+        arguments = self.Bind(args, kwargs)
+
+        if arguments is None:
+            return None
+
+        if self.Ignore:
+            arguments = {name: value for name, value in arguments.items() if name not in self.Ignore}
+
+        try:
+            data = KeyEncoder.encode([self.Name, arguments] if self.Job is None else [self.Name, arguments, *self.JobState(self.Job)])
+
+        except (TypeError, ValueError):
+            return None
+
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @staticmethod
+    def JobState(job: PromptJob) -> list[Any]:
+        """
+        Get what a job's result depends on besides the arguments of the call.
+
+        Parameters:
+        - job (PromptJob): The job.
+
+        Returns:
+        - list[Any]: The previous result, the initialization arguments, and the model name and history digest of the job's context.
+        """
+        llm = job.LLM
+        context = [llm.Model.Name, llm.Messages.Digest()] if llm is not None else None
+
+        return [job.PrevResult, list(job.InitArgs), job.InitKwargs, context]
+
+    def Bind(self, args: tuple, kwargs: dict) -> dict | None:
+        # Returns every argument by name, defaults included, or None if the call doesn't fit the signature
+        if self.Simple and len(args) <= len(self.Positional) and kwargs.keys() <= self.Names:
+            arguments = dict(self.Defaults)
+            arguments.update(zip(self.Positional, args))
+
+            if not kwargs.keys() & set(self.Positional[:len(args)]):
+                arguments.update(kwargs)
+
+                if self.Required <= arguments.keys():
+                    return arguments
+
+        try:
+            bound = self.Signature.bind(*args, **kwargs)
+
+        except TypeError:
+            return None
+
+        bound.apply_defaults()
+
+        return dict(bound.arguments)
+
+    def Lookup(self, key: str) -> tuple[bool, Any]:
+        # Entries keep their creation time, so tools sharing a cache can have their own TTL
+        entry = self.Cache.Load(key)
+
+        if entry is not None and (self.TTL is None or time.time() - entry[0] <= self.TTL):
+            with self.Lock:
+                self.Hits += 1
+
+            return True, entry[1]
+
+        return False, None
+
+    def Join(self, key: str) -> tuple[Future, bool]:
+        # Returns the flight computing the key, and whether this call leads it
+        with self.Lock:
+            future = self.Flights.get(key)
+
+            if future is not None:
+                self.Shared += 1
+                return future, False
+
+            future = self.Flights[key] = Future()
+
+            return future, True
+
+    def Complete(self, key: str, future: Future, result: Any):
+        # Stored before the flight ends, so calls arriving after it find the result
+        try:
+            self.Cache.Set(key, (time.time(), result))
+
+        # Results the backend can't store, e.g. unpicklable ones, just aren't cached
+        except Exception:
+            pass
+
+        with self.Lock:
+            self.Flights.pop(key, None)
+            self.Misses += 1
+
+        future.set_result(result)
+
+    def Fail(self, key: str, future: Future, error: BaseException):
+        with self.Lock:
+            self.Flights.pop(key, None)
+
+        # An interrupted call, e.g. a cancelled task, lets the waiting calls retry instead
+        if isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            future.cancel()
+
+    def __call__(self, *args, **kwargs) -> Any:
+        """
+        Call the tool, or return its cached result.
+
+        Returns:
+        - Any: The result, or for coroutine tools a coroutine returning it.
+        """
+        if self.IsCoroutine:
+            return self.CallAsync(*args, **kwargs)
+
+        key = self.Key(args, kwargs)
+
+        if key is None:
+            with self.Lock:
+                self.Bypassed += 1
+
+            return self.Function(*args, **kwargs)
+
+        while True:
+            hit, value = self.Lookup(key)
+
+            if hit:
+                return value
+
+            future, leader = self.Join(key)
+
+            if not leader:
+                try:
+                    return future.result()
+
+                except CancelledError:
+                    continue
+
+            try:
+                result = self.Function(*args, **kwargs)
+
+            except BaseException as e:
+                self.Fail(key, future, e)
+                raise
+
+            self.Complete(key, future, result)
+
+            return result
+
+    async def CallAsync(self, *args, **kwargs) -> Any:
+        """
+        Asynchronous counterpart of calling the tool, for coroutine tools.
+
+        Returns:
+        - Any: The result.
+        """
+        key = self.Key(args, kwargs)
+
+        if key is None:
+            with self.Lock:
+                self.Bypassed += 1
+
+            return await self.Function(*args, **kwargs)
+
+        while True:
+            hit, value = self.Lookup(key)
+
+            if hit:
+                return value
+
+            future, leader = self.Join(key)
+
+            if not leader:
+                try:
+                    # Shielded, so a waiting call being cancelled doesn't cancel the flight
+                    return await asyncio.shield(asyncio.wrap_future(future))
+
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+
+                    continue
+
+            try:
+                result = await self.Function(*args, **kwargs)
+
+            except BaseException as e:
+                self.Fail(key, future, e)
+                raise
+
+            self.Complete(key, future, result)
+
+            return result
+
+    def Clear(self):
+        """
+        Remove every cached result from the cache, including those of other tools sharing it.
+        """
+        self.Cache.Clear()
+
+    def Stats(self) -> dict[str, int]:
+        """
+        Get the memoization counters.
+
+        Returns:
+        - dict[str, int]: Hits, misses, calls that waited on an identical call in flight, and calls that bypassed the cache.
+        """
+        return {"hits": self.Hits, "misses": self.Misses, "shared": self.Shared, "bypassed": self.Bypassed}
+
+
+def memoize(func: Callable | None = None, ttl: float | None = None, maxSize: int | None = 1024, cache: ResponseCache | str | None = None, ignore: tuple[str, ...] = ()):
+    """
+    Decorator memoizing a tool. Usable as @memoize or @memoize(ttl=..., cache=...).
+
+    Parameters:
+    - func (Callable | PromptJob | None): The tool.
+    - ttl (float | None): Seconds a result stays valid. None for no expiry.
+    - maxSize (int | None): Maximum number of results kept. None for no limit.
+    - cache (ResponseCache | str | None): The cache backend, or the path of an SQLite cache file.
+    - ignore (tuple[str, ...]): Parameters left out of the key.
+
+    Returns:
+    - Memoized: The memoized tool.
+    """
+    def wrapper(func: Callable):
+        return Memoized(func, ttl, maxSize, cache, ignore)
+
+    if func is None:
+        return wrapper
+
+    return wrapper(func)
@@ -0,0 +1,428 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+
+class Histogram:
+    """
+    Summary of observed values: count, sum, extremes, and a window of recent values for quantiles.
+    """
+    def __init__(self, window: int = 1024):
+        self.Count: int = 0
+        self.Sum: float = 0.0
+        self.Min: float = float("inf")
+        self.Max: float = float("-inf")
+        self.Recent: deque[float] = deque(maxlen=window)
+
+    def Observe(self, value: float):
+        self.Count += 1
+        self.Sum += value
+        self.Min = min(self.Min, value)
+        self.Max = max(self.Max, value)
+        self.Recent.append(value)
+
+    def Quantile(self, quantile: float) -> float | None:
+        """
+        Get a quantile of the recent values.
+
+        Parameters:
+        - quantile (float): The quantile, between 0 and 1.
+
+        Returns:
+        - float | None: The value, or None if nothing was observed.
+        """
+        if not self.Recent:
+            return None
+
+        values = sorted(self.Recent)
+
+        return values[min(len(values) - 1, int(len(values) * quantile))]
+
+    def Summary(self) -> dict[str, float | None]:
+        return {
+            "count": self.Count,
+            "sum": self.Sum,
+            "mean": self.Sum / self.Count if self.Count else None,
+            "min": self.Min if self.Count else None,
+            "max": self.Max if self.Count else None,
+            "p50": self.Quantile(0.5),
+            "p95": self.Quantile(0.95),
+            "p99": self.Quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process store of counters and histograms, keyed by metric name and labels.
+    """
+    def __init__(self, window: int = 1024):
+        """
+        Initialize a MetricsRegistry object.
+
+        Parameters:
+        - window (int): Number of recent values each histogram keeps for quantiles.
+        """
+        self.Window: int = window
+        self.Counters: dict[tuple, float] = {}
+        self.Histograms: dict[tuple, Histogram] = {}
+        self.Lock: threading.Lock = threading.Lock()
+
+    def Increment(self, name: str, value: float = 1, labels: dict[str, Any] | None = None):
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+
+        with self.Lock:
+            self.Counters[key] = self.Counters.get(key, 0) + value
+
+    def Observe(self, name: str, value: float, labels: dict[str, Any] | None = None):
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+
+        with self.Lock:
+            histogram = self.Histograms.get(key)
+
+            if histogram is None:
+                histogram = self.Histograms[key] = Histogram(self.Window)
+
+            histogram.Observe(value)
+
+    def Get(self, name: str, **labels) -> Histogram | float | None:
+        """
+        Get a histogram or counter.
+
+        Parameters:
+        - name (str): The metric name.
+        - labels: The metric labels.
+
+        Returns:
+        - Histogram | float | None: The histogram or counter value, or None if nothing was recorded.
+        """
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.Lock:
+            return self.Histograms.get(key, self.Counters.get(key))
+
+    def Snapshot(self) -> list[dict[str, Any]]:
+        """
+        Get every metric in a JSON-serializable form.
+
+        Returns:
+        - list[dict[str, Any]]: One entry per metric and label set, with its counter value or histogram summary.
+        """
+        with self.Lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self.Counters.items()]
+            histograms = [{"name": name, "labels": dict(labels), **histogram.Summary()} for (name, labels), histogram in self.Histograms.items()]
+
+        return sorted(counters + histograms, key=lambda metric: (metric["name"], sorted(metric["labels"].items())))
+
+    def Reset(self):
+        with self.Lock:
+            self.Counters.clear()
+            self.Histograms.clear()
+
+
+class Span:
+    """
+    The timing of one stage: a context run, a provider request, a Then callback, a job or a pipeline.
+    """
+    __slots__ = ("Instrumentation", "Name", "Attributes", "Started", "StartedNs", "Dispatched", "FirstToken", "Ended", "PromptTokens", "CompletionTokens", "Error")
+
+    def __init__(self, instrumentation: Any, name: str, attributes: dict[str, Any]):
+        self.Instrumentation: Any = instrumentation
+        self.Name: str = name
+        self.Attributes: dict[str, Any] = attributes
+        self.Started: float = time.perf_counter()
+        # Wall clock start, for exporters
+        self.StartedNs: int = time.time_ns()
+        self.Dispatched: float | None = None
+        self.FirstToken: float | None = None
+        self.Ended: float | None = None
+        self.PromptTokens: int | None = None
+        self.CompletionTokens: int | None = None
+        self.Error: BaseException | None = None
+
+    def Dispatch(self):
+        """
+        Mark the request leaving the scheduler queue. Only the first call counts, so retries don't reset it.
+        """
+        if self.Dispatched is None:
+            self.Dispatched = time.perf_counter()
+
+    def First(self):
+        """
+        Mark the first generated token.
+        """
+        if self.FirstToken is None:
+            self.FirstToken = time.perf_counter()
+            self.Instrumentation.Emit("first_token", self)
+
+    def Finish(self, error: BaseException | None = None, promptTokens: int | None = None, completionTokens: int | None = None):
+        """
+        End the span and record its metrics.
+
+        Parameters:
+        - error (BaseException | None): The error the stage failed with.
+        - promptTokens (int | None): Prompt tokens of a request.
+        - completionTokens (int | None): Completion tokens of a request.
+        """
+        if self.Ended is not None:
+            return
+
+        self.Ended = time.perf_counter()
+        self.Error = error
+
+        if promptTokens is not None:
+            self.PromptTokens = promptTokens
+
+        if completionTokens is not None:
+            self.CompletionTokens = completionTokens
+
+        self.Instrumentation.Record(self)
+        self.Instrumentation.Emit("end", self)
+
+    @property
+    def Duration(self) -> float | None:
+        return self.Ended - self.Started if self.Ended is not None else None
+
+    @property
+    def TimeToFirstToken(self) -> float | None:
+        return self.FirstToken - self.Started if self.FirstToken is not None else None
+
+    @property
+    def QueueWait(self) -> float | None:
+        return self.Dispatched - self.Started if self.Dispatched is not None else None
+
+    @property
+    def TokensPerSecond(self) -> float | None:
+        if not self.CompletionTokens or self.Ended is None:
+            return None
+
+        # Generation speed: from the first token when streamed, otherwise over the whole request
+        elapsed = self.Ended - (self.FirstToken if self.FirstToken is not None else self.Dispatched or self.Started)
+
+        return self.CompletionTokens / elapsed if elapsed > 0 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, errorType, error, traceback):
+        # A closed stream or a cancelled task is not a failure of the stage
+        self.Finish(error if isinstance(error, Exception) else None)
+
+        return False
+
+
+class NullSpan:
+    """
+    The span handed out while instrumentation is disabled. Every method does nothing.
+    """
+    __slots__ = ()
+
+    def Dispatch(self):
+        return
+
+    def First(self):
+        return
+
+    def Finish(self, error: BaseException | None = None, promptTokens: int | None = None, completionTokens: int | None = None):
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, errorType, error, traceback):
+        return False
+
+
+NoSpan: NullSpan = NullSpan()
+
+
+def Dispatching(request: Callable[[], Any], span: Span | NullSpan) -> Callable[[], Any]:
+    """
+    Wrap a request so its span is marked as dispatched when the scheduler sends it.
+
+    Parameters:
+    - request (Callable[[], Any]): Sends the request.
+    - span (Span | NullSpan): The request's span.
+
+    Returns:
+    - Callable[[], Any]: The wrapped request, or the request itself when the span is not recorded.
+    """
+    if span is NoSpan:
+        return request
+
+    def Send():
+        span.Dispatch()
+
+        return request()
+
+    return Send
+
+
+class Instrumentation:
+    """
+    Times the stages of runs and pipelines and records them in a metrics registry.
+    Disabled by default: call sites then receive NoSpan, so the overhead is one method call per stage.
+    Hooks are called with the event name ("start", "first_token" or "end") and the span.
+    """
+    # Label attributes metrics are broken down by
+    Labels: tuple[str, ...] = ("model", "job")
+
+    def __init__(self, registry: MetricsRegistry | None = None):
+        self.Enabled: bool = False
+        self.Registry: MetricsRegistry = registry or MetricsRegistry()
+        self.Hooks: list[Callable[[str, Span], None]] = []
+
+    def Enable(self, registry: MetricsRegistry | None = None):
+        """
+        Start recording.
+
+        Parameters:
+        - registry (MetricsRegistry | None): A registry to record into instead of the current one.
+        """
+        if registry is not None:
+            self.Registry = registry
+
+        self.Enabled = True
+
+        return self
+
+    def Disable(self):
+        self.Enabled = False
+
+        return self
+
+    def AddHook(self, hook: Callable[[str, Span], None]):
+        """
+        Add a callback for span events and enable instrumentation.
+
+        Parameters:
+        - hook (Callable[[str, Span], None]): The callback.
+        """
+        self.Hooks.append(hook)
+        self.Enabled = True
+
+        return self
+
+    def RemoveHook(self, hook: Callable[[str, Span], None]):
+        self.Hooks.remove(hook)
+
+        return self
+
+    def Start(self, name: str, **attributes) -> Span | NullSpan:
+        """
+        Start timing a stage.
+
+        Parameters:
+        - name (str): The stage: "run", "request", "callback", "job" or "pipeline".
+        - attributes: Attributes of the stage, such as model or job.
+
+        Returns:
+        - Span | NullSpan: The span, to be finished by the caller.
+        """
+        if not self.Enabled:
+            return NoSpan
+
+        span = Span(self, name, attributes)
+        self.Emit("start", span)
+
+        return span
+
+    def Emit(self, event: str, span: Span):
+        for hook in self.Hooks:
+            try:
+                hook(event, span)
+
+            # A failing exporter must not fail the request it observes
+            except Exception:
+                pass
+
+    def Record(self, span: Span):
+        registry = self.Registry
+        labels = {key: span.Attributes[key] for key in self.Labels if span.Attributes.get(key) is not None}
+        name = span.Name
+        duration, queueWait, timeToFirstToken = span.Duration, span.QueueWait, span.TimeToFirstToken
+
+        if duration is not None:
+            registry.Observe(f"{name}.latency", duration, labels)
+
+        if span.Error is not None:
+            registry.Increment(f"{name}.errors", 1, labels)
+
+        if queueWait is not None:
+            registry.Observe(f"{name}.queue_wait", queueWait, labels)
+
+        if timeToFirstToken is not None:
+            registry.Observe(f"{name}.ttft", timeToFirstToken, labels)
+
+        if span.PromptTokens is not None:
+            registry.Increment(f"{name}.prompt_tokens", span.PromptTokens, labels)
+
+        if span.CompletionTokens is not None:
+            registry.Increment(f"{name}.completion_tokens", span.CompletionTokens, labels)
+
+            tokensPerSecond = span.TokensPerSecond
+
+            if tokensPerSecond is not None:
+                registry.Observe(f"{name}.tokens_per_second", tokensPerSecond, labels)
+
+    def Snapshot(self) -> list[dict[str, Any]]:
+        return self.Registry.Snapshot()
+
+
+class OpenTelemetryExporter:
+    """
+    Forwards finished spans to OpenTelemetry as trace spans and histogram metrics.
+    opentelemetry-api is an optional dependency and has to be installed separately, along with
+    an SDK and exporter configured by the application.
+    """
+    def __init__(self, tracer: Any = None, meter: Any = None):
+        """
+        Initialize an OpenTelemetryExporter object.
+
+        Parameters:
+        - tracer (Tracer | None): The tracer. Defaults to the global tracer provider's.
+        - meter (Meter | None): The meter. Defaults to the global meter provider's.
+        """
+        from opentelemetry import metrics, trace
+
+        self.Tracer: Any = tracer or trace.get_tracer("tinytune")
+        self.Meter: Any = meter or metrics.get_meter("tinytune")
+        self.Instruments: dict[str, Any] = {}
+        self.Lock: threading.Lock = threading.Lock()
+
+    def Histogram(self, name: str, unit: str) -> Any:
+        with self.Lock:
+            instrument = self.Instruments.get(name)
+
+            if instrument is None:
+                instrument = self.Instruments[name] = self.Meter.create_histogram(f"tinytune.{name}", unit=unit)
+
+            return instrument
+
+    def __call__(self, event: str, span: Span):
+        if event != "end":
+            return
+
+        attributes = {key: str(value) for key, value in span.Attributes.items() if value is not None}
+        endedNs = span.StartedNs + int((span.Duration or 0.0) * 1e9)
+
+        traceSpan = self.Tracer.start_span(f"tinytune.{span.Name}", start_time=span.StartedNs, attributes=attributes)
+
+        for key, value in (("ttft", span.TimeToFirstToken), ("queue_wait", span.QueueWait), ("prompt_tokens", span.PromptTokens), ("completion_tokens", span.CompletionTokens)):
+            if value is not None:
+                traceSpan.set_attribute(f"tinytune.{key}", value)
+
+        if span.Error is not None:
+            traceSpan.record_exception(span.Error)
+
+        traceSpan.end(end_time=endedNs)
+
+        self.Histogram(f"{span.Name}.latency", "s").record(span.Duration, attributes)
+
+        for key, value, unit in (("ttft", span.TimeToFirstToken, "s"), ("queue_wait", span.QueueWait, "s"), ("tokens_per_second", span.TokensPerSecond, "{token}/s")):
+            if value is not None:
+                self.Histogram(f"{span.Name}.{key}", unit).record(value, attributes)
+
+
+# Default instrumentation, disabled until enabled
+Instruments: Instrumentation = Instrumentation()
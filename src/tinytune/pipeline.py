@@ -1,30 +1,165 @@
-from typing import Any, Callable, TypeVar
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, TypeVar
 from tinytune.prompt import PromptJob
 from tinytune.llmcontext import LLMContext, Message
+from tinytune.metrics import Instruments, Span, NullSpan
 
-class Pipeline[MessageType](PromptJob[MessageType]):
+
+class DeltaChannel:
+    """
+    An async iterator over the deltas a job emits in a streaming pipeline, filled as they arrive.
+    The job's failure is raised to the consumer once the deltas sent before it are consumed.
+    """
+    # Marks the end of the stream in the queue
+    End: object = object()
+
+    def __init__(self):
+        """
+        Initialize a DeltaChannel object.
+        """
+        self.Queue: asyncio.Queue = asyncio.Queue()
+        self.Error: BaseException | None = None
+        self.Closed: bool = False
+
+        # The job's result, once it has finished
+        self.Result: Any = None
+
+    def Put(self, delta: Any):
+        self.Queue.put_nowait(delta)
+
+    def Close(self, error: BaseException | None = None, result: Any = None):
+        if not self.Closed:
+            self.Result = result
+            self.Closed = True
+            self.Error = error
+            self.Queue.put_nowait(DeltaChannel.End)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        delta = await self.Queue.get()
+
+        if delta is DeltaChannel.End:
+            # Kept in the queue, so iterating again ends again
+            self.Queue.put_nowait(DeltaChannel.End)
+
+            if self.Error is not None:
+                raise self.Error
+
+            raise StopAsyncIteration
+
+        return delta
+
+
+class BlockingDeltas:
+    """
+    A blocking iterator over a DeltaChannel, for generator jobs running on a worker thread.
+    It ends once the job is stopped, so the thread doesn't wait on a loop that moved on.
+    """
+    def __init__(self, deltas: AsyncIterator[Any], loop: asyncio.AbstractEventLoop, stopped: threading.Event):
+        self.Deltas: AsyncIterator[Any] = deltas
+        self.Loop: asyncio.AbstractEventLoop = loop
+        self.Stopped: threading.Event = stopped
+
+    def __iter__(self):
+        return self
+
+    async def Next(self) -> Any:
+        return await self.Deltas.__anext__()
+
+    def __next__(self) -> Any:
+        if self.Stopped.is_set():
+            raise StopIteration
+
+        try:
+            return asyncio.run_coroutine_threadsafe(self.Next(), self.Loop).result()
+
+        except StopAsyncIteration:
+            raise StopIteration
+
+
+async def IterateAsync(deltas: AsyncIterable[Any] | Iterable[Any]) -> AsyncIterator[Any]:
+    if isinstance(deltas, AsyncIterable):
+        async for delta in deltas:
+            yield delta
+    else:
+        for delta in deltas:
+            yield delta
+
+
+def JoinDeltas(deltas: list[Any]) -> Any:
+    """
+    Join the deltas of a streamed job into its result.
+
+    Parameters:
+    - deltas (list[Any]): The deltas.
+
+    Returns:
+    - Any: The text, if all deltas are strings, otherwise the list of deltas.
+    """
+    if all(isinstance(delta, str) for delta in deltas):
+        return "".join(deltas)
+
+    return deltas
+
+
+async def Sentences(deltas: AsyncIterable[Any], terminators: str = ".!?\n") -> AsyncIterator[str]:
+    """
+    Group streamed text deltas into sentences, so a job can start on the first sentence of the previous job's output.
+
+    Parameters:
+    - deltas (AsyncIterable[Any]): The deltas.
+    - terminators (str): Characters ending a sentence.
+
+    Returns:
+    - AsyncIterator[str]: The sentences, with the text after the last terminator yielded at the end.
+    """
+    buffer = ""
+
+    async for delta in deltas:
+        buffer += str(delta)
+        end = max(buffer.rfind(terminator) for terminator in terminators)
+
+        if end >= 0:
+            sentence, buffer = buffer[:end + 1], buffer[end + 1:]
+
+            if sentence.strip():
+                yield sentence.strip()
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class Pipeline[MessageType: Message](PromptJob[MessageType]):
     """
     Represents a pipeline of prompt jobs.
     """
-    def __init__(self, llm: LLMContext):
+    def __init__(self, llm: LLMContext, maxWorkers: int | None = None):
         """
         Initialize a Pipeline object.
 
         Parameters:
         - llm (LLMContext): The language model context.
+        - maxWorkers (int | None): Maximum number of jobs run concurrently when the pipeline runs as a graph.
         """
         super().__init__(None, None, llm, None)
         self.Jobs: list[PromptJob] = list[PromptJob]()
         self.Results: dict[str, list[Any]] = dict[str, list[Any]]()
         self.LLM: LLMContext = llm
         self.IsRunning: bool = False
+        self.MaxWorkers: int | None = maxWorkers
 
-    def AddJob(self, job: Callable[[str, LLMContext[MessageType]], Any], *args, **kwargs):
+    def AddJob(self, job: Callable[[str, LLMContext[MessageType]], Any], *args, dependsOn: list[str] | None = None, **kwargs):
         """
         Add a job to the pipeline.
 
         Parameters:
         - job (Callable[[str, LLMContext[MessageType]], Any]): The job to add.
+        - dependsOn (list[str] | None): IDs of the jobs whose results this job consumes.
 
         Returns:
         - Pipeline: The Pipeline object.
@@ -47,18 +182,91 @@ class Pipeline[MessageType](PromptJob[MessageType]):
 
         promptJob.Args = (ar, kw)
 
-        print(promptJob)
-
         if not(promptJob.ID):
             promptJob.ID = f"job-{len(self.Jobs)}"
 
         if not(promptJob.LLM) :
             promptJob.LLM = self.LLM
 
+        if dependsOn is not None:
+            promptJob.DependsOn = list(dependsOn)
+
         self.Jobs.append(promptJob)
 
         return self
 
+    def IsGraph(self) -> bool:
+        """
+        Check whether any job in the pipeline declares dependencies.
+
+        Returns:
+        - bool: True if the pipeline has to be run as a graph.
+        """
+        return any(getattr(job, "DependsOn", None) for job in self.Jobs)
+
+    def Schedule(self) -> list[list[PromptJob]]:
+        """
+        Validate the job graph and group the jobs into levels that can run concurrently.
+
+        Returns:
+        - list[list[PromptJob]]: Jobs grouped by dependency depth.
+        """
+        jobs: dict[str, PromptJob] = {}
+
+        for job in self.Jobs:
+            if job.ID in jobs:
+                raise Exception(f"Duplicate job \"{job.ID}\" in pipeline graph.")
+
+            jobs[job.ID] = job
+
+        for job in self.Jobs:
+            for dependency in job.DependsOn:
+                if dependency not in jobs:
+                    raise Exception(f"Job \"{job.ID}\" depends on unknown job \"{dependency}\".")
+
+        levels: list[list[PromptJob]] = []
+        done: set[str] = set()
+        remaining: list[PromptJob] = list(self.Jobs)
+
+        while remaining:
+            level = [job for job in remaining if all(dependency in done for dependency in job.DependsOn)]
+
+            if not level:
+                raise Exception(f"Dependency cycle between jobs {[job.ID for job in remaining]}.")
+
+            levels.append(level)
+            done.update(job.ID for job in level)
+            remaining = [job for job in remaining if job.ID not in done]
+
+        return levels
+
+    def GetPrevResult(self, job: PromptJob, results: dict[str, Any]) -> Any:
+        """
+        Get the previous result passed to a job in a graph.
+        Jobs with a single dependency receive its result, jobs with several receive a dict keyed by job ID.
+
+        Returns:
+        - Any: The previous result for the job.
+        """
+        if not job.DependsOn:
+            return None
+
+        if len(job.DependsOn) == 1:
+            return results[job.DependsOn[0]]
+
+        return {dependency: results[dependency] for dependency in job.DependsOn}
+
+    def AddResult(self, job: PromptJob, result: Any, results: dict[str, Any]):
+        """
+        Record the result of a job run as part of a graph.
+        """
+        results[job.ID] = result
+
+        if job.ID not in self.Results:
+            self.Results[job.ID] = []
+
+        self.Results[job.ID].append(result)
+
     def Run(self, *args, **kwargs) -> list[dict[str, str]]:
         """
         Run the pipeline.
@@ -66,27 +274,305 @@ class Pipeline[MessageType](PromptJob[MessageType]):
         Returns:
         - list[dict[str, str]]: Result of running the pipeline.
         """
-        prevResult: Any = None
+        with Instruments.Start("pipeline", jobs=len(self.Jobs)):
+            if self.IsGraph():
+                return self.RunGraph(*args, **kwargs)
 
-        count: int = 0
+            prevResult: Any = None
+
+            count: int = 0
+
+            for job in self.Jobs:
+                try:
+                    job.PrevResult = prevResult
+
+                    prevResult = self.RunJob(job, Instruments.Start("pipeline.job", job=job.ID), args, kwargs)
+
+                    if job.ID not in self.Results:
+                        self.Results[job.ID] = []
+
+                    self.Results[job.ID].append(prevResult)
+
+                except Exception as e:
+                    raise Exception(f"Unhandled exception occurred at job \"{job.ID}\".\nBacktrace: {[job.ID for job in self.Jobs[count:]]}")
+
+                count += 1
+
+            return prevResult
+
+    def RunJob(self, job: PromptJob, span: Span | NullSpan, args: tuple, kwargs: dict) -> Any:
+        """
+        Run a job of the pipeline, timing how long it waited to start and how long it ran.
+
+        Parameters:
+        - job (PromptJob): The job.
+        - span (Span | NullSpan): The span started when the job became ready.
+
+        Returns:
+        - Any: Result of the job.
+        """
+        with span:
+            span.Dispatch()
+
+            return job(args, kwargs)
+
+    def RunGraph(self, *args, **kwargs) -> Any:
+        """
+        Run the pipeline as a dependency graph. Jobs whose dependencies have completed are run
+        concurrently on a thread pool bounded by MaxWorkers.
+        Jobs running concurrently should not share an LLMContext.
+
+        Returns:
+        - Any: Result of the last job added to the pipeline. All results are collected in Results.
+        """
+        self.Schedule()
+
+        results: dict[str, Any] = {}
+        waiting: list[PromptJob] = list(self.Jobs)
+        running: dict[Future, PromptJob] = {}
+
+        with ThreadPoolExecutor(max_workers=self.MaxWorkers) as pool:
+            while waiting or running:
+                for job in [job for job in waiting if all(dependency in results for dependency in job.DependsOn)]:
+                    waiting.remove(job)
+                    job.PrevResult = self.GetPrevResult(job, results)
+                    running[pool.submit(self.RunJob, job, Instruments.Start("pipeline.job", job=job.ID), args, kwargs)] = job
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    job = running.pop(future)
+
+                    try:
+                        self.AddResult(job, future.result(), results)
+
+                    except Exception as e:
+                        for pending in running:
+                            pending.cancel()
+
+                        raise Exception(f"Unhandled exception occurred at job \"{job.ID}\".\nBacktrace: {[job.ID] + [job.ID for job in waiting]}") from e
+
+        return results[self.Jobs[-1].ID]
+
+    async def RunAsync(self, *args, **kwargs) -> Any:
+        """
+        Run the pipeline on the running event loop.
+        Jobs are executed in order, with coroutine jobs awaited and blocking jobs run on worker threads.
+
+        Returns:
+        - Any: Result of the last job in the pipeline.
+        """
+        with Instruments.Start("pipeline", jobs=len(self.Jobs)):
+            if self.IsGraph():
+                return await self.RunGraphAsync(*args, **kwargs)
+
+            prevResult: Any = None
+
+            count: int = 0
+
+            for job in self.Jobs:
+                try:
+                    job.PrevResult = prevResult
+
+                    with Instruments.Start("pipeline.job", job=job.ID) as span:
+                        span.Dispatch()
+                        prevResult = await job.RunAsync([args, kwargs])
+
+                    if job.ID not in self.Results:
+                        self.Results[job.ID] = []
+
+                    self.Results[job.ID].append(prevResult)
+
+                except Exception as e:
+                    raise Exception(f"Unhandled exception occurred at job \"{job.ID}\".\nBacktrace: {[job.ID for job in self.Jobs[count:]]}")
+
+                count += 1
+
+            return prevResult
+
+    async def RunGraphAsync(self, *args, **kwargs) -> Any:
+        """
+        Run the pipeline as a dependency graph on the running event loop, with at most
+        MaxWorkers jobs in flight.
+
+        Returns:
+        - Any: Result of the last job added to the pipeline. All results are collected in Results.
+        """
+        self.Schedule()
+
+        results: dict[str, Any] = {}
+        waiting: list[PromptJob] = list(self.Jobs)
+        running: dict[asyncio.Task, PromptJob] = {}
+        semaphore = asyncio.Semaphore(self.MaxWorkers) if self.MaxWorkers else None
+
+        async def RunJob(job: PromptJob) -> Any:
+            with Instruments.Start("pipeline.job", job=job.ID) as span:
+                if semaphore is None:
+                    span.Dispatch()
+                    return await job.RunAsync([args, kwargs])
+
+                async with semaphore:
+                    span.Dispatch()
+                    return await job.RunAsync([args, kwargs])
+
+        while waiting or running:
+            for job in [job for job in waiting if all(dependency in results for dependency in job.DependsOn)]:
+                waiting.remove(job)
+                job.PrevResult = self.GetPrevResult(job, results)
+                running[asyncio.ensure_future(RunJob(job))] = job
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                job = running.pop(task)
+
+                try:
+                    self.AddResult(job, task.result(), results)
+
+                except Exception as e:
+                    for pending in running:
+                        pending.cancel()
+
+                    # Waited for, so the cancelled jobs finish unwinding before the failure propagates
+                    await asyncio.gather(*running, return_exceptions=True)
+
+                    raise Exception(f"Unhandled exception occurred at job \"{job.ID}\".\nBacktrace: {[job.ID] + [job.ID for job in waiting]}") from e
+
+        return results[self.Jobs[-1].ID]
+
+    async def StreamAsync(self, *args, source: AsyncIterable[Any] | Iterable[Any] | None = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Run the pipeline with every job running concurrently, each consuming the deltas of the previous
+        job as they arrive, and yield the deltas of the last job.
+        Async generator jobs receive an async iterator of the previous job's deltas as prevResult and
+        yield their own, and generator jobs do the same on a worker thread with a blocking iterator.
+        Other jobs wait for the previous job to finish, receive its result, and emit theirs as a single
+        delta. The results of streamed jobs are their deltas joined, and are recorded in Results.
+
+        Parameters:
+        - source (AsyncIterable[Any] | Iterable[Any] | None): Deltas the first job receives as prevResult.
+
+        Returns:
+        - AsyncIterator[Any]: The deltas of the last job.
+        """
+        if self.IsGraph():
+            raise Exception("Streaming pipelines run their jobs in order; pipelines with dependencies can't be streamed.")
+
+        upstream: AsyncIterator[Any] | None = IterateAsync(source) if source is not None else None
+        tasks: list[asyncio.Task] = []
+
+        with Instruments.Start("pipeline", jobs=len(self.Jobs), stream=True):
+            try:
+                for job in self.Jobs:
+                    channel = DeltaChannel()
+                    tasks.append(asyncio.ensure_future(self.StreamJob(job, upstream, channel, args, kwargs)))
+                    upstream = channel
+
+                if upstream is not None:
+                    async for delta in upstream:
+                        yield delta
+
+            finally:
+                # Stops the jobs still running when the consumer stops early
+                for task in tasks:
+                    task.cancel()
+
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def StreamJob(self, job: PromptJob, upstream: AsyncIterator[Any] | None, channel: DeltaChannel, args: tuple, kwargs: dict):
+        """
+        Run a job of a streaming pipeline, sending its deltas to the next job through a channel.
+
+        Parameters:
+        - job (PromptJob): The job.
+        - upstream (AsyncIterator[Any] | None): The deltas of the previous job.
+        - channel (DeltaChannel): The channel the job's deltas are sent to.
+        """
+        callback = job.Callback
+        deltas: list[Any] = []
+
+        # Set when the job stops, so a generator job's thread stops emitting
+        stopped = threading.Event()
+
+        with Instruments.Start("pipeline.job", job=job.ID, stream=True) as span:
+            def Emit(delta: Any):
+                if not deltas:
+                    span.First()
+
+                deltas.append(delta)
+                channel.Put(delta)
 
-        for job in self.Jobs:
             try:
-                job.PrevResult = prevResult
+                span.Dispatch()
+
+                if inspect.isasyncgenfunction(callback):
+                    job.PrevResult = upstream
+                    callArgs, callKwargs = job.BindArgs([args, kwargs])
+
+                    async for delta in callback(*callArgs, **callKwargs):
+                        Emit(delta)
+
+                    result = JoinDeltas(deltas)
+
+                elif inspect.isgeneratorfunction(callback):
+                    loop = asyncio.get_running_loop()
 
-                prevResult = job(args, kwargs)
+                    job.PrevResult = BlockingDeltas(upstream, loop, stopped) if upstream is not None else None
+                    callArgs, callKwargs = job.BindArgs([args, kwargs])
 
-                if job.ID not in self.Results:
-                    self.Results[job.ID] = []
+                    def Pump():
+                        generator = callback(*callArgs, **callKwargs)
 
-                self.Results[job.ID].append(prevResult)
+                        try:
+                            for delta in generator:
+                                if stopped.is_set():
+                                    break
 
+                                loop.call_soon_threadsafe(Emit, delta)
+
+                        finally:
+                            generator.close()
+
+                    await asyncio.to_thread(Pump)
+
+                    # Lets the deltas scheduled by the thread be emitted first
+                    await asyncio.sleep(0)
+
+                    result = JoinDeltas(deltas)
+
+                else:
+                    prevResult = JoinDeltas([delta async for delta in upstream]) if upstream is not None else None
+
+                    # After another job, the job receives its result, as when the pipeline isn't streamed
+                    job.PrevResult = upstream.Result if isinstance(upstream, DeltaChannel) else prevResult
+                    result = await job.RunAsync([args, kwargs])
+
+                    if result is not None:
+                        Emit(result.Content if isinstance(result, Message) else result)
+
+            # Downstream jobs see the failure once they reach it, instead of waiting forever
             except Exception as e:
-                raise Exception(f"Unhandled exception occurred at job \"{job.ID}\".\nBacktrace: {[job.ID for job in self.Jobs[count:]]}")
+                # The failure of an earlier job is passed on as is
+                if isinstance(upstream, DeltaChannel) and e is upstream.Error:
+                    channel.Close(e)
+                else:
+                    error = Exception(f"Unhandled exception occurred at job \"{job.ID}\".")
+                    error.__cause__ = e
+                    channel.Close(error)
+
+                raise
+
+            except BaseException:
+                stopped.set()
+                channel.Close(Exception(f"Job \"{job.ID}\" was cancelled."))
+                raise
+
+        if job.ID not in self.Results:
+            self.Results[job.ID] = []
 
-            count += 1
+        self.Results[job.ID].append(result)
 
-        return prevResult
+        channel.Close(result=result)
 
     def Save(self, promptFile: str = "prompts.json"):
         """
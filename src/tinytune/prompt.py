@@ -1,6 +1,8 @@
+import asyncio
 import inspect
 from typing import Any, Callable, Union
 from tinytune.llmcontext import LLMContext, Message
+from tinytune.metrics import Instruments
 from functools import wraps
 from types import FunctionType
 
@@ -25,12 +27,14 @@ class PromptJob[MessageType: Message]:
     """
     Represents a job to execute prompts within a context.
     """
-    def __init__(self, callback, id: str, llm: LLMContext[MessageType], prevResult: list[Any], *args, **kwargs):
+    def __init__(self, callback, id: str, llm: LLMContext[MessageType], prevResult: list[Any], *args, dependsOn: list[str] | None = None, **kwargs):
         self.ID: str = id
         self.__name__ = self.ID
         self.LLM: LLMContext[MessageType] = llm
-        self.PrevResult: list[Any] = prevResult
-        self.Callback: Callable[..., None] = callback
+        self.PrevResult: Any = prevResult
+        self._Args: tuple[list, dict] = ([], {})
+        self.Callback = callback
+        self.DependsOn: list[str] = list(dependsOn) if dependsOn else []
 
         # Handle initialization arguments
         ar = []
@@ -46,33 +50,93 @@ class PromptJob[MessageType: Message]:
 
         self.Args = (ar, kw)
 
+    @property
+    def Callback(self) -> Callable[..., Any]:
+        return self._Callback
+
+    @Callback.setter
+    def Callback(self, callback: Callable[..., Any]):
+        self._Callback = callback
+        self.Bind()
+
+    @property
+    def Args(self) -> tuple[list, dict]:
+        return self._Args
+
+    @Args.setter
+    def Args(self, args: tuple[list, dict]):
+        self._Args = args
+        self.Bind()
+
+    def Bind(self):
+        """
+        Precompute how the callback is invoked: the keyword arguments its signature accepts and the
+        initialization arguments already filtered against it. Runs whenever Callback or Args change,
+        so invoking the job never inspects the callback.
+        """
+        callback = self._Callback
+
+        self.Accepted: frozenset[str] = frozenset(inspect.signature(callback).parameters) if callable(callback) else frozenset()
+        self.IsCoroutine: bool = inspect.iscoroutinefunction(callback)
+        self.InitArgs: tuple = tuple(self._Args[0])
+        self.InitKwargs: dict = {k: v for k, v in self._Args[1].items() if k in self.Accepted}
+
+    def BindArgs(self, args: list | None = None, kwargs: dict | None = None) -> tuple[list, dict]:
+        """
+        Build the positional and keyword arguments the callback is invoked with.
+        Runtime positional arguments come before initialization ones, and runtime keyword
+        arguments override initialization ones. Keyword arguments the callback doesn't accept are dropped.
+
+        Parameters:
+        - args (list | None): Runtime positional arguments.
+        - kwargs (dict | None): Runtime keyword arguments.
+
+        Returns:
+        - tuple[list, dict]: The positional and filtered keyword arguments.
+        """
+        if args:
+            callArgs = [self.ID, self.LLM, self.PrevResult, *args, *self.InitArgs]
+        else:
+            callArgs = [self.ID, self.LLM, self.PrevResult, *self.InitArgs]
+
+        if not kwargs:
+            return callArgs, self.InitKwargs
+
+        accepted = self.Accepted
+        callKwargs = dict(self.InitKwargs)
+        callKwargs.update({k: v for k, v in kwargs.items() if k in accepted})
+
+        return callArgs, callKwargs
+
     def Run(self, args: list | None = None, kwargs: dict | None = None) -> Any:
         """
         Run the prompt job.
         """
-        # Start with required params
-        callArgs = [self.ID, self.LLM, self.PrevResult]
+        with Instruments.Start("job", job=self.ID):
+            if not args and not kwargs:
+                return self._Callback(self.ID, self.LLM, self.PrevResult, *self.InitArgs, **self.InitKwargs)
 
-        # Add runtime positional args first
-        if args:
-            callArgs.extend(args)
+            callArgs, callKwargs = self.BindArgs(args, kwargs)
+
+            return self._Callback(*callArgs, **callKwargs)
+
+    async def RunAsync(self, args: list | None = None, kwargs: dict | None = None) -> Any:
+        """
+        Run the prompt job without blocking the event loop.
+        Coroutine callbacks are awaited directly, blocking callbacks are run on a worker thread.
+        """
+        callArgs, callKwargs = self.BindArgs(args, kwargs)
 
-        # Add initialization positional args
-        callArgs.extend(self.Args[0])
+        with Instruments.Start("job", job=self.ID):
+            if self.IsCoroutine:
+                return await self.Callback(*callArgs, **callKwargs)
 
-        # Handle keyword arguments
-        kwCallArgs = {}
-        # Start with initialization kwargs
-        kwCallArgs.update(self.Args[1])
-        # Override with runtime kwargs
-        if kwargs:
-            kwCallArgs.update(kwargs)
+            result = await asyncio.to_thread(self.Callback, *callArgs, **callKwargs)
 
-        # Filter kwargs based on function signature
-        params = inspect.signature(self.Callback).parameters
-        filtered_kwargs = {k: v for k, v in kwCallArgs.items() if k in params}
+            if inspect.isawaitable(result):
+                result = await result
 
-        return self.Callback(*callArgs, **filtered_kwargs)
+            return result
 
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
         """
@@ -80,10 +144,15 @@ class PromptJob[MessageType: Message]:
         """
         return self.Run(args=list(args), kwargs=kwargs)
 
-def prompt_job[MessageType](id: str | None = None, context: LLMContext | None = None, *args, **kwargs):
+def prompt_job[MessageType](id: str | None = None, context: LLMContext | None = None, *args, dependsOn: list[str] | None = None, **kwargs):
     """
     Decorator for composing a function into a PromptJob.
+
+    Parameters:
+    - id (str | None): Identifier of the job.
+    - context (LLMContext | None): The language model context.
+    - dependsOn (list[str] | None): IDs of the jobs whose results this job consumes. Declaring dependencies runs the pipeline as a graph.
     """
     def wrapper(func: Callable[..., Any]):
-        return PromptJob[MessageType](func, id, context, None, args, kwargs)
+        return PromptJob[MessageType](func, id, context, None, args, kwargs, dependsOn=dependsOn)
     return wrapper
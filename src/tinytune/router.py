@@ -0,0 +1,460 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator
+
+from tinytune.llmcontext import LLMContext, Message, MessageHistory, Model
+from tinytune.scheduler import RetryableStatusCodes
+
+
+def TransportErrors() -> tuple[type[BaseException], ...]:
+    """
+    Get the exception types raised when an endpoint can't be reached or doesn't answer in time,
+    including those of the client libraries that are installed.
+
+    Returns:
+    - tuple[type[BaseException], ...]: The exception types.
+    """
+    errors: list[type[BaseException]] = [TimeoutError, ConnectionError]
+
+    # Imported here since backends don't have to use either library
+    try:
+        import openai
+
+        errors += [openai.APIConnectionError, openai.APITimeoutError]
+
+    except ImportError:
+        pass
+
+    try:
+        import httpx
+
+        errors.append(httpx.TransportError)
+
+    except ImportError:
+        pass
+
+    return tuple(errors)
+
+
+EndpointErrors: tuple[type[BaseException], ...] = TransportErrors()
+
+
+def IsEndpointError(error: Exception) -> bool:
+    """
+    Check whether an error is the endpoint's fault rather than the request's: a connection failure,
+    a timeout or a retryable status such as 429 or 503. Anything else, e.g. a 400 or a bug in a
+    backend context, would fail on every endpoint.
+
+    Parameters:
+    - error (Exception): The error.
+
+    Returns:
+    - bool: Whether the request may succeed on another endpoint.
+    """
+    status = getattr(error, "status_code", None)
+
+    if status is not None:
+        return status in RetryableStatusCodes
+
+    return isinstance(error, EndpointErrors)
+
+
+class Endpoint:
+    """
+    A backend context in a router's pool and its load and health state.
+    """
+    def __init__(self, index: int, context: Any):
+        self.Index: int = index
+        self.Context: Any = context
+        self.Outstanding: int = 0
+        # EWMA of the time to first token, None until the first response
+        self.Latency: float | None = None
+        self.Failures: int = 0
+        self.EjectedUntil: float = 0
+        self.Requests: int = 0
+        self.Errors: int = 0
+        self.Ejections: int = 0
+
+    def Available(self, now: float) -> bool:
+        return self.EjectedUntil <= now
+
+
+class RouterContext(LLMContext[Message]):
+    """
+    Spreads requests over a pool of backend contexts, e.g. several local inference servers.
+    Each turn goes to the endpoint with the fewest outstanding requests ("least-outstanding") or
+    the lowest latency weighted by its load ("ewma"). Endpoints that fail repeatedly are ejected
+    for a while, and optional background health checks eject and restore them early. A
+    conversation sticks to the endpoint that served it last, so the server can reuse its KV cache
+    for the shared prefix; forks stick with their parent. Spawned and forked routers share the pool.
+    """
+    def __init__(
+        self,
+        contexts: list[Any],
+        policy: str = "least-outstanding",
+        sticky: bool = True,
+        ejectAfter: int = 3,
+        ejectFor: float = 30.0,
+        healthInterval: float | None = None,
+        healthTimeout: float = 2.0,
+        decay: float = 0.3,
+        maxConversations: int = 10000,
+    ):
+        """
+        Initialize a RouterContext object.
+
+        Parameters:
+        - contexts (list[LLMContext]): The backends.
+        - policy (str): "least-outstanding" or "ewma".
+        - sticky (bool): Keep sending a conversation to the endpoint that served it.
+        - ejectAfter (int): Consecutive endpoint failures after which it is ejected.
+        - ejectFor (float): Seconds an ejected endpoint is left out.
+        - healthInterval (float | None): Seconds between background health checks. None to disable them.
+        - healthTimeout (float): Timeout of each health check.
+        - decay (float): Weight of the newest sample in the latency EWMA.
+        - maxConversations (int): Number of conversations whose endpoint is remembered.
+        """
+        super().__init__(Model("router", "|".join(context.Model.Name for context in contexts)))
+
+        if not contexts:
+            raise ValueError("A router needs at least one backend.")
+
+        if policy not in ("least-outstanding", "ewma"):
+            raise ValueError(f"Unknown routing policy: {policy}")
+
+        self.Endpoints: list[Endpoint] = [Endpoint(index, context) for index, context in enumerate(contexts)]
+        self.Policy: str = policy
+        self.Sticky: bool = sticky
+        self.EjectAfter: int = ejectAfter
+        self.EjectFor: float = ejectFor
+        self.HealthTimeout: float = healthTimeout
+        self.Decay: float = decay
+        self.MaxConversations: int = maxConversations
+
+        self.Lock: threading.Lock = threading.Lock()
+        self.Affinity: OrderedDict[str, int] = OrderedDict()
+        # Shared with spawned routers, like the rest of the pool state
+        self.Cursor: Iterator[int] = itertools.count()
+        self.ConversationId: str = uuid.uuid4().hex
+
+        self.Stopped: threading.Event = threading.Event()
+
+        if healthInterval is not None:
+            threading.Thread(target=self.HealthLoop, args=(healthInterval,), daemon=True, name="router-health").start()
+
+    def Spawn(self) -> Any:
+        context = super().Spawn()
+        context.ConversationId = uuid.uuid4().hex
+
+        return context
+
+    def Score(self, endpoint: Endpoint) -> float:
+        if self.Policy == "ewma":
+            # Endpoints without samples score 0 so they get tried
+            return (endpoint.Latency or 0) * (endpoint.Outstanding + 1)
+
+        return endpoint.Outstanding
+
+    def Select(self, exclude: set[int] | frozenset[int] = frozenset()) -> Endpoint:
+        """
+        Pick the endpoint for the next request of this conversation and reserve a slot on it.
+
+        Parameters:
+        - exclude (set[int] | frozenset[int]): Indices of endpoints already tried for this request.
+
+        Returns:
+        - Endpoint: The endpoint.
+        """
+        now = time.monotonic()
+
+        with self.Lock:
+            candidates = [endpoint for endpoint in self.Endpoints if endpoint.Index not in exclude]
+
+            if not candidates:
+                raise ValueError("Every endpoint was excluded.")
+
+            endpoint = None
+
+            if self.Sticky:
+                index = self.Affinity.get(self.ConversationId)
+
+                if index is not None and index not in exclude and self.Endpoints[index].Available(now):
+                    endpoint = self.Endpoints[index]
+                    self.Affinity.move_to_end(self.ConversationId)
+
+            if endpoint is None:
+                available = [endpoint for endpoint in candidates if endpoint.Available(now)]
+
+                if available:
+                    # Ties are broken round-robin by starting the scan at a rotating offset
+                    offset = next(self.Cursor) % len(available)
+                    endpoint = min(available[offset:] + available[:offset], key=self.Score)
+                else:
+                    # With every endpoint ejected, the one coming back soonest is better than failing
+                    endpoint = min(candidates, key=lambda endpoint: endpoint.EjectedUntil)
+
+                if self.Sticky:
+                    self.Affinity[self.ConversationId] = endpoint.Index
+                    self.Affinity.move_to_end(self.ConversationId)
+
+                    if len(self.Affinity) > self.MaxConversations:
+                        self.Affinity.popitem(last=False)
+
+            endpoint.Outstanding += 1
+            endpoint.Requests += 1
+
+            return endpoint
+
+    def Release(self, endpoint: Endpoint, latency: float | None, error: Exception | None = None):
+        """
+        Free a request slot on an endpoint and update its latency and health.
+
+        Parameters:
+        - endpoint (Endpoint): The endpoint.
+        - latency (float | None): Time to the first token, or None if the request didn't get that far.
+        - error (Exception | None): The error the request failed with.
+        """
+        with self.Lock:
+            endpoint.Outstanding -= 1
+
+            if latency is not None:
+                endpoint.Latency = latency if endpoint.Latency is None else self.Decay * latency + (1 - self.Decay) * endpoint.Latency
+
+            if error is None:
+                endpoint.Failures = 0
+                return
+
+            if not IsEndpointError(error):
+                return
+
+            endpoint.Errors += 1
+            endpoint.Failures += 1
+
+            if endpoint.Failures >= self.EjectAfter:
+                self.Eject(endpoint)
+
+    def Eject(self, endpoint: Endpoint):
+        endpoint.EjectedUntil = time.monotonic() + self.EjectFor
+        endpoint.Ejections += 1
+
+    def Probe(self, context: Any):
+        """
+        Check that a backend is up. Contexts with an OpenAI-compatible client list the server's
+        models; other contexts are assumed healthy.
+
+        Parameters:
+        - context (LLMContext): The backend.
+        """
+        client = getattr(context, "Client", None)
+
+        if client is not None and hasattr(client, "models"):
+            client.with_options(timeout=self.HealthTimeout, max_retries=0).models.list()
+
+    def CheckHealth(self) -> list[bool]:
+        """
+        Probe every endpoint, ejecting those that fail and restoring those that recovered.
+
+        Returns:
+        - list[bool]: Whether each endpoint is healthy.
+        """
+        results = []
+
+        for endpoint in self.Endpoints:
+            try:
+                self.Probe(endpoint.Context)
+                healthy = True
+
+            except Exception:
+                healthy = False
+
+            with self.Lock:
+                if healthy:
+                    endpoint.Failures = 0
+                    endpoint.EjectedUntil = 0
+
+                elif endpoint.Available(time.monotonic()):
+                    endpoint.Failures = max(endpoint.Failures, self.EjectAfter)
+                    self.Eject(endpoint)
+
+            results.append(healthy)
+
+        return results
+
+    def HealthLoop(self, interval: float):
+        while not self.Stopped.wait(interval):
+            self.CheckHealth()
+
+    def Close(self):
+        """
+        Stop the background health checks.
+        """
+        self.Stopped.set()
+
+    def Begin(self, endpoint: Endpoint, request: list[dict]) -> Any:
+        context = endpoint.Context.Spawn()
+
+        context.Messages = MessageHistory(request[:-1])
+        context.Prompt(request[-1])
+
+        return context
+
+    def Stream(self, message: Message | dict | None = None, *args, **kwargs) -> Iterator[Any]:
+        if message is not None:
+            self.Prompt(message)
+
+        while self.QueuePointer < len(self.MessageQueue):
+            start = len(self.Messages)
+            self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+            key, content = self.CacheLookup()
+
+            if content is not None:
+                self.OnGenerate(content)
+                self.Messages.append(Message("assistant", content))
+                self.QueuePointer += 1
+
+                yield content
+                continue
+
+            request = self.RequestMessages()
+            tried: set[int] = set()
+
+            try:
+                while True:
+                    endpoint = self.Select(tried)
+                    context = self.Begin(endpoint, request)
+                    started = time.monotonic()
+                    latency = None
+                    error = None
+
+                    try:
+                        for delta in context.Stream():
+                            if latency is None:
+                                latency = time.monotonic() - started
+
+                            self.OnGenerate(delta)
+                            yield delta
+
+                        break
+
+                    except Exception as e:
+                        error = e
+
+                        # Requests are only moved to another endpoint before anything was streamed
+                        if latency is not None or not IsEndpointError(e) or len(tried) + 1 == len(self.Endpoints):
+                            raise
+
+                        tried.add(endpoint.Index)
+
+                    finally:
+                        self.Release(endpoint, latency if latency is not None or error is not None else time.monotonic() - started, error)
+
+            # A failed or abandoned turn leaves the message queued, to be sent again by the next run
+            except BaseException:
+                self.Rollback(start)
+                raise
+
+            reply = context.Top()
+
+            self.Messages.append(reply)
+            self.QueuePointer += 1
+            self.CacheStore(key, reply.Content if isinstance(reply, Message) else reply.get("content"))
+
+    async def StreamAsync(self, message: Message | dict | None = None, *args, **kwargs) -> AsyncIterator[Any]:
+        if message is not None:
+            self.Prompt(message)
+
+        while self.QueuePointer < len(self.MessageQueue):
+            start = len(self.Messages)
+            self.Messages.append(self.MessageQueue[self.QueuePointer])
+
+            key, content = self.CacheLookup()
+
+            if content is not None:
+                self.OnGenerate(content)
+                self.Messages.append(Message("assistant", content))
+                self.QueuePointer += 1
+
+                yield content
+                continue
+
+            request = self.RequestMessages()
+            tried: set[int] = set()
+
+            try:
+                while True:
+                    endpoint = self.Select(tried)
+                    context = self.Begin(endpoint, request)
+                    started = time.monotonic()
+                    latency = None
+                    error = None
+
+                    try:
+                        async for delta in context.StreamAsync():
+                            if latency is None:
+                                latency = time.monotonic() - started
+
+                            self.OnGenerate(delta)
+                            yield delta
+
+                        break
+
+                    except Exception as e:
+                        error = e
+
+                        if latency is not None or not IsEndpointError(e) or len(tried) + 1 == len(self.Endpoints):
+                            raise
+
+                        tried.add(endpoint.Index)
+
+                    finally:
+                        self.Release(endpoint, latency if latency is not None or error is not None else time.monotonic() - started, error)
+
+            # A failed or abandoned turn leaves the message queued, to be sent again by the next run
+            except BaseException:
+                self.Rollback(start)
+                raise
+
+            reply = context.Top()
+
+            self.Messages.append(reply)
+            self.QueuePointer += 1
+            self.CacheStore(key, reply.Content if isinstance(reply, Message) else reply.get("content"))
+
+    def Run(self, *args, **kwargs):
+        for _ in self.Stream():
+            pass
+
+        return self
+
+    async def RunAsync(self, *args, **kwargs):
+        async for _ in self.StreamAsync():
+            pass
+
+        return self
+
+    def Stats(self) -> list[dict[str, Any]]:
+        """
+        Get the load and health of every endpoint.
+
+        Returns:
+        - list[dict[str, Any]]: Per endpoint: model, outstanding and total requests, errors, ejections, latency EWMA and whether it is ejected.
+        """
+        now = time.monotonic()
+
+        with self.Lock:
+            return [
+                {
+                    "model": endpoint.Context.Model.Name,
+                    "outstanding": endpoint.Outstanding,
+                    "requests": endpoint.Requests,
+                    "errors": endpoint.Errors,
+                    "ejections": endpoint.Ejections,
+                    "latency": endpoint.Latency,
+                    "ejected": not endpoint.Available(now),
+                }
+                for endpoint in self.Endpoints
+            ]
@@ -0,0 +1,357 @@
+import asyncio
+import importlib
+import inspect
+import multiprocessing
+import os
+import threading
+from typing import Any, Callable
+
+from tinytune.memoize import Memoized
+
+
+def Reference(function: Callable) -> tuple[str, str]:
+    """
+    Get the module and qualified name a function is imported by in a worker process.
+
+    Parameters:
+    - function (Callable): The function.
+
+    Returns:
+    - tuple[str, str]: The module name and qualified name.
+    """
+    module = getattr(function, "__module__", None)
+    qualname = getattr(function, "__qualname__", None)
+
+    if not module or not qualname or "<locals>" in qualname or "<lambda>" in qualname:
+        raise ValueError(f"{function!r} can't run in a worker process: only functions defined at module or class level can be imported there.")
+
+    return module, qualname
+
+
+def Resolve(module: str, qualname: str) -> Callable:
+    """
+    Import a function by reference, unwrapping what tool() and the wrappers of this package return.
+
+    Parameters:
+    - module (str): The module name.
+    - qualname (str): The qualified name.
+
+    Returns:
+    - Callable: The plain function.
+    """
+    function: Any = importlib.import_module(module)
+
+    for name in qualname.split("."):
+        function = getattr(function, name)
+
+    while True:
+        if isinstance(function, tuple):
+            function = function[0]
+
+        elif isinstance(function, (Memoized, ProcessTool)):
+            function = function.Function
+
+        else:
+            return function
+
+
+def WorkerLoop(connection: Any):
+    """
+    Run tool calls received over a connection until it closes. Runs in the worker processes.
+
+    Parameters:
+    - connection (multiprocessing.connection.Connection): The worker's end of the pipe.
+    """
+    while True:
+        try:
+            task = connection.recv()
+
+        except (EOFError, OSError):
+            return
+
+        if task is None:
+            return
+
+        module, qualname, args, kwargs, memoryLimit = task
+        resource: Any = None
+        limits = None
+
+        try:
+            function = Resolve(module, qualname)
+
+            if memoryLimit is not None:
+                # Imported here since it only exists on Unix, where memory limits are supported
+                import resource
+
+                limits = resource.getrlimit(resource.RLIMIT_AS)
+                resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, limits[1]))
+
+            try:
+                result = function(*args, **kwargs)
+
+                if inspect.iscoroutine(result):
+                    result = asyncio.run(result)
+
+            finally:
+                if limits is not None:
+                    resource.setrlimit(resource.RLIMIT_AS, limits)
+
+            reply = ("result", result)
+
+        except BaseException as e:
+            reply = ("error", e)
+
+        try:
+            connection.send(reply)
+
+        # Results or exceptions that can't be pickled are reported by their repr
+        except Exception as e:
+            connection.send(("error", Exception(f"Couldn't send the {reply[0]} of {qualname} back: {e}: {reply[1]!r}")))
+
+
+class Worker:
+    """
+    A worker process and the parent's end of its pipe.
+    """
+    __slots__ = ("Process", "Connection")
+
+    def __init__(self, context: Any):
+        parent, child = context.Pipe()
+
+        self.Process: Any = context.Process(target=WorkerLoop, args=(child,), daemon=True, name="tinytune-tool")
+        self.Process.start()
+        self.Connection: Any = parent
+
+        child.close()
+
+    def Kill(self):
+        self.Process.kill()
+        self.Process.join()
+        self.Connection.close()
+
+
+class ProcessSandbox:
+    """
+    A pool of worker processes for CPU-bound tools, so they don't hold the GIL of the process running
+    the conversations. Unlike a ProcessPoolExecutor, a call that times out is stopped: its worker is
+    killed and replaced. Calls can also limit the memory their worker may use.
+    """
+    def __init__(self, maxWorkers: int | None = None, startMethod: str = "spawn"):
+        """
+        Initialize a ProcessSandbox object. Workers are started as calls need them.
+
+        Parameters:
+        - maxWorkers (int | None): Maximum number of worker processes. Defaults to the number of CPUs.
+        - startMethod (str): The multiprocessing start method. "spawn" is safe in processes running threads.
+        """
+        self.MaxWorkers: int = maxWorkers or os.cpu_count() or 1
+        self.Context: Any = multiprocessing.get_context(startMethod)
+
+        self.Slots: threading.Semaphore = threading.Semaphore(self.MaxWorkers)
+        self.Lock: threading.Lock = threading.Lock()
+        self.Idle: list[Worker] = []
+        self.Busy: set[Worker] = set()
+
+        self.Calls: int = 0
+        self.Timeouts: int = 0
+        self.Crashes: int = 0
+
+    def Acquire(self) -> Worker:
+        with self.Lock:
+            worker = self.Idle.pop() if self.Idle else None
+
+        if worker is None or not worker.Process.is_alive():
+            worker = Worker(self.Context)
+
+        with self.Lock:
+            self.Busy.add(worker)
+
+        return worker
+
+    def Release(self, worker: Worker, kill: bool = False):
+        with self.Lock:
+            self.Busy.discard(worker)
+
+            if not kill:
+                self.Idle.append(worker)
+
+        if kill:
+            worker.Kill()
+
+    def Run(self, function: Callable, args: tuple = (), kwargs: dict | None = None, timeout: float | None = None, memoryLimit: int | None = None) -> Any:
+        """
+        Call a function in a worker process, blocking until it returns.
+
+        Parameters:
+        - function (Callable): The function. It's imported by reference in the worker, so it must be defined at module or class level.
+        - args (tuple): The positional arguments.
+        - kwargs (dict | None): The keyword arguments.
+        - timeout (float | None): Seconds the call may run before its worker is killed. None for no limit.
+        - memoryLimit (int | None): Bytes of address space the worker may use during the call. None for no limit.
+
+        Returns:
+        - Any: The result of the function. Exceptions raised by the function are raised here.
+        """
+        task = (*Reference(function), tuple(args), dict(kwargs or {}), memoryLimit)
+
+        with self.Slots:
+            worker = self.Acquire()
+
+            try:
+                worker.Connection.send(task)
+
+            # Arguments that can't be pickled never reach the worker, which stays usable
+            except Exception:
+                self.Release(worker)
+                raise
+
+            status, value = None, None
+
+            try:
+                ready = worker.Connection.poll(timeout)
+
+                if ready:
+                    status, value = worker.Connection.recv()
+
+            # The worker died during the call, e.g. killed for running out of memory
+            except (EOFError, OSError):
+                self.Release(worker, kill=True)
+
+                with self.Lock:
+                    self.Crashes += 1
+
+                raise Exception(f"The worker running {task[1]} exited with code {worker.Process.exitcode}.")
+
+            if not ready:
+                self.Release(worker, kill=True)
+
+                with self.Lock:
+                    self.Timeouts += 1
+
+                raise TimeoutError(f"{task[1]} didn't return within {timeout} seconds.")
+
+            self.Release(worker)
+
+        with self.Lock:
+            self.Calls += 1
+
+        if status == "error" and isinstance(value, BaseException):
+            raise value
+
+        return value
+
+    async def RunAsync(self, function: Callable, args: tuple = (), kwargs: dict | None = None, timeout: float | None = None, memoryLimit: int | None = None) -> Any:
+        """
+        Asynchronous counterpart of Run. The event loop keeps running while the worker computes.
+
+        Parameters:
+        - function (Callable): The function.
+        - args (tuple): The positional arguments.
+        - kwargs (dict | None): The keyword arguments.
+        - timeout (float | None): Seconds the call may run before its worker is killed.
+        - memoryLimit (int | None): Bytes of address space the worker may use during the call.
+
+        Returns:
+        - Any: The result of the function.
+        """
+        return await asyncio.to_thread(self.Run, function, args, kwargs, timeout, memoryLimit)
+
+    def Close(self):
+        """
+        Stop the idle workers and kill the busy ones.
+        """
+        with self.Lock:
+            idle, busy = self.Idle, list(self.Busy)
+            self.Idle, self.Busy = [], set()
+
+        for worker in idle:
+            try:
+                worker.Connection.send(None)
+                worker.Process.join(1)
+
+            except (OSError, ValueError):
+                pass
+
+            if worker.Process.is_alive():
+                worker.Process.kill()
+
+            worker.Connection.close()
+
+        for worker in busy:
+            worker.Kill()
+
+    def Stats(self) -> dict[str, int]:
+        """
+        Get the sandbox counters.
+
+        Returns:
+        - dict[str, int]: Completed calls, calls that timed out, workers that crashed, and running workers.
+        """
+        with self.Lock:
+            return {"calls": self.Calls, "timeouts": self.Timeouts, "crashes": self.Crashes, "workers": len(self.Idle) + len(self.Busy)}
+
+
+# The sandbox CPU-bound tools run in unless given another
+Processes: ProcessSandbox = ProcessSandbox()
+
+
+class ProcessTool:
+    """
+    A tool whose calls run in a ProcessSandbox. Calling it blocks only the calling thread, which waits
+    on a pipe without holding the GIL; ToolEngine runs it on a worker thread from the event loop.
+    """
+    def __init__(self, function: Callable, timeout: float | None = None, memoryLimit: int | None = None, sandbox: ProcessSandbox | None = None):
+        """
+        Initialize a ProcessTool object.
+
+        Parameters:
+        - function (Callable): The tool, defined at module or class level.
+        - timeout (float | None): Seconds a call may run before it's stopped. None for no limit.
+        - memoryLimit (int | None): Bytes of address space a call may use. None for no limit.
+        - sandbox (ProcessSandbox | None): The sandbox calls run in. Defaults to the shared sandbox.
+        """
+        if memoryLimit is not None:
+            try:
+                import resource
+
+            except ImportError:
+                raise Exception("Memory limits need the resource module, which is only available on Unix.")
+
+        # Checked here, so a tool that can't run in a worker fails when it's defined
+        Reference(function)
+
+        self.Function: Callable = function
+        self.Timeout: float | None = timeout
+        self.MemoryLimit: int | None = memoryLimit
+        self.Sandbox: ProcessSandbox | None = sandbox
+
+        self.__name__ = getattr(function, "__name__", type(function).__name__)
+        self.__doc__ = function.__doc__
+        self.__wrapped__ = function
+
+    def __call__(self, *args, **kwargs) -> Any:
+        sandbox = self.Sandbox if self.Sandbox is not None else Processes
+
+        return sandbox.Run(self.Function, args, kwargs, self.Timeout, self.MemoryLimit)
+
+
+def cpu_bound(func: Callable | None = None, timeout: float | None = None, memoryLimit: int | None = None, sandbox: ProcessSandbox | None = None):
+    """
+    Decorator running a function in worker processes. Usable as @cpu_bound or @cpu_bound(timeout=...).
+
+    Parameters:
+    - func (Callable | None): The function, defined at module or class level.
+    - timeout (float | None): Seconds a call may run before it's stopped.
+    - memoryLimit (int | None): Bytes of address space a call may use.
+    - sandbox (ProcessSandbox | None): The sandbox calls run in.
+
+    Returns:
+    - ProcessTool: The wrapped function.
+    """
+    def wrapper(func: Callable):
+        return ProcessTool(func, timeout, memoryLimit, sandbox)
+
+    if func is None:
+        return wrapper
+
+    return wrapper(func)
@@ -0,0 +1,408 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+
+RetryableStatusCodes: set[int] = {408, 409, 429, 500, 502, 503, 504}
+
+
+def EstimateTokens(messages: list[dict]) -> int:
+    """
+    Roughly estimate the number of prompt tokens in a list of wire-format messages.
+
+    Parameters:
+    - messages (list[dict]): The messages.
+
+    Returns:
+    - int: The estimated token count.
+    """
+    return sum(len(str(message.get("content") or "")) // 4 + 4 for message in messages)
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at a fixed rate. Reservations may overdraw the bucket,
+    in which case the caller has to wait until the debt is paid back.
+    """
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize a TokenBucket object.
+
+        Parameters:
+        - rate (float): Tokens added per second.
+        - capacity (float): Maximum number of tokens the bucket holds.
+        """
+        self.Rate: float = rate
+        self.Capacity: float = capacity
+        self.Tokens: float = capacity
+        self.Updated: float = time.monotonic()
+        self.Lock: threading.Lock = threading.Lock()
+
+    def Reserve(self, amount: float) -> float:
+        """
+        Take tokens from the bucket.
+
+        Parameters:
+        - amount (float): The number of tokens to take. Negative amounts return tokens.
+
+        Returns:
+        - float: Seconds to wait before the reservation is covered.
+        """
+        with self.Lock:
+            now = time.monotonic()
+
+            self.Tokens = min(self.Capacity, self.Tokens + (now - self.Updated) * self.Rate)
+            self.Updated = now
+            self.Tokens -= amount
+
+            return max(0.0, -self.Tokens / self.Rate)
+
+
+class RequestScheduler:
+    """
+    Schedules provider requests under requests-per-minute and tokens-per-minute budgets.
+    Concurrency adapts AIMD-style: it grows additively on fast successful requests and shrinks
+    multiplicatively on rate limits (429) or slow responses. Failed requests are retried with
+    exponential backoff and full jitter. One scheduler can be shared by many contexts.
+    """
+    def __init__(
+        self,
+        requestsPerMinute: float | None = None,
+        tokensPerMinute: float | None = None,
+        maxConcurrency: int = 64,
+        minConcurrency: int = 1,
+        concurrency: int | None = None,
+        targetLatency: float | None = None,
+        decrease: float = 0.5,
+        maxRetries: int = 6,
+        baseDelay: float = 0.5,
+        maxDelay: float = 60.0,
+    ):
+        """
+        Initialize a RequestScheduler object.
+
+        Parameters:
+        - requestsPerMinute (float | None): Request budget. None for no limit.
+        - tokensPerMinute (float | None): Token budget. None for no limit.
+        - maxConcurrency (int): Upper bound for the number of requests in flight.
+        - minConcurrency (int): Lower bound for the number of requests in flight.
+        - concurrency (int | None): Initial concurrency. Defaults to maxConcurrency.
+        - targetLatency (float | None): Seconds above which a response counts as a congestion signal.
+        - decrease (float): Factor concurrency is multiplied by on a congestion signal.
+        - maxRetries (int): Number of retries for a failed request.
+        - baseDelay (float): Backoff delay for the first retry, in seconds.
+        - maxDelay (float): Upper bound for the backoff delay, in seconds.
+        """
+        self.Requests: TokenBucket | None = TokenBucket(requestsPerMinute / 60, max(requestsPerMinute / 60, 1)) if requestsPerMinute else None
+        self.Tokens: TokenBucket | None = TokenBucket(tokensPerMinute / 60, tokensPerMinute / 60) if tokensPerMinute else None
+        self.MaxConcurrency: int = maxConcurrency
+        self.MinConcurrency: int = minConcurrency
+        self.Concurrency: float = float(concurrency or maxConcurrency)
+        self.TargetLatency: float | None = targetLatency
+        self.Decrease: float = decrease
+        self.MaxRetries: int = maxRetries
+        self.BaseDelay: float = baseDelay
+        self.MaxDelay: float = maxDelay
+
+        self.InFlight: int = 0
+        # Wake-up callbacks of queued acquirers, returning whether they woke one
+        self.Waiters: deque[Callable[[], bool]] = deque()
+        self.Lock: threading.Lock = threading.Lock()
+        self.LastDecrease: float = 0.0
+        self.Latency: float = 0.0
+
+        self.Submitted: int = 0
+        self.Retries: int = 0
+        self.RateLimited: int = 0
+        self.QueueWait: float = 0.0
+
+    def Limit(self) -> int:
+        return max(self.MinConcurrency, int(self.Concurrency))
+
+    def Wake(self):
+        # Called with the lock held
+        free = self.Limit() - self.InFlight
+
+        while free > 0 and self.Waiters:
+            if self.Waiters.popleft()():
+                free -= 1
+
+    def Acquire(self):
+        """
+        Block until a concurrency slot is available and take it.
+        """
+        while True:
+            with self.Lock:
+                if self.InFlight < self.Limit():
+                    self.InFlight += 1
+                    return
+
+                event = threading.Event()
+                self.Waiters.append(lambda: event.set() or True)
+
+            event.wait()
+
+    async def AcquireAsync(self):
+        """
+        Wait on the event loop until a concurrency slot is available and take it.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            with self.Lock:
+                if self.InFlight < self.Limit():
+                    self.InFlight += 1
+                    return
+
+                future = loop.create_future()
+
+                def Notify() -> bool:
+                    try:
+                        loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+                    # A waiter whose loop has closed can't take the slot
+                    except RuntimeError:
+                        return False
+
+                    return True
+
+                self.Waiters.append(Notify)
+
+            try:
+                await future
+
+            except asyncio.CancelledError:
+                with self.Lock:
+                    try:
+                        self.Waiters.remove(Notify)
+
+                    # Already woken, so the wake-up is passed on to the next waiter
+                    except ValueError:
+                        self.Wake()
+
+                raise
+
+    def Release(self):
+        """
+        Give a concurrency slot back.
+        """
+        with self.Lock:
+            self.InFlight -= 1
+            self.Wake()
+
+    def Delay(self, tokens: int) -> float:
+        """
+        Reserve budget for a request.
+
+        Parameters:
+        - tokens (int): Estimated tokens of the request.
+
+        Returns:
+        - float: Seconds to wait before sending the request.
+        """
+        delay = 0.0
+
+        if self.Requests is not None:
+            delay = max(delay, self.Requests.Reserve(1))
+
+        if self.Tokens is not None and tokens:
+            delay = max(delay, self.Tokens.Reserve(tokens))
+
+        return delay
+
+    def OnSuccess(self, latency: float, result: Any, tokens: int):
+        """
+        Update the concurrency limit and token budget after a successful request.
+        """
+        usage = getattr(result, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+
+        if self.Tokens is not None and isinstance(used, int):
+            self.Tokens.Reserve(used - tokens)
+
+        with self.Lock:
+            self.Latency = latency if not self.Latency else 0.8 * self.Latency + 0.2 * latency
+
+            if self.TargetLatency is not None and latency > self.TargetLatency:
+                self.Shrink()
+            else:
+                self.Concurrency = min(float(self.MaxConcurrency), self.Concurrency + 1 / self.Concurrency)
+
+            self.Wake()
+
+    def Shrink(self):
+        # Called with the lock held. Signals within one round trip of the last decrease are
+        # the same congestion event and don't shrink the window again.
+        now = time.monotonic()
+
+        if now - self.LastDecrease >= max(self.Latency, 0.1):
+            self.Concurrency = max(float(self.MinConcurrency), self.Concurrency * self.Decrease)
+            self.LastDecrease = now
+
+    def IsRetryable(self, error: Exception) -> bool:
+        status = getattr(error, "status_code", None)
+
+        if status is not None:
+            return status in RetryableStatusCodes
+
+        return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+    def OnError(self, error: Exception, attempt: int) -> float | None:
+        """
+        Handle a failed request.
+
+        Returns:
+        - float | None: Seconds to wait before retrying, or None if the error should be raised.
+        """
+        if attempt >= self.MaxRetries or not self.IsRetryable(error):
+            return None
+
+        delay = random.uniform(0, min(self.MaxDelay, self.BaseDelay * 2 ** attempt))
+
+        with self.Lock:
+            self.Retries += 1
+
+            if getattr(error, "status_code", None) == 429:
+                self.RateLimited += 1
+                self.Shrink()
+
+        response = getattr(error, "response", None)
+        retryAfter = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+
+        if retryAfter is not None:
+            try:
+                delay = max(delay, float(retryAfter))
+
+            except ValueError:
+                pass
+
+        return min(delay, self.MaxDelay)
+
+    def Submit(self, request: Callable[[], Any], tokens: int = 0, hold: bool = False) -> Any:
+        """
+        Run a request under the scheduler's budgets, retrying it on transient errors.
+
+        Parameters:
+        - request (Callable[[], Any]): Sends the request and returns the response.
+        - tokens (int): Estimated tokens of the request.
+        - hold (bool): Keep the concurrency slot after a successful request, e.g. while a streamed response is read. The caller gives it back with Release.
+
+        Returns:
+        - Any: The response.
+        """
+        attempt = 0
+
+        with self.Lock:
+            self.Submitted += 1
+
+        while True:
+            queued = time.monotonic()
+
+            time.sleep(self.Delay(tokens))
+            self.Acquire()
+
+            started = time.monotonic()
+
+            with self.Lock:
+                self.QueueWait += started - queued
+
+            try:
+                result = request()
+
+            except Exception as e:
+                self.Release()
+
+                delay = self.OnError(e, attempt)
+
+                if delay is None:
+                    raise
+
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            # Interrupted requests, e.g. cancelled tasks, give their slot back too
+            except BaseException:
+                self.Release()
+                raise
+
+            if not hold:
+                self.Release()
+
+            self.OnSuccess(time.monotonic() - started, result, tokens)
+
+            return result
+
+    async def SubmitAsync(self, request: Callable[[], Awaitable[Any]], tokens: int = 0, hold: bool = False) -> Any:
+        """
+        Asynchronous counterpart of Submit.
+
+        Parameters:
+        - request (Callable[[], Awaitable[Any]]): Sends the request and returns the response.
+        - tokens (int): Estimated tokens of the request.
+        - hold (bool): Keep the concurrency slot after a successful request. The caller gives it back with Release.
+
+        Returns:
+        - Any: The response.
+        """
+        attempt = 0
+
+        with self.Lock:
+            self.Submitted += 1
+
+        while True:
+            queued = time.monotonic()
+
+            await asyncio.sleep(self.Delay(tokens))
+            await self.AcquireAsync()
+
+            started = time.monotonic()
+
+            with self.Lock:
+                self.QueueWait += started - queued
+
+            try:
+                result = await request()
+
+            except Exception as e:
+                self.Release()
+
+                delay = self.OnError(e, attempt)
+
+                if delay is None:
+                    raise
+
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            # Interrupted requests, e.g. cancelled tasks, give their slot back too
+            except BaseException:
+                self.Release()
+                raise
+
+            if not hold:
+                self.Release()
+
+            self.OnSuccess(time.monotonic() - started, result, tokens)
+
+            return result
+
+    def Stats(self) -> dict[str, float]:
+        """
+        Get the scheduler counters.
+
+        Returns:
+        - dict[str, float]: Submitted requests, retries, rate limits, queue wait and the current concurrency limit.
+        """
+        return {
+            "submitted": self.Submitted,
+            "retries": self.Retries,
+            "rate_limited": self.RateLimited,
+            "queue_wait": self.QueueWait,
+            "concurrency": self.Limit(),
+            "in_flight": self.InFlight,
+        }
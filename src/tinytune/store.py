@@ -0,0 +1,471 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Callable, Iterable, Iterator
+
+from tinytune.journal import EncodeRecord
+from tinytune.llmcontext import ChainDigest, Message
+
+
+# Index file layout: magic, the number of data bytes the offsets cover, the inode of the data file,
+# a checksum of the covered bytes, then one offset per record
+IndexMagic: bytes = b"TTIX0002"
+IndexHeader: struct.Struct = struct.Struct("<8sQQ16s")
+
+# Bytes at each end of the covered data the checksum is taken over
+IndexSample: int = 4096
+
+
+class ConversationStore:
+    """
+    A conversation stored as a JSONL file, read through a memory map and an offset index.
+    Records are located in O(1) and only parsed when they are accessed, so opening and resuming
+    a multi-gigabyte transcript costs no more than loading its index. The data file has the same
+    format as a MessageJournal. The index is kept next to it in <path>.idx and is extended, not
+    rebuilt, when records were appended to the file by something else. It is rebuilt when the file
+    it covers was replaced or rewritten, e.g. by compacting a journal at the same path.
+    """
+    def __init__(self, path: str, syncEvery: int = 64, syncInterval: float | None = 1.0):
+        """
+        Initialize a ConversationStore object.
+
+        Parameters:
+        - path (str): The data file path.
+        - syncEvery (int): Number of appended records after which the files are fsynced.
+        - syncInterval (float | None): Seconds after which pending records are fsynced on the next append. None to sync by count only.
+        """
+        self.Path: str = path
+        self.IndexPath: str = f"{path}.idx"
+        self.SyncEvery: int = syncEvery
+        self.SyncInterval: float | None = syncInterval
+        self.Lock: threading.RLock = threading.RLock()
+
+        self.Offsets: array = array("Q")
+        self.Size: int = 0
+        self.Indexed: int = 0
+        self.Pending: int = 0
+        self.LastSync: float = time.monotonic()
+        self.Map: mmap.mmap | None = None
+
+        self.File: Any = open(path, "ab+")
+        self.LoadIndex()
+
+    def Checksum(self, covered: int) -> bytes:
+        """
+        Hash both ends of the first bytes of the data file, to tell whether an index still
+        describes them without reading the whole file.
+
+        Parameters:
+        - covered (int): The number of bytes the index covers.
+
+        Returns:
+        - bytes: The checksum.
+        """
+        sample = min(covered, IndexSample)
+
+        self.File.seek(0)
+        head = self.File.read(sample)
+        self.File.seek(covered - sample)
+        tail = self.File.read(sample)
+
+        return hashlib.blake2b(head + tail, digest_size=16).digest()
+
+    def LoadIndex(self):
+        """
+        Load the offset index, extending it over records it doesn't cover yet and
+        cutting off a torn trailing record. An index written for another file is rebuilt.
+        """
+        stat = os.fstat(self.File.fileno())
+        size = stat.st_size
+        covered = 0
+
+        if os.path.exists(self.IndexPath):
+            with open(self.IndexPath, "rb") as fp:
+                header = fp.read(IndexHeader.size)
+
+                if len(header) == IndexHeader.size:
+                    magic, covered, inode, checksum = IndexHeader.unpack(header)
+
+                    if magic == IndexMagic and covered <= size and inode == stat.st_ino and checksum == self.Checksum(covered):
+                        count = (os.fstat(fp.fileno()).st_size - IndexHeader.size) // self.Offsets.itemsize
+                        self.Offsets.fromfile(fp, count)
+                    else:
+                        covered = 0
+
+        self.Indexed = len(self.Offsets)
+
+        # Index the records appended since the index was written
+        self.File.seek(covered)
+        offset = covered
+
+        for line in self.File:
+            if not line.endswith(b"\n"):
+                break
+
+            self.Offsets.append(offset)
+            offset += len(line)
+
+        if offset != size:
+            self.File.truncate(offset)
+
+        self.Size = offset
+
+    def SaveIndex(self):
+        """
+        Write the offsets not yet in the index file, and the data they cover.
+        """
+        mode = "r+b" if self.Indexed and os.path.exists(self.IndexPath) else "wb"
+        header = IndexHeader.pack(IndexMagic, self.Size, os.fstat(self.File.fileno()).st_ino, self.Checksum(self.Size))
+
+        with open(self.IndexPath, mode) as fp:
+            if mode == "wb":
+                self.Indexed = 0
+
+            fp.write(header)
+            fp.seek(IndexHeader.size + self.Indexed * self.Offsets.itemsize)
+            self.Offsets[self.Indexed:].tofile(fp)
+            fp.truncate()
+
+        self.Indexed = len(self.Offsets)
+
+    def View(self) -> mmap.mmap:
+        # Called with the lock held. Remaps once the file has grown past the current mapping;
+        # the old mapping is closed once the last reader using it lets go of it.
+        if self.Map is None or len(self.Map) < self.Size:
+            self.Map = mmap.mmap(self.File.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self.Map
+
+    def Raw(self, index: int) -> bytes:
+        """
+        Get the encoded record at an index.
+
+        Parameters:
+        - index (int): The record index.
+
+        Returns:
+        - bytes: The JSON record, without its trailing newline.
+        """
+        with self.Lock:
+            start = self.Offsets[index]
+            end = self.Offsets[index + 1] if index + 1 < len(self.Offsets) else self.Size
+
+            return self.View()[start:end - 1]
+
+    def RawRange(self, start: int, stop: int | None = None) -> bytes:
+        """
+        Get the encoded records in a range of indices, as one contiguous piece of the file.
+
+        Parameters:
+        - start (int): The first record index.
+        - stop (int | None): The index after the last record. None for the end of the store.
+
+        Returns:
+        - bytes: The JSON records, each terminated by a newline.
+        """
+        with self.Lock:
+            count = len(self.Offsets)
+            stop = count if stop is None else min(stop, count)
+
+            if start >= stop:
+                return b""
+
+            end = self.Offsets[stop] if stop < count else self.Size
+
+            return self.View()[self.Offsets[start]:end]
+
+    def Record(self, index: int) -> dict:
+        """
+        Parse the record at an index.
+
+        Parameters:
+        - index (int): The record index.
+
+        Returns:
+        - dict: The stored message.
+        """
+        return json.loads(self.Raw(index))
+
+    def Append(self, messages: Iterable[Any]) -> int:
+        """
+        Append messages to the store.
+
+        Parameters:
+        - messages (Iterable[Message | dict]): The messages to append.
+
+        Returns:
+        - int: The number of records appended.
+        """
+        records = [EncodeRecord(message) for message in messages]
+
+        if not records:
+            return 0
+
+        with self.Lock:
+            self.File.write(b"".join(records))
+            self.File.flush()
+
+            for record in records:
+                self.Offsets.append(self.Size)
+                self.Size += len(record)
+
+            self.Pending += len(records)
+
+            if self.Pending >= self.SyncEvery or (self.SyncInterval is not None and time.monotonic() - self.LastSync >= self.SyncInterval):
+                self.Sync()
+
+        return len(records)
+
+    def Truncate(self, count: int):
+        """
+        Remove the records from an index onwards, e.g. the messages of a turn that failed.
+
+        Parameters:
+        - count (int): The number of records to keep.
+        """
+        with self.Lock:
+            if count >= len(self.Offsets):
+                return
+
+            self.Size = self.Offsets[count]
+            del self.Offsets[count:]
+            self.File.truncate(self.Size)
+            self.Indexed = min(self.Indexed, count)
+
+            # The mapping reaches past the end of the file now. Like a remap, the old one is closed once its readers let go of it
+            self.Map = None
+
+            if os.path.exists(self.IndexPath):
+                self.SaveIndex()
+
+    def Sync(self):
+        """
+        Flush pending records to disk and bring the index file up to date.
+        """
+        with self.Lock:
+            if self.Pending:
+                os.fsync(self.File.fileno())
+
+            if self.Indexed != len(self.Offsets) or not os.path.exists(self.IndexPath):
+                self.SaveIndex()
+
+            self.Pending = 0
+            self.LastSync = time.monotonic()
+
+    def Search(self, text: str) -> Iterator[int]:
+        """
+        Find the records containing a piece of text, scanning the mapped file without parsing it.
+
+        Parameters:
+        - text (str): The text to search for.
+
+        Returns:
+        - Iterator[int]: Indices of the matching records, in order.
+        """
+        needle = json.dumps(text, ensure_ascii=False)[1:-1].encode()
+
+        with self.Lock:
+            if not self.Size:
+                return
+
+            view = self.View()
+            size = self.Size
+
+        position = view.find(needle, 0, size)
+
+        while position != -1:
+            index = bisect_right(self.Offsets, position) - 1
+            yield index
+
+            # Continue after the matching record
+            end = self.Offsets[index + 1] if index + 1 < len(self.Offsets) else size
+            position = view.find(needle, end, size)
+
+    def Close(self):
+        """
+        Sync and close the store.
+        """
+        with self.Lock:
+            if self.File.closed:
+                return
+
+            self.Sync()
+
+            if self.Map is not None:
+                self.Map.close()
+                self.Map = None
+
+            self.File.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def __len__(self) -> int:
+        return len(self.Offsets)
+
+
+class StoredMessages(Sequence):
+    """
+    A lazy, append-only message history over a ConversationStore, from which only trailing messages can be removed. Indexing and slicing only parse
+    the records they touch, and recently used messages are kept in a small LRU, so Messages[-1] or
+    the last few turns of a huge transcript are read without loading anything before them.
+    It provides the MessageHistory interface contexts rely on, so Top() and Run() work unchanged;
+    appended messages are written to the store. The wire view and digest are built from the stored
+    records, so editing a message in place changes neither, and the digest equals that of a
+    MessageHistory holding the same messages.
+    """
+    def __init__(self, store: ConversationStore, factory: Callable[[dict], Any] | None = None, cacheSize: int = 1024):
+        """
+        Initialize a StoredMessages object.
+
+        Parameters:
+        - store (ConversationStore): The store holding the messages.
+        - factory (Callable[[dict], Any] | None): Builds a message from a stored record. None to use Message.FromDict.
+        - cacheSize (int): Number of parsed messages kept in memory.
+        """
+        self.Store: ConversationStore = store
+        self.Factory: Callable[[dict], Any] = factory or Message.FromDict
+        self.CacheSize: int = cacheSize
+        self.Cache: OrderedDict[int, Any] = OrderedDict()
+
+        self.WireMessages: list[dict] = []
+        self.Synced: int = 0
+        self.Digests: list[bytes] = []
+        self.Hashed: int = 0
+        # Messages read from the store are copies of its records, so in-place edits are never tracked
+        self.Edits: int = 0
+        self.Persisted: int = 0
+        self.PersistedEdits: int = 0
+        self.Tokens: Any = None
+        self.Counted: int = 0
+
+    def Remember(self, index: int, message: Any):
+        self.Cache[index] = message
+        self.Cache.move_to_end(index)
+
+        while len(self.Cache) > self.CacheSize:
+            self.Cache.popitem(last=False)
+
+    def Get(self, index: int) -> Any:
+        message = self.Cache.get(index)
+
+        if message is None:
+            message = self.Factory(self.Store.Record(index))
+
+        self.Remember(index, message)
+
+        return message
+
+    def __getitem__(self, index: int | slice) -> Any:
+        length = len(self.Store)
+
+        if isinstance(index, slice):
+            return [self.Get(i) for i in range(*index.indices(length))]
+
+        if index < 0:
+            index += length
+
+        if not 0 <= index < length:
+            raise IndexError("message index out of range")
+
+        return self.Get(index)
+
+    def __len__(self) -> int:
+        return len(self.Store)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self.Store)):
+            yield self.Get(index)
+
+    def append(self, message: Any):
+        index = len(self.Store)
+
+        self.Store.Append([message])
+        self.Remember(index, message)
+
+    def extend(self, messages: Iterable[Any]):
+        for message in messages:
+            self.append(message)
+
+    def __delitem__(self, index: int | slice):
+        # Only trailing messages can be removed, which is what rolling back a failed turn needs
+        length = len(self.Store)
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+        else:
+            start = index + length if index < 0 else index
+            stop, step = start + 1, 1
+
+        if step != 1 or stop != length:
+            raise ValueError("Stored messages are append-only: only trailing messages can be removed.")
+
+        if start >= length:
+            return
+
+        self.Store.Truncate(start)
+
+        for key in [key for key in self.Cache if key >= start]:
+            del self.Cache[key]
+
+        del self.WireMessages[start:]
+        del self.Digests[start:]
+        self.Synced = min(self.Synced, start)
+        self.Hashed = min(self.Hashed, start)
+        self.Persisted = min(self.Persisted, start)
+        self.Counted = min(self.Counted, start)
+
+    def Invalidate(self, index: int = 0):
+        # Stored messages are never rewritten, so there is nothing to invalidate
+        pass
+
+    def Wire(self) -> list[dict]:
+        """
+        Get the wire-format view of the history. Only records appended since the last call are
+        read, and they're parsed together from the mapped file. The returned list is owned by the
+        history and must not be modified.
+
+        Returns:
+        - list[dict]: The stored messages, as stored.
+        """
+        wire = self.WireMessages
+        data = self.Store.RawRange(len(wire))
+
+        # Records never contain raw newlines, so the lines form a JSON array once joined by commas
+        if data:
+            wire.extend(json.loads(b"[" + data[:-1].replace(b"\n", b",") + b"]"))
+
+        self.Synced = len(wire)
+
+        return wire
+
+    def Digest(self) -> str:
+        """
+        Get a stable hash of the history, chained over the wire view like MessageHistory.Digest.
+        Only records appended since the last call are read and hashed.
+
+        Returns:
+        - str: The hex digest of the history.
+        """
+        wire = self.Wire()
+        digests = self.Digests
+        previous = digests[-1] if digests else b""
+
+        for message in wire[len(digests):]:
+            previous = ChainDigest(previous, message)
+            digests.append(previous)
+
+        self.Hashed = len(digests)
+
+        return previous.hex()
@@ -0,0 +1,205 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from tinytune.llmcontext import GetContent
+from tinytune.window import ApproximateTokens, MessageOverhead
+
+
+SummaryInstruction: str = (
+    "Summarize the conversation below so it can replace it as context for the rest of the conversation. "
+    "Keep every fact, decision, name, number and open question that later turns may depend on. "
+    "Be concise and write the summary only."
+)
+
+# Background summaries of every summarizer run on these threads, which are started on first use
+SummaryExecutor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarizer")
+
+
+class Summarizer:
+    """
+    Bounds prompt size by folding older turns of a conversation into a summary message.
+    Once the unsummarized part of the history passes a token threshold, all but the most recent
+    messages are summarized, together with the previous summary, by a secondary (usually cheaper)
+    context. This runs on a thread shared by all summarizers, so the turn that crossed the threshold
+    is sent in full and later turns pick the summary up as soon as it is ready. The history itself is kept
+    intact; only the messages sent to the model change.
+    """
+    def __init__(
+        self,
+        context: Any,
+        threshold: int = 8000,
+        keep: int = 6,
+        tokenizer: Callable[[str], int] | None = None,
+        instruction: str = SummaryInstruction,
+        background: bool = True,
+    ):
+        """
+        Initialize a Summarizer object.
+
+        Parameters:
+        - context (LLMContext): The context summaries are generated with. It is spawned for every summary, never used directly.
+        - threshold (int): Tokens of unsummarized history above which older turns are summarized.
+        - keep (int): Number of most recent messages always sent verbatim.
+        - tokenizer (Callable[[str], int] | None): Counts the tokens of a text. Defaults to ApproximateTokens.
+        - instruction (str): The instruction the summary is requested with.
+        - background (bool): Summarize on a background thread instead of before the request.
+        """
+        self.Context: Any = context
+        self.Threshold: int = threshold
+        self.Keep: int = keep
+        self.Tokenizer: Callable[[str], int] = tokenizer or ApproximateTokens
+        self.Instruction: str = instruction
+        self.Background: bool = background
+
+        self.Reset()
+
+    def Reset(self):
+        """
+        Drop the current summary and the state tied to the history it was made for.
+        """
+        self.Source: Any = None
+        self.Summary: dict | None = None
+        self.Kept: list[dict] = []
+        # Messages before Start are covered by the summary; Anchor is the last of them
+        self.Start: int = 0
+        self.Anchor: dict | None = None
+        # Token counts of the messages from Start onwards
+        self.Counts: list[int] = []
+        self.Counted: int = 0
+        self.Tokens: int = 0
+        self.Pending: Future | None = None
+        self.Error: Exception | None = None
+        self.Summaries: int = 0
+
+    def Spawn(self) -> Any:
+        """
+        Create a summarizer with the same configuration and no state, for a spawned context.
+
+        Returns:
+        - Summarizer: The new summarizer.
+        """
+        return Summarizer(self.Context, self.Threshold, self.Keep, self.Tokenizer, self.Instruction, self.Background)
+
+    def MessageTokens(self, message: dict) -> int:
+        return self.Tokenizer(str(message.get("content") or "")) + MessageOverhead
+
+    def Transcript(self, messages: list[dict]) -> str:
+        """
+        Render messages as the text the summary is requested for.
+
+        Parameters:
+        - messages (list[dict]): The messages to summarize.
+
+        Returns:
+        - str: The transcript, including the previous summary.
+        """
+        parts = [self.Instruction, ""]
+
+        if self.Summary is not None:
+            parts += ["Summary of the conversation so far:", str(self.Summary["content"]), ""]
+
+        parts += [f"{message.get('role')}: {message.get('content')}" for message in messages]
+
+        return "\n".join(parts)
+
+    def Summarize(self, messages: list[dict], end: int) -> tuple[dict, list[dict], int, dict]:
+        """
+        Fold messages into a new summary with the secondary context.
+
+        Parameters:
+        - messages (list[dict]): The messages from the current start up to end.
+        - end (int): History index the new summary covers up to.
+
+        Returns:
+        - tuple[dict, list[dict], int, dict]: The summary message, the system messages kept beside it, the new start and its anchor.
+        """
+        context = self.Context.Spawn()
+        folded = [message for message in messages if message.get("role") != "system"]
+        kept = [message for message in messages if message.get("role") == "system"]
+
+        context.Prompt(context.MessageClass("user", self.Transcript(folded))).Run()
+
+        summary = {"role": "system", "content": f"Summary of the earlier conversation:\n{GetContent(context.Top())}"}
+
+        return summary, self.Kept + kept, end, messages[-1]
+
+    def Collect(self):
+        """
+        Install a finished background summary.
+        """
+        if self.Pending is None or not self.Pending.done():
+            return
+
+        future = self.Pending
+        self.Pending = None
+
+        try:
+            self.Summary, self.Kept, start, self.Anchor = future.result()
+
+        except Exception as e:
+            # The full history keeps being sent; the next turn past the threshold tries again
+            self.Error = e
+            return
+
+        self.Tokens -= sum(self.Counts[:start - self.Start])
+        del self.Counts[:start - self.Start]
+
+        self.Start = start
+        self.Summaries += 1
+
+    def Wait(self):
+        """
+        Block until a pending summary is finished and install it.
+        """
+        if self.Pending is not None:
+            self.Pending.exception()
+
+        self.Collect()
+
+    def Apply(self, history: Any) -> list[dict]:
+        """
+        Get the messages to send for a history, starting a summary if it has grown past the threshold.
+
+        Parameters:
+        - history (MessageHistory): The history.
+
+        Returns:
+        - list[dict]: The wire-format messages to send. The history's own list is returned while nothing is summarized.
+        """
+        wire = history.Wire()
+
+        # A summary only stays valid while the messages it covers are unchanged
+        if history is not self.Source or len(wire) < self.Start or (self.Start and wire[self.Start - 1] is not self.Anchor):
+            if self.Pending is not None:
+                self.Pending.cancel()
+
+            self.Reset()
+            self.Source = history
+
+        self.Collect()
+
+        if self.Counted > len(wire):
+            del self.Counts[len(wire) - self.Start:]
+            self.Tokens = sum(self.Counts)
+            self.Counted = len(wire)
+
+        for message in wire[max(self.Counted, self.Start):]:
+            tokens = self.MessageTokens(message)
+            self.Counts.append(tokens)
+            self.Tokens += tokens
+
+        self.Counted = len(wire)
+
+        summaryTokens = self.MessageTokens(self.Summary) if self.Summary is not None else 0
+        end = len(wire) - self.Keep
+
+        if self.Pending is None and self.Tokens + summaryTokens > self.Threshold and end > self.Start:
+            self.Pending = SummaryExecutor.submit(self.Summarize, wire[self.Start:end], end)
+
+            if not self.Background:
+                self.Wait()
+
+        if self.Summary is None:
+            return wire
+
+        return [*self.Kept, self.Summary, *wire[self.Start:]]
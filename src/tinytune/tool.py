@@ -1,7 +1,13 @@
 import sys
 
+import enum
 import inspect
-from typing import Callable
+import json
+import re
+import threading
+import types
+import typing
+from typing import Any, Callable
 from tinytune.prompt import PromptJob
 
 def Parse(docString: str) -> dict:
@@ -36,7 +42,6 @@ def Parse(docString: str) -> dict:
                 hyphen = line.find("-")
 
                 if hyphen< 1:
-                    print(key, innerKey, line)
                     doc[key][innerKey] += f"{line}\n"
 
                 else:
@@ -46,39 +51,533 @@ def Parse(docString: str) -> dict:
                         doc[key][innerKey][paramKey] = line[hyphen + 1 :].strip()
 
                     else:
-                        print(f"Setting: {key}, {innerKey}")
                         doc[key][innerKey] = {paramKey: line[hyphen + 1 :].strip()}
     return doc
 
 
-def tool(func: Callable | None = None):
-    def wrapper(func: Callable | None):
-        if isinstance(func, PromptJob):
-            spec = inspect.getfullargspec(func.Callback)
+# JSON Schema types of plain Python types
+JsonTypes: dict[type, str] = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    tuple: "array",
+    set: "array",
+    dict: "object",
+}
 
-            for key in ["id", "context", "prevResult"]:
-                if key in spec.annotations:
-                    spec.annotations.pop(key)
+# Parameters PromptJob callbacks receive from the job itself, never from the model
+JobParameters: tuple[str, ...] = ("id", "context", "prevResult")
 
-            print(spec.annotations)
+# Docstring section headers, and parameter lines within them
+ParameterSections: frozenset[str] = frozenset(("args", "arguments", "parameters", "params"))
+OtherSections: frozenset[str] = frozenset(("returns", "raises", "yields", "examples"))
+ParameterLine: re.Pattern = re.compile(r"^-?\s*(\w+)\s*(?:\([^)]*\))?\s*[-:]\s*(.*)$")
 
-        else:
-            spec = inspect.getfullargspec(func)
 
-        doc = Parse(str(func.__doc__))
+def TypeSchema(annotation: Any) -> dict:
+    """
+    Build the JSON Schema of a type annotation.
+
+    Parameters:
+    - annotation (Any): The annotation, e.g. int, list[str], Literal["a", "b"] or str | None.
+
+    Returns:
+    - dict: The schema. Unknown types give an empty schema, which accepts anything.
+    """
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return {}
+
+    origin = typing.get_origin(annotation)
+    arguments = typing.get_args(annotation)
+
+    if origin is typing.Literal:
+        values = list(arguments)
+        schema: dict[str, Any] = {"enum": values}
+
+        if all(isinstance(value, str) for value in values):
+            schema["type"] = "string"
+
+        return schema
+
+    if origin in (typing.Union, types.UnionType):
+        options = [argument for argument in arguments if argument is not type(None)]
+
+        if len(options) == 1:
+            return TypeSchema(options[0])
+
+        return {"anyOf": [TypeSchema(option) for option in options]}
+
+    if origin is typing.Annotated:
+        schema = TypeSchema(arguments[0])
+
+        # Annotated[int, "description"] documents the parameter
+        for extra in arguments[1:]:
+            if isinstance(extra, str):
+                schema["description"] = extra
+
+        return schema
+
+    if origin is tuple and arguments:
+        # tuple[int, ...] has any length, tuple[int, str] a fixed length and a type per position
+        if len(arguments) == 2 and arguments[1] is Ellipsis:
+            return {"type": "array", "items": TypeSchema(arguments[0])}
+
+        return {
+            "type": "array",
+            "prefixItems": [TypeSchema(argument) for argument in arguments],
+            "minItems": len(arguments),
+            "maxItems": len(arguments),
+        }
+
+    if origin in (list, tuple, set, frozenset) or annotation in (list, tuple, set, frozenset):
+        schema = {"type": "array"}
+
+        if arguments:
+            schema["items"] = TypeSchema(arguments[0])
+
+        return schema
+
+    if origin is dict or annotation is dict:
+        schema = {"type": "object"}
+
+        if len(arguments) == 2:
+            schema["additionalProperties"] = TypeSchema(arguments[1])
+
+        return schema
+
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return {"enum": [member.value for member in annotation]}
+
+    if annotation in JsonTypes:
+        return {"type": JsonTypes[annotation]}
+
+    return {}
+
+
+def ParameterDescriptions(docString: str | None) -> tuple[str, dict[str, str]]:
+    """
+    Split a docstring into its description and the descriptions of its parameters, listed under
+    an "Args:" or "Parameters:" section as "name - text", "name: text" or "- name (type): text".
+
+    Parameters:
+    - docString (str | None): The docstring.
+
+    Returns:
+    - tuple[str, dict[str, str]]: The description and the parameter descriptions by name.
+    """
+    if not docString:
+        return "", {}
+
+    description: list[str] = []
+    parameters: dict[str, str] = {}
+    section = None
+
+    for line in inspect.cleandoc(docString).splitlines():
+        stripped = line.strip()
+
+        header = stripped.rstrip(":").lower()
+
+        if header in ParameterSections:
+            section = "parameters"
+            continue
+
+        if header in OtherSections and stripped.endswith(":"):
+            section = "other"
+            continue
+
+        if section is None:
+            description.append(stripped)
+
+        elif section == "parameters" and stripped:
+            match = ParameterLine.match(stripped)
+
+            if match:
+                parameters[match.group(1)] = match.group(2).strip()
+
+    return "\n".join(description).strip(), parameters
+
+
+def ToolName(name: str) -> str:
+    """
+    Turn a function name or PromptJob ID into a name providers accept for a tool.
+
+    Parameters:
+    - name (str): The name, e.g. "summarize text" or "<lambda>".
+
+    Returns:
+    - str: The name with characters other than letters, digits, underscores and hyphens replaced by underscores, cut to 64 characters.
+    """
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name)[:64] or "tool"
+
+
+def FunctionSchema(function: Callable, name: str | None = None, description: str | None = None) -> dict:
+    """
+    Build the tool definition of a function for a provider's native tools API, from its type hints
+    and docstring. PromptJobs are described by their callback, without the job's own parameters.
+
+    Parameters:
+    - function (Callable): The function or PromptJob.
+    - name (str | None): The tool name. Defaults to the function's name or the job's ID, made valid with ToolName.
+    - description (str | None): The tool description. Defaults to the docstring.
+
+    Returns:
+    - dict: The tool definition, as sent in the tools field of a chat completion request.
+    """
+    # Wrappers such as memoized tools are described by the tool they wrap
+    function = inspect.unwrap(function)
+
+    callback = function.Callback if isinstance(function, PromptJob) else function
+    skip = JobParameters if isinstance(function, PromptJob) else ()
+
+    summary, documented = ParameterDescriptions(callback.__doc__)
+
+    try:
+        hints = typing.get_type_hints(callback, include_extras=True)
+
+    # Forward references that can't be resolved fall back to the raw annotations
+    except (NameError, TypeError):
+        hints = {}
+
+    properties: dict[str, dict] = {}
+    required: list[str] = []
+    parameters: dict[str, Any] = {"type": "object", "properties": properties, "required": required}
+
+    for parameter in inspect.signature(callback).parameters.values():
+        # Functions taking **kwargs accept arguments beyond the ones they name
+        if parameter.kind == parameter.VAR_KEYWORD:
+            parameters["additionalProperties"] = True
+
+        if parameter.name in skip or parameter.name == "self" or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+
+        schema = TypeSchema(hints.get(parameter.name, parameter.annotation))
+
+        if parameter.name in documented and "description" not in schema:
+            schema["description"] = documented[parameter.name]
+
+        properties[parameter.name] = schema
+
+        if parameter.default is inspect.Parameter.empty:
+            required.append(parameter.name)
+
+    return {
+        "type": "function",
+        "function": {
+            "name": name or ToolName(getattr(function, "ID", None) or callback.__name__),
+            "description": description if description is not None else summary,
+            "parameters": parameters,
+        },
+    }
+
+
+# Tool names accepted by providers' native tools APIs
+ToolNamePattern: re.Pattern = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def Checker(schema: dict) -> Callable[[Any], bool]:
+    """
+    Compile a schema built by TypeSchema into a function checking values against it.
+
+    Parameters:
+    - schema (dict): The schema.
+
+    Returns:
+    - Callable[[Any], bool]: Returns True for valid values, as decoded from JSON.
+    """
+    if "anyOf" in schema:
+        options = [Checker(option) for option in schema["anyOf"]]
+
+        return lambda value: any(option(value) for option in options)
+
+    kind = schema.get("type")
+
+    if kind == "string":
+        check = lambda value: isinstance(value, str)
+
+    elif kind == "boolean":
+        check = lambda value: isinstance(value, bool)
+
+    # bool is an int subclass, but JSON keeps them apart
+    elif kind == "integer":
+        check = lambda value: isinstance(value, int) and not isinstance(value, bool)
+
+    elif kind == "number":
+        check = lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    # Fixed-length tuples, checked position by position
+    elif kind == "array" and "prefixItems" in schema:
+        positions = [Checker(item) for item in schema["prefixItems"]]
+        check = lambda value: isinstance(value, list) and len(value) == len(positions) and all(position(item) for position, item in zip(positions, value))
+
+    elif kind == "array" and "items" in schema:
+        items = Checker(schema["items"])
+        check = lambda value: isinstance(value, list) and all(map(items, value))
+
+    elif kind == "array":
+        check = lambda value: isinstance(value, list)
+
+    elif kind == "object" and "additionalProperties" in schema:
+        values = Checker(schema["additionalProperties"])
+        check = lambda value: isinstance(value, dict) and all(map(values, value.values()))
+
+    elif kind == "object":
+        check = lambda value: isinstance(value, dict)
+
+    else:
+        check = None
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        if check is None:
+            return lambda value: value in allowed
+
+        return lambda value: value in allowed and check(value)
+
+    return check if check is not None else lambda value: True
+
+
+class ToolSpec:
+    """
+    A registered tool: the function and its tool definition, built once.
+    """
+    __slots__ = ("Name", "Function", "Definition", "Required", "Checks", "AnyArguments")
+
+    def __init__(self, name: str, function: Callable, definition: dict):
+        self.Name: str = name
+        self.Function: Callable = function
+        self.Definition: dict = definition
+
+        parameters = definition["function"]["parameters"]
+
+        self.Required: frozenset[str] = frozenset(parameters["required"])
+        self.Checks: dict[str, Callable[[Any], bool]] = {parameter: Checker(schema) for parameter, schema in parameters["properties"].items()}
+        # Whether arguments the definition doesn't list are passed on, for functions taking **kwargs
+        self.AnyArguments: bool = parameters.get("additionalProperties", False) is not False
+
+
+class ToolRegistry:
+    """
+    Tools by name. Definitions are built from type hints once, when a tool is registered, and the
+    list of definitions and its JSON serialization are cached until the registry changes, so prompts
+    and requests listing many tools don't rebuild or re-serialize them.
+    """
+    def __init__(self):
+        """
+        Initialize a ToolRegistry object.
+        """
+        self.Tools: dict[str, ToolSpec] = {}
+        self.Lock: threading.Lock = threading.Lock()
+
+        self.Definitions: list[dict] | None = None
+        self.Serialized: bytes | None = None
+
+    def Register(self, function: Callable, name: str | None = None, description: str | None = None) -> ToolSpec:
+        """
+        Register a tool, replacing any tool of the same name.
+
+        Parameters:
+        - function (Callable | PromptJob): The tool.
+        - name (str | None): The name the tool is called by. Defaults to the function's name or the job's ID, with invalid characters replaced.
+        - description (str | None): The description. Defaults to the docstring.
+
+        Returns:
+        - ToolSpec: The registered tool.
+        """
+        if name is not None and not ToolNamePattern.match(name):
+            raise ValueError(f"Invalid tool name \"{name}\": names are 1 to 64 letters, digits, underscores or hyphens.")
+
+        definition = FunctionSchema(function, name, description)
+        toolName: str = definition["function"]["name"]
+
+        spec = ToolSpec(toolName, function, definition)
+
+        with self.Lock:
+            self.Tools[toolName] = spec
+            self.Definitions = None
+            self.Serialized = None
+
+        return spec
+
+    def Remove(self, name: str):
+        """
+        Remove a tool.
+
+        Parameters:
+        - name (str): The tool name.
+        """
+        with self.Lock:
+            if self.Tools.pop(name, None) is not None:
+                self.Definitions = None
+                self.Serialized = None
+
+    def Get(self, name: str) -> ToolSpec | None:
+        """
+        Look up a tool by name.
+
+        Parameters:
+        - name (str): The tool name.
+
+        Returns:
+        - ToolSpec | None: The tool, or None if no tool has the name.
+        """
+        return self.Tools.get(name)
+
+    def Schemas(self) -> list[dict]:
+        """
+        Get the definitions of all tools, in registration order. The list is shared and must not be modified.
+
+        Returns:
+        - list[dict]: The definitions.
+        """
+        definitions = self.Definitions
+
+        if definitions is None:
+            with self.Lock:
+                definitions = self.Definitions = [spec.Definition for spec in self.Tools.values()]
+
+        return definitions
+
+    def Serialize(self) -> bytes:
+        """
+        Get the definitions of all tools as compact JSON, e.g. for listing them in a system prompt.
+
+        Returns:
+        - bytes: The UTF-8 encoded JSON array.
+        """
+        serialized = self.Serialized
+
+        if serialized is None:
+            serialized = json.dumps(self.Schemas(), ensure_ascii=False, separators=(",", ":")).encode()
+
+            with self.Lock:
+                self.Serialized = serialized
+
+        return serialized
+
+    def Validate(self, name: str, arguments: dict) -> ToolSpec:
+        """
+        Check a call's arguments against the tool's definition.
+
+        Parameters:
+        - name (str): The tool name.
+        - arguments (dict): The arguments, as decoded from JSON.
+
+        Returns:
+        - ToolSpec: The tool.
+        """
+        spec = self.Tools.get(name)
+
+        if spec is None:
+            raise ValueError(f"Unknown tool \"{name}\".")
+
+        if not spec.Required <= arguments.keys():
+            raise ValueError(f"Missing arguments {sorted(spec.Required - arguments.keys())} for tool \"{name}\".")
+
+        checks = spec.Checks
+
+        for parameter, value in arguments.items():
+            check = checks.get(parameter)
+
+            if check is None:
+                if spec.AnyArguments:
+                    continue
+
+                raise ValueError(f"Unknown argument \"{parameter}\" for tool \"{name}\".")
+
+            if not check(value):
+                raise ValueError(f"Invalid value {value!r} for argument \"{parameter}\" of tool \"{name}\".")
+
+        return spec
+
+    def Dispatch(self, name: str, arguments: dict) -> Any:
+        """
+        Validate and execute a call.
+
+        Parameters:
+        - name (str): The tool name.
+        - arguments (dict): The arguments, as decoded from JSON.
+
+        Returns:
+        - Any: The result of the tool.
+        """
+        return self.Validate(name, arguments).Function(**arguments)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.Tools
+
+    def __len__(self) -> int:
+        return len(self.Tools)
+
+
+# The registry @tool registers into unless given another
+Registry: ToolRegistry = ToolRegistry()
+
+
+def tool(
+    func: Callable | None = None,
+    name: str | None = None,
+    description: str | None = None,
+    registry: ToolRegistry | None = None,
+    memoize: bool | str | Any = False,
+    ttl: float | None = None,
+    maxSize: int | None = 1024,
+    ignore: tuple[str, ...] = (),
+    cpuBound: bool = False,
+    timeout: float | None = None,
+    memoryLimit: int | None = None,
+):
+    """
+    Register a function or PromptJob as a tool. Usable as @tool or @tool(name=..., memoize=True, ...).
+
+    Parameters:
+    - func (Callable | PromptJob | None): The tool.
+    - name (str | None): The name the tool is called by. Defaults to the function's name.
+    - description (str | None): The description. Defaults to the docstring.
+    - registry (ToolRegistry | None): The registry to add the tool to. Defaults to the shared registry.
+    - memoize (bool | str | ResponseCache): Cache results by argument: True for an in-memory LRU cache, the path of an SQLite cache file, or a cache backend.
+    - ttl (float | None): Seconds a memoized result stays valid. None for no expiry.
+    - maxSize (int | None): Maximum number of memoized results. None for no limit.
+    - ignore (tuple[str, ...]): Parameters left out of memoization keys, e.g. "self".
+    - cpuBound (bool): Run calls in worker processes, so CPU-heavy work doesn't hold the GIL. The function must be defined at module or class level.
+    - timeout (float | None): Seconds a CPU-bound call may run before its worker is killed. None for no limit.
+    - memoryLimit (int | None): Bytes of address space a CPU-bound call may use. None for no limit.
+
+    Returns:
+    - tuple[Callable, dict]: The function, wrapped as requested, and its metadata.
+    """
+    def wrapper(func: Callable):
+        if cpuBound:
+            if isinstance(func, PromptJob):
+                raise ValueError("PromptJobs can't be CPU-bound tools: their context can't leave the process.")
+
+            # Imported here since the sandbox builds on this module
+            from tinytune.sandbox import ProcessTool
+
+            func = ProcessTool(func, timeout, memoryLimit)
+
+        # Memoized around the sandbox, so cached results don't need a worker
+        if memoize is not False and memoize is not None:
+            # Imported here since memoization builds on this module
+            from tinytune.memoize import Memoized
+
+            func = Memoized(func, ttl, maxSize, None if memoize is True else memoize, ignore, name)
+
+        spec = (registry if registry is not None else Registry).Register(func, name, description)
+        definition = spec.Definition["function"]
 
         meta = {
-            "name": func.__name__,
-            "description": doc["title"],
-            "parameters": {
-                "type": "object",
-                "properties": doc["params"]["Args"]
-                if isinstance(["params"], dict)
-                else [{key: str(spec.annotations[key])} for key in spec.annotations],
-            },
+            "name": spec.Name,
+            "description": definition["description"],
+            "parameters": definition["parameters"],
             "repr": func.__repr__(),
         }
 
         return func, meta
 
+    if func is None:
+        return wrapper
+
     return wrapper(func)
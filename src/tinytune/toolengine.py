@@ -0,0 +1,284 @@
+import asyncio
+import inspect
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+from tinytune.llmcontext import Message
+from tinytune.tool import ToolRegistry
+
+
+# Tool calls of every engine run on these threads, which are started on first use
+ToolExecutor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="tool")
+
+
+def SerializeResult(result: Any) -> str:
+    """
+    Convert the result of a tool to the content of a tool message.
+
+    Parameters:
+    - result (Any): The result.
+
+    Returns:
+    - str: Strings as they are, message contents, and JSON for anything else.
+    """
+    if isinstance(result, str):
+        return result
+
+    if isinstance(result, Message):
+        return str(result.Content)
+
+    return json.dumps(result, ensure_ascii=False, default=str)
+
+
+class ToolEngine:
+    """
+    Executes the tool calls a model requests through the provider's native tools API.
+    Set on a context's Tools attribute, its tool definitions are sent with every request. All tool
+    calls of a reply are executed concurrently, on a thread pool shared by all engines or on the
+    event loop, and their results are sent back in a single request, until the model answers
+    without calling tools.
+    """
+    def __init__(
+        self,
+        tools: Iterable[Any] = (),
+        maxRounds: int = 8,
+        maxWorkers: int = 8,
+        parallel: bool = True,
+        registry: ToolRegistry | None = None,
+    ):
+        """
+        Initialize a ToolEngine object.
+
+        Parameters:
+        - tools (Iterable[Callable | PromptJob | tuple]): The tools: functions, PromptJobs, or what tool() returns for them.
+        - maxRounds (int): Maximum number of tool rounds per message. The last request forbids tool calls.
+        - maxWorkers (int): Maximum number of tool calls executed at once.
+        - parallel (bool): Execute the calls of a reply concurrently.
+        - registry (ToolRegistry | None): The registry of the tools offered to the model, e.g. one @tool registered into. Defaults to a new registry.
+        """
+        self.Registry: ToolRegistry = registry if registry is not None else ToolRegistry()
+        self.MaxRounds: int = maxRounds
+        self.MaxWorkers: int = maxWorkers
+        self.Parallel: bool = parallel
+
+        self.Lock: threading.Lock = threading.Lock()
+        self.Calls: int = 0
+        self.Errors: int = 0
+
+        for tool in tools:
+            self.Add(tool)
+
+    def Add(self, tool: Any, name: str | None = None, description: str | None = None):
+        """
+        Add a tool.
+
+        Parameters:
+        - tool (Callable | PromptJob | tuple): The tool.
+        - name (str | None): The name the model calls it by. Defaults to the function's name.
+        - description (str | None): The description shown to the model. Defaults to the docstring.
+
+        Returns:
+        - ToolEngine: The ToolEngine object.
+        """
+        # tool() returns the function along with its metadata
+        function = tool[0] if isinstance(tool, tuple) else tool
+
+        self.Registry.Register(function, name, description)
+
+        return self
+
+    def Schemas(self) -> list[dict]:
+        """
+        Get the tool definitions sent with requests.
+
+        Returns:
+        - list[dict]: The definitions.
+        """
+        return self.Registry.Schemas()
+
+    @staticmethod
+    def ReadCalls(message: Any) -> list[dict]:
+        """
+        Get the tool calls of a non-streamed reply.
+
+        Parameters:
+        - message (ChatCompletionMessage): The reply.
+
+        Returns:
+        - list[dict]: The calls, in wire format.
+        """
+        calls = getattr(message, "tool_calls", None) or []
+
+        return [{"id": call.id, "type": "function", "function": {"name": call.function.name, "arguments": call.function.arguments}} for call in calls]
+
+    @staticmethod
+    def Accumulate(calls: dict[int, dict], deltas: list[Any]):
+        """
+        Merge the tool call fragments of a streamed chunk into the calls received so far.
+
+        Parameters:
+        - calls (dict[int, dict]): The calls by index, in wire format.
+        - deltas (list[ChoiceDeltaToolCall]): The fragments of the chunk.
+        """
+        for delta in deltas:
+            call = calls.get(delta.index)
+
+            if call is None:
+                call = calls[delta.index] = {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+
+            if delta.id:
+                call["id"] = delta.id
+
+            if delta.function is not None:
+                if delta.function.name:
+                    call["function"]["name"] += delta.function.name
+
+                if delta.function.arguments:
+                    call["function"]["arguments"] += delta.function.arguments
+
+    @staticmethod
+    def AssistantMessage(content: str | None, calls: list[dict]) -> dict:
+        return {"role": "assistant", "content": content or None, "tool_calls": calls}
+
+    def Prepare(self, call: dict) -> tuple[Callable, dict]:
+        # Returns the function and its arguments, or raises ValueError with the error to report to the model
+        try:
+            arguments = json.loads(call["function"]["arguments"] or "{}")
+
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON arguments: {e}")
+
+        if not isinstance(arguments, dict):
+            raise ValueError("arguments must be a JSON object.")
+
+        return self.Registry.Validate(call["function"]["name"], arguments).Function, arguments
+
+    def Result(self, call: dict, content: str, failed: bool = False) -> dict:
+        with self.Lock:
+            self.Calls += 1
+
+            if failed:
+                self.Errors += 1
+
+        return {"role": "tool", "tool_call_id": call["id"], "content": content}
+
+    def Invoke(self, call: dict) -> dict:
+        """
+        Execute a tool call. Failures are reported to the model as the result, so it can recover.
+
+        Parameters:
+        - call (dict): The call, in wire format.
+
+        Returns:
+        - dict: The tool message with the result.
+        """
+        try:
+            function, arguments = self.Prepare(call)
+
+        except ValueError as e:
+            return self.Result(call, f"Error: {e}", True)
+
+        try:
+            result = function(**arguments)
+
+            if inspect.iscoroutine(result):
+                result = asyncio.run(result)
+
+            return self.Result(call, SerializeResult(result))
+
+        except Exception as e:
+            return self.Result(call, f"Error: {type(e).__name__}: {e}", True)
+
+    async def InvokeAsync(self, call: dict) -> dict:
+        """
+        Asynchronous counterpart of Invoke. Coroutine tools are awaited, blocking tools run on a worker thread.
+
+        Parameters:
+        - call (dict): The call, in wire format.
+
+        Returns:
+        - dict: The tool message with the result.
+        """
+        try:
+            function, arguments = self.Prepare(call)
+
+        except ValueError as e:
+            return self.Result(call, f"Error: {e}", True)
+
+        try:
+            callback = getattr(function, "Callback", function)
+
+            if inspect.iscoroutinefunction(callback):
+                result = await function(**arguments)
+            else:
+                result = await asyncio.to_thread(function, **arguments)
+
+                if inspect.isawaitable(result):
+                    result = await result
+
+            return self.Result(call, SerializeResult(result))
+
+        except Exception as e:
+            return self.Result(call, f"Error: {type(e).__name__}: {e}", True)
+
+    def Execute(self, calls: list[dict]) -> list[dict]:
+        """
+        Execute the tool calls of a reply, concurrently unless parallel execution is off.
+
+        Parameters:
+        - calls (list[dict]): The calls, in wire format.
+
+        Returns:
+        - list[dict]: The tool messages, in the order of the calls.
+        """
+        if len(calls) < 2 or not self.Parallel:
+            return [self.Invoke(call) for call in calls]
+
+        pending: queue.SimpleQueue[int] = queue.SimpleQueue()
+        results: list[dict] = [{} for _ in calls]
+
+        for index in range(len(calls)):
+            pending.put(index)
+
+        def Work():
+            while True:
+                try:
+                    index = pending.get_nowait()
+
+                except queue.Empty:
+                    return
+
+                results[index] = self.Invoke(calls[index])
+
+        # The pool is shared, so at most MaxWorkers of its threads take the calls of this reply
+        for future in [ToolExecutor.submit(Work) for _ in range(min(self.MaxWorkers, len(calls)))]:
+            future.result()
+
+        return results
+
+    async def ExecuteAsync(self, calls: list[dict]) -> list[dict]:
+        """
+        Asynchronous counterpart of Execute.
+
+        Parameters:
+        - calls (list[dict]): The calls, in wire format.
+
+        Returns:
+        - list[dict]: The tool messages, in the order of the calls.
+        """
+        if not self.Parallel:
+            return [await self.InvokeAsync(call) for call in calls]
+
+        semaphore = asyncio.Semaphore(self.MaxWorkers)
+
+        async def Bounded(call: dict) -> dict:
+            async with semaphore:
+                return await self.InvokeAsync(call)
+
+        return list(await asyncio.gather(*(Bounded(call) for call in calls)))
+
+    def Stats(self) -> dict[str, int]:
+        return {"calls": self.Calls, "errors": self.Errors}
@@ -0,0 +1,314 @@
+from collections.abc import MutableSequence
+from typing import Any, Iterable, Iterator
+
+from tinytune.llmcontext import ChainDigest, Message, SerializeMessage
+
+
+class MessageNode:
+    """
+    An immutable node of a message tree: a message and a link to the node before it.
+    Each node carries a snapshot of the message's wire format, the hash of the conversation up to
+    and including it, and a jump link to a further ancestor, which makes finding any ancestor O(log n).
+    """
+    __slots__ = ("Message", "Wire", "Parent", "Jump", "Depth", "Digest")
+
+    def __init__(self, message: Any, parent: Any = None):
+        """
+        Initialize a MessageNode object.
+
+        Parameters:
+        - message (Message | dict): The message.
+        - parent (MessageNode | None): The node before it.
+        """
+        self.Message: Any = message
+        # Copied, so editing the message in place can't make the digest disagree with the wire view
+        self.Wire: dict = dict(SerializeMessage(message))
+        self.Parent: MessageNode | None = parent
+        self.Depth: int = parent.Depth + 1 if parent is not None else 1
+
+        # Skew-binary jump links: a node jumps twice as far as its parent when the parent's
+        # jump and the one after it span the same distance
+        jump = parent.Jump if parent is not None else None
+        further = jump.Jump if jump is not None else None
+
+        if parent is not None and jump is not None and further is not None and parent.Depth - jump.Depth == jump.Depth - further.Depth:
+            self.Jump: MessageNode | None = further
+        else:
+            self.Jump = parent
+
+        # Chained the same way as MessageHistory.Digest, so both agree on equal conversations
+        self.Digest: bytes = ChainDigest(parent.Digest if parent is not None else b"", self.Wire)
+
+    def Ancestor(self, depth: int) -> Any:
+        """
+        Find the ancestor at a depth.
+
+        Parameters:
+        - depth (int): The depth, from 1 for the first message.
+
+        Returns:
+        - MessageNode: The ancestor, or this node if depth is its own.
+        """
+        node: MessageNode = self
+
+        while node.Depth > depth and node.Parent is not None:
+            node = node.Jump if node.Jump is not None and node.Jump.Depth >= depth else node.Parent
+
+        return node
+
+
+class MessageTree(MutableSequence):
+    """
+    A persistent message history whose messages are stored as a chain of immutable nodes.
+    Fork() is O(1): the fork shares every node with the original, and both append to their own
+    branch from then on. The history hash is kept on the nodes, so Digest() is O(1), and all forks
+    of a conversation share a prefix key that can be sent to providers as a prompt cache key.
+    Appending and indexing near the end are O(1); other positions take O(log n) to reach.
+    A Message edited in place is replaced by a new node, along with the nodes after it, the next
+    time the wire view or digest is requested; dictionary messages must not be edited in place.
+    It provides the MessageHistory interface contexts rely on.
+    """
+    def __init__(self, messages: Iterable[Any] = (), head: MessageNode | None = None, anchor: MessageNode | None = None):
+        """
+        Initialize a MessageTree object.
+
+        Parameters:
+        - messages (Iterable[Message | dict]): Messages appended after head.
+        - head (MessageNode | None): The last node of an existing branch to continue from.
+        - anchor (MessageNode | None): The node the conversation was first forked at.
+        """
+        self.Head: MessageNode | None = head
+        self.Anchor: MessageNode | None = anchor
+
+        self.WireMessages: list[dict] = []
+        self.Synced: int = 0
+        self.Persisted: int = 0
+        self.Edits: int = 0
+        self.PersistedEdits: int = 0
+        self.SyncedEdits: int = 0
+        self.Tokens: Any = None
+        self.Counted: int = 0
+
+        for message in messages:
+            self.append(message)
+
+    def Fork(self) -> Any:
+        """
+        Create a branch of the history that shares all of its current messages.
+
+        Returns:
+        - MessageTree: The new branch.
+        """
+        if self.Anchor is None:
+            self.Anchor = self.Head
+
+        return MessageTree(head=self.Head, anchor=self.Anchor)
+
+    def PrefixKey(self) -> str | None:
+        """
+        Get a key identifying the prefix shared by all forks of the conversation.
+
+        Returns:
+        - str | None: The hex hash of the conversation up to the first fork, or None if it was never forked.
+        """
+        self.Wire()
+
+        return self.Anchor.Digest.hex() if self.Anchor is not None else None
+
+    def Digest(self) -> str:
+        """
+        Get a stable hash of the history.
+
+        Returns:
+        - str: The hex digest of the history.
+        """
+        self.Wire()
+
+        return self.Head.Digest.hex() if self.Head is not None else ""
+
+    def Node(self, index: int) -> MessageNode:
+        length = len(self)
+
+        if index < 0:
+            index += length
+
+        if self.Head is None or not 0 <= index < length:
+            raise IndexError("message index out of range")
+
+        return self.Head.Ancestor(index + 1)
+
+    def Nodes(self, start: int = 0) -> list[MessageNode]:
+        """
+        Get the nodes from an index to the end, in order.
+
+        Parameters:
+        - start (int): The first index.
+
+        Returns:
+        - list[MessageNode]: The nodes.
+        """
+        nodes = []
+        node = self.Head
+
+        while node is not None and node.Depth > start:
+            nodes.append(node)
+            node = node.Parent
+
+        nodes.reverse()
+
+        return nodes
+
+    def SliceStart(self, index: slice) -> int:
+        # First index a slice assignment or deletion can change
+        if index.step in (None, 1):
+            return index.indices(len(self))[0]
+
+        return min(range(*index.indices(len(self))), default=len(self))
+
+    def Rebuild(self, index: int, messages: list[Any]):
+        """
+        Replace everything from an index onwards with new messages. Nodes before it stay shared.
+
+        Parameters:
+        - index (int): The first index to replace.
+        - messages (list[Message | dict]): The new messages.
+        """
+        self.Head = self.Head.Ancestor(index) if self.Head is not None and index > 0 else None
+
+        if self.Anchor is not None and self.Anchor.Depth > index:
+            self.Anchor = None
+
+        self.Invalidate(index)
+
+        for message in messages:
+            self.Head = MessageNode(message, self.Head)
+
+    def Refresh(self):
+        """
+        Rebuild the branch from the first message that was edited in place since its node was made.
+        """
+        nodes = self.Nodes()
+
+        for index, node in enumerate(nodes):
+            if SerializeMessage(node.Message) != node.Wire:
+                self.Rebuild(index, [node.Message for node in nodes[index:]])
+                return
+
+    def Invalidate(self, index: int = 0):
+        """
+        Invalidate the cached wire view and counts from an index onwards.
+
+        Parameters:
+        - index (int): The first index that changed.
+        """
+        self.Synced = min(self.Synced, max(index, 0))
+        self.Persisted = min(self.Persisted, max(index, 0))
+        self.Counted = min(self.Counted, max(index, 0))
+
+    def Wire(self) -> list[dict]:
+        """
+        Get the wire-format view of the history. Only nodes added since the last call are read.
+        The returned list is owned by the history and must not be modified.
+
+        Returns:
+        - list[dict]: The serialized messages.
+        """
+        # Messages of the branch were edited in place since the last call
+        if self.SyncedEdits != self.Edits:
+            self.SyncedEdits = self.Edits
+            self.Refresh()
+
+        wire = self.WireMessages
+
+        if self.Synced < len(wire):
+            del wire[self.Synced:]
+
+        for node in self.Nodes(len(wire)):
+            # Watched so the branch is refreshed, and saved again, after in-place edits
+            if isinstance(node.Message, Message):
+                node.Message.Watch(self)
+
+            wire.append(node.Wire)
+
+        self.Synced = len(wire)
+
+        return wire
+
+    def __reduce__(self):
+        # Pickling the node chain would recurse once per message
+        return (MessageTree, (self[:],))
+
+    def __len__(self) -> int:
+        return self.Head.Depth if self.Head is not None else 0
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+
+            if index.step in (None, 1):
+                return [node.Message for node in self.Nodes(indices.start)[:len(indices)]] if indices else []
+
+            return [self.Node(i).Message for i in indices]
+
+        return self.Node(index).Message
+
+    def __setitem__(self, index: int | slice, value: Any):
+        if isinstance(index, slice):
+            start = self.SliceStart(index)
+            messages = self[:]
+            messages[index] = value
+
+            self.Rebuild(start, messages[start:])
+            return
+
+        node = self.Node(index)
+        self.Rebuild(node.Depth - 1, [value] + [node.Message for node in self.Nodes(node.Depth)])
+
+    def __delitem__(self, index: int | slice):
+        if isinstance(index, slice):
+            start = self.SliceStart(index)
+            messages = self[:]
+            del messages[index]
+
+            self.Rebuild(start, messages[start:])
+            return
+
+        node = self.Node(index)
+        self.Rebuild(node.Depth - 1, [node.Message for node in self.Nodes(node.Depth)])
+
+    def __iter__(self) -> Iterator[Any]:
+        for node in self.Nodes():
+            yield node.Message
+
+    def insert(self, index: int, value: Any):
+        length = len(self)
+
+        if index < 0:
+            index = max(index + length, 0)
+
+        index = min(index, length)
+
+        self.Rebuild(index, [value] + [node.Message for node in self.Nodes(index)])
+
+    def append(self, value: Any):
+        self.Head = MessageNode(value, self.Head)
+
+    def extend(self, values: Iterable[Any]):
+        for value in values:
+            self.append(value)
+
+    def pop(self, index: int = -1) -> Any:
+        if index in (-1, len(self) - 1) and self.Head is not None:
+            message = self.Head.Message
+
+            self.Rebuild(len(self) - 1, [])
+
+            return message
+
+        return super().pop(index)
+
+    def clear(self):
+        self.Rebuild(0, [])
+
+    def reverse(self):
+        self.Rebuild(0, self[::-1])
@@ -0,0 +1,264 @@
+import json
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable
+
+from tinytune.llmcontext import MessageHistory
+
+
+# Tokens every message costs on top of its content, for the role and separators
+MessageOverhead: int = 4
+
+
+def ApproximateTokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without a tokenizer, at roughly four characters per token.
+
+    Parameters:
+    - text (str): The text.
+
+    Returns:
+    - int: The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+
+class TiktokenTokenizer:
+    """
+    Counts tokens exactly with tiktoken. tiktoken is an optional dependency and has to be
+    installed separately.
+    """
+    def __init__(self, encoding: str = "cl100k_base"):
+        """
+        Initialize a TiktokenTokenizer object.
+
+        Parameters:
+        - encoding (str): The tiktoken encoding name.
+        """
+        import tiktoken
+
+        self.Encoding: Any = tiktoken.get_encoding(encoding)
+
+    def __call__(self, text: str) -> int:
+        return len(self.Encoding.encode(text, disallowed_special=()))
+
+
+class TokenCounts:
+    """
+    Per-message token counts of a history, kept on the history and extended as messages are appended.
+    """
+    def __init__(self, tokenizer: Callable[[str], int], pinSystem: bool, edits: int = 0):
+        self.Tokenizer: Callable[[str], int] = tokenizer
+        self.PinSystem: bool = pinSystem
+        # The history's edit counter when counting started
+        self.Edits: int = edits
+        self.Counts: list[int] = []
+        # Running sum of the tokens of unpinned messages, up to and including each index
+        self.Prefix: list[int] = []
+        self.Pinned: list[int] = []
+        self.PinnedTokens: int = 0
+
+
+class ContextWindow:
+    """
+    Keeps the messages sent to the model within its context length.
+    Token counts are kept per message and only computed for messages appended since the last
+    request, so each turn costs O(new messages) plus a binary search for the window start.
+    System messages can be pinned so they are always sent. Under the "sliding" policy the oldest
+    unpinned messages are dropped until the rest fit; "truncate" additionally keeps the end of the
+    oldest message that only partly fits. The history itself is never modified.
+    """
+    def __init__(
+        self,
+        maxTokens: int,
+        tokenizer: Callable[[str], int] | None = None,
+        policy: str = "sliding",
+        reserve: int = 0,
+        pinSystem: bool = True,
+    ):
+        """
+        Initialize a ContextWindow object.
+
+        Parameters:
+        - maxTokens (int): The model's context length.
+        - tokenizer (Callable[[str], int] | None): Counts the tokens of a text. Defaults to ApproximateTokens.
+        - policy (str): "sliding" or "truncate".
+        - reserve (int): Tokens kept free for the completion.
+        - pinSystem (bool): Always send system messages.
+        """
+        if policy not in ("sliding", "truncate"):
+            raise ValueError(f"Unknown context window policy: {policy}")
+
+        self.MaxTokens: int = maxTokens
+        self.Tokenizer: Callable[[str], int] = tokenizer or ApproximateTokens
+        self.Policy: str = policy
+        self.Reserve: int = reserve
+        self.PinSystem: bool = pinSystem
+
+    @property
+    def Budget(self) -> int:
+        return self.MaxTokens - self.Reserve
+
+    def MessageTokens(self, message: dict) -> int:
+        """
+        Count the tokens of a wire-format message.
+
+        Parameters:
+        - message (dict): The message.
+
+        Returns:
+        - int: The token count.
+        """
+        content = message.get("content")
+
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False) if content is not None else ""
+
+        return self.Tokenizer(content) + MessageOverhead
+
+    def Count(self, history: Any) -> TokenCounts:
+        """
+        Bring the token counts of a history up to date.
+
+        Parameters:
+        - history (MessageHistory): The history.
+
+        Returns:
+        - TokenCounts: The counts.
+        """
+        wire = history.Wire()
+        state = getattr(history, "Tokens", None)
+
+        # Counts from another tokenizer, or taken before a message was edited in place, can't be reused
+        edits = getattr(history, "Edits", 0)
+
+        if state is None or state.Tokenizer is not self.Tokenizer or state.PinSystem != self.PinSystem or state.Edits != edits:
+            state = history.Tokens = TokenCounts(self.Tokenizer, self.PinSystem, edits)
+            history.Counted = 0
+
+        counted = history.Counted
+
+        if counted < len(state.Counts):
+            del state.Counts[counted:]
+            del state.Prefix[counted:]
+
+            stale = bisect_left(state.Pinned, counted)
+            state.PinnedTokens = sum(state.Counts[index] for index in state.Pinned[:stale])
+            del state.Pinned[stale:]
+
+        total = state.Prefix[-1] if state.Prefix else 0
+
+        for index in range(counted, len(wire)):
+            message = wire[index]
+            tokens = self.MessageTokens(message)
+
+            state.Counts.append(tokens)
+
+            if self.PinSystem and message.get("role") == "system":
+                state.Pinned.append(index)
+                state.PinnedTokens += tokens
+            else:
+                total += tokens
+
+            state.Prefix.append(total)
+
+        history.Counted = len(wire)
+
+        return state
+
+    def Tokens(self, history: Any) -> int:
+        """
+        Get the total token count of a history.
+
+        Parameters:
+        - history (MessageHistory): The history.
+
+        Returns:
+        - int: The token count.
+        """
+        state = self.Count(history)
+
+        return state.PinnedTokens + (state.Prefix[-1] if state.Prefix else 0)
+
+    def Truncate(self, message: dict, budget: int) -> dict | None:
+        """
+        Keep the end of a message's content that fits in a token budget.
+
+        Parameters:
+        - message (dict): The message.
+        - budget (int): The tokens available for the message.
+
+        Returns:
+        - dict | None: A truncated copy of the message, or None if nothing of it fits.
+        """
+        content = message.get("content")
+        budget -= MessageOverhead
+
+        if not isinstance(content, str) or budget <= 0:
+            return None
+
+        # Longest suffix of the content that fits
+        low, high = 0, len(content)
+
+        while low < high:
+            middle = (low + high + 1) // 2
+
+            if self.Tokenizer(content[-middle:]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+
+        return {**message, "content": content[-low:]} if low else None
+
+    def Apply(self, history: Any) -> list[dict]:
+        """
+        Get the messages of a history that fit in the window.
+
+        Parameters:
+        - history (MessageHistory): The history.
+
+        Returns:
+        - list[dict]: The wire-format messages to send. The history's own list is returned when everything fits.
+        """
+        state = self.Count(history)
+        wire = history.Wire()
+
+        if not wire:
+            return wire
+
+        budget = self.Budget - state.PinnedTokens
+        total = state.Prefix[-1]
+
+        if total <= budget:
+            return wire
+
+        # The first index whose unpinned suffix fits: the running sum before it covers the excess
+        cut = bisect_left(state.Prefix, total - budget) + 1
+
+        if budget < 0 or (cut >= len(wire) and state.Pinned[-1:] != [len(wire) - 1]):
+            raise Exception(f"The latest message doesn't fit in the context window of {self.MaxTokens} tokens.")
+
+        messages = [wire[index] for index in state.Pinned[:bisect_right(state.Pinned, cut - 1)]]
+
+        # The message before the cut is never pinned, since pinned messages don't add to the running sum
+        if self.Policy == "truncate":
+            boundary = cut - 1
+            partial = self.Truncate(wire[boundary], budget - (total - state.Prefix[boundary]))
+
+            if partial is not None:
+                messages.append(partial)
+
+        messages.extend(wire[cut:])
+
+        return messages
+
+    def Fit(self, messages: list[dict]) -> list[dict]:
+        """
+        Get the messages of an arbitrary list that fit in the window. Unlike Apply, every message is counted.
+
+        Parameters:
+        - messages (list[dict]): The wire-format messages.
+
+        Returns:
+        - list[dict]: The messages to send.
+        """
+        return self.Apply(MessageHistory(messages))
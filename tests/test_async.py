@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+from tinytune.llmcontext import LLMContext, Message, Model
+from tinytune.prompt import PromptJob
+
+
+class BlockingContext(LLMContext[Message]):
+    def __init__(self):
+        super().__init__(Model("test", "test"))
+        self.Threads: list[int] = []
+
+    def OnRun(self, *args, **kwargs):
+        self.Threads.append(threading.get_ident())
+        time.sleep(0.1)
+
+        return Message("assistant", "reply")
+
+
+async def Ticks(stop: asyncio.Event) -> int:
+    ticks = 0
+
+    while not stop.is_set():
+        ticks += 1
+        await asyncio.sleep(0.01)
+
+    return ticks
+
+
+def test_blocking_run_doesnt_block_the_loop():
+    context = BlockingContext()
+
+    async def Main():
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(Ticks(stop))
+
+        await context.Prompt(Message("user", "hi")).RunAsync()
+        stop.set()
+
+        return await ticker
+
+    assert asyncio.run(Main()) >= 5
+    assert context.Threads and context.Threads[0] != threading.get_ident()
+    assert context.Top().Content == "reply"
+
+
+def test_coroutine_callbacks_are_awaited():
+    context = BlockingContext()
+
+    async def Shout(context, message):
+        await asyncio.sleep(0)
+
+        return Message("assistant", message.Content.upper())
+
+    asyncio.run(context.Prompt(Message("user", "hi")).Then(Shout).RunAsync())
+
+    assert context.Top().Content == "HI"
+
+
+def test_job_run_async():
+    context = BlockingContext()
+    threads = []
+
+    async def Coroutine(id, llm, prevResult):
+        threads.append(threading.get_ident())
+        await asyncio.sleep(0)
+
+        return f"{id}:{prevResult}"
+
+    def Blocking(id, llm, prevResult):
+        threads.append(threading.get_ident())
+        time.sleep(0.1)
+
+        return f"{id}:{prevResult}"
+
+    async def Main():
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(Ticks(stop))
+
+        results = [
+            await PromptJob(Coroutine, "a", context, "x").RunAsync(),
+            await PromptJob(Blocking, "b", context, "y").RunAsync(),
+        ]
+        stop.set()
+
+        return results, await ticker
+
+    (results, ticks) = asyncio.run(Main())
+
+    assert results == ["a:x", "b:y"]
+    assert threads[0] == threading.get_ident()
+    assert threads[1] != threading.get_ident()
+    assert ticks >= 5
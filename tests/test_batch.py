@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.fakeserver import FakeServer
+from tinytune.contexts.openaicontext import ChatMessage, LoadBatchResults, OpenAICompatibleContext
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeServer(tokens=4) as server:
+        yield server
+
+
+def Context(server: FakeServer) -> OpenAICompatibleContext:
+    return OpenAICompatibleContext("fake", "fake", baseUrl=server.URL)
+
+
+def test_batch_file_layout(server, tmp_path):
+    context = Context(server)
+    batch = [
+        [ChatMessage("system", "Be brief."), ChatMessage("user", "first")],
+        [{"role": "user", "content": "second"}],
+    ]
+
+    path = context.WriteBatchFile(batch, str(tmp_path / "batch.jsonl"))
+
+    with open(path) as fp:
+        lines = fp.read().splitlines()
+
+    assert len(lines) == 2
+
+    requests = [json.loads(line) for line in lines]
+
+    assert [request["custom_id"] for request in requests] == ["request-0", "request-1"]
+    assert all(request["method"] == "POST" and request["url"] == "/v1/chat/completions" for request in requests)
+    assert requests[0]["body"] == {
+        "model": "fake",
+        "messages": [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "first"}],
+        "temperature": 0,
+    }
+    assert requests[1]["body"]["messages"] == [{"role": "user", "content": "second"}]
+
+
+def test_batch_results_map_back_to_requests(tmp_path):
+    def Reply(content: str) -> dict:
+        return {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}}
+
+    # Output files aren't ordered, and failures come as errors or non-200 responses
+    entries = [
+        {"custom_id": "request-2", "response": Reply("third"), "error": None},
+        {"custom_id": "request-0", "response": Reply("first"), "error": None},
+        {"custom_id": "request-3", "response": None, "error": {"code": "timeout", "message": "expired"}},
+        {"custom_id": "request-1", "response": {"status_code": 429, "body": {"error": {"message": "rate limited"}}}, "error": None},
+    ]
+
+    path = tmp_path / "output.jsonl"
+    path.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n\n")
+
+    results = LoadBatchResults(str(path))
+
+    assert [result.Index for result in results] == [0, 1, 2, 3]
+    assert [result.Ok for result in results] == [True, False, True, False]
+    assert results[0].Result.Content == "first" and isinstance(results[0].Result, ChatMessage)
+    assert results[2].Result.Content == "third"
+    assert "rate limited" in str(results[1].Error)
+    assert "expired" in str(results[3].Error)
+
+
+def test_run_batch(server):
+    context = Context(server)
+    batch = [[ChatMessage("user", f"prompt {index}")] for index in range(20)]
+
+    results = context.RunBatch(batch, concurrency=4)
+
+    assert [result.Index for result in results] == list(range(20))
+    assert all(result.Ok for result in results)
+    # Replies start with the prompt, so each result belongs to its own conversation
+    assert all(result.Result.Content.startswith(f"prompt {index}") for index, result in enumerate(results))
+    assert len(context.Messages) == 0
+
+
+def test_run_batch_captures_errors(server):
+    context = Context(server)
+    batch = [[ChatMessage("user", "fine")], [], [ChatMessage("user", "also fine")]]
+
+    results = context.RunBatch(batch)
+
+    assert [result.Ok for result in results] == [True, False, True]
+    assert results[2].Result.Content.startswith("also fine")
+
+
+def test_run_batch_async(server):
+    context = Context(server)
+    batch = [[ChatMessage("user", f"prompt {index}")] for index in range(20)]
+
+    results = asyncio.run(context.RunBatchAsync(batch, concurrency=4))
+
+    assert all(result.Ok and result.Result.Content.startswith(f"prompt {index}") for index, result in enumerate(results))
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from benchmarks.fakeserver import FakeServer
+from tinytune.cache import MemoryCache, ResponseCache, SQLiteCache
+from tinytune.contexts.openaicontext import ChatMessage, OpenAICompatibleContext
+from tinytune.llmcontext import LLMContext, Message, MessageHistory, Model
+from tinytune.window import ContextWindow
+
+
+def test_backends_must_implement_storage():
+    with pytest.raises(TypeError):
+        ResponseCache()
+
+
+def test_lru_eviction():
+    cache = MemoryCache(maxSize=2)
+    cache.Set("a", 1)
+    cache.Set("b", 2)
+
+    # Reading a makes b the least recently used
+    assert cache.Get("a") == 1
+
+    cache.Set("c", 3)
+
+    assert cache.Get("b") is None
+    assert cache.Get("a") == 1 and cache.Get("c") == 3
+    assert cache.Stats() == {"hits": 3, "misses": 1, "evictions": 1}
+
+
+def test_ttl_expiry():
+    cache = MemoryCache(ttl=0.05)
+    cache.Set("a", 1)
+
+    assert cache.Get("a") == 1
+
+    time.sleep(0.1)
+
+    assert cache.Get("a") is None
+    assert len(cache) == 0
+    assert cache.Stats()["evictions"] == 1
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, maxSize=2)
+    cache.Set("a", {"content": "x", "items": [1, 2]})
+    cache.Set("b", "y")
+    cache.Set("c", "z")
+    cache.Close()
+
+    reopened = SQLiteCache(path, ttl=60)
+
+    assert reopened.Get("a") is None
+    assert reopened.Get("b") == "y"
+    assert reopened.Get("c") == "z"
+    assert len(reopened) == 2
+
+    reopened.Clear()
+
+    assert len(reopened) == 0
+    reopened.Close()
+
+
+def test_sqlite_ttl_expiry(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=0.05)
+    cache.Set("a", 1)
+    time.sleep(0.1)
+
+    assert cache.Get("a") is None
+    assert cache.Stats()["evictions"] == 1
+    cache.Close()
+
+
+def test_key_uses_digest_for_messages():
+    history = MessageHistory([{"role": "user", "content": "hi"}])
+    request = {"model": "m", "messages": history.Wire()}
+
+    assert ResponseCache.Key(request, history.Digest()) == ResponseCache.Key({"model": "m", "messages": history.Digest()})
+    assert ResponseCache.Key(request) != ResponseCache.Key({**request, "temperature": 1})
+
+
+def test_requests_differing_in_options_dont_share_responses():
+    with FakeServer(tokens=4) as server:
+        context = OpenAICompatibleContext("fake", "fake", baseUrl=server.URL)
+        context.Cache = MemoryCache()
+
+        def Ask(temperature: float | None):
+            spawned = context.Spawn()
+            spawned.Temperature = temperature
+            spawned.Prompt(ChatMessage("user", "hello")).Run()
+
+        Ask(0)
+        Ask(0)
+
+        assert server.Requests == 1
+
+        Ask(None)
+
+        assert server.Requests == 2
+        assert context.Cache.Stats()["hits"] == 1
+
+
+def test_key_follows_the_window():
+    def Key(window: ContextWindow | None) -> str | None:
+        context = LLMContext(Model("test", "test"))
+        context.Cache = MemoryCache()
+        context.Window = window
+        context.Messages = [Message("user", "word " * 50), Message("assistant", "ok"), Message("user", "last")]
+
+        return context.CacheLookup()[0]
+
+    assert Key(None) == Key(ContextWindow(10_000))
+    assert Key(None) != Key(ContextWindow(30))
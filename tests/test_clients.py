@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+from benchmarks.fakeserver import FakeServer
+from tinytune.clients import ClientRegistry
+from tinytune.contexts.openaicontext import ChatMessage, OpenAICompatibleContext
+
+
+def test_clients_are_shared_per_endpoint():
+    clients = ClientRegistry()
+    client = clients.Get("http://localhost:1/v1", "a")
+
+    assert clients.Get("http://localhost:1/v1", "a") is client
+    assert clients.Get("http://localhost:1/v1", "b") is not client
+    assert clients.Get("http://localhost:2/v1", "a") is not client
+
+    clients.Close()
+
+    assert client.is_closed()
+    assert clients.Get("http://localhost:1/v1", "a") is not client
+    clients.Close()
+
+
+def test_async_clients_are_kept_per_loop():
+    clients = ClientRegistry()
+
+    async def Get():
+        client = clients.GetAsync("http://localhost:1/v1", "a")
+
+        assert clients.GetAsync("http://localhost:1/v1", "a") is client
+
+        return client
+
+    loop = asyncio.new_event_loop()
+    first = loop.run_until_complete(Get())
+    second = asyncio.run(Get())
+
+    # A client opened on one loop is never handed to another
+    assert first is not second
+    assert loop.run_until_complete(Get()) is first
+
+    # Neither is one from another thread's loop
+    clientsByThread = []
+    thread = threading.Thread(target=lambda: clientsByThread.append(asyncio.run(Get())))
+    thread.start()
+    thread.join()
+
+    assert clientsByThread[0] is not first and clientsByThread[0] is not second
+
+    loop.run_until_complete(clients.CloseAsync())
+    loop.close()
+
+
+def test_close_async_only_closes_the_running_loop():
+    clients = ClientRegistry()
+    loop = asyncio.new_event_loop()
+    other = asyncio.new_event_loop()
+
+    async def Get():
+        return clients.GetAsync("http://localhost:1/v1", "a")
+
+    client = loop.run_until_complete(Get())
+    otherClient = other.run_until_complete(Get())
+
+    loop.run_until_complete(clients.CloseAsync())
+
+    assert client.is_closed()
+    assert not otherClient.is_closed()
+    assert loop.run_until_complete(Get()) is not client
+
+    loop.run_until_complete(clients.CloseAsync())
+    other.run_until_complete(clients.CloseAsync())
+
+    assert otherClient.is_closed()
+    assert len(clients.AsyncClients) == 0
+
+    loop.close()
+    other.close()
+
+
+def test_contexts_run_on_each_loop():
+    clients = ClientRegistry()
+
+    with FakeServer(tokens=4) as server:
+        context = OpenAICompatibleContext("fake", "fake", baseUrl=server.URL, clients=clients)
+
+        async def Ask(prompt: str) -> str:
+            try:
+                await context.Prompt(ChatMessage("user", prompt)).RunAsync()
+            finally:
+                await clients.CloseAsync()
+
+            return context.Top().Content
+
+        # Each asyncio.run gets a fresh loop, and with it a fresh client
+        assert asyncio.run(Ask("first")).startswith("first")
+        assert asyncio.run(Ask("second")).startswith("second")
+        assert server.Requests == 2
+
+    clients.Close()
@@ -0,0 +1,191 @@
+import asyncio
+import time
+
+import pytest
+
+from tinytune.hedge import HedgedContext
+from tinytune.llmcontext import LLMContext, Message, Model
+
+
+class SlowContext(LLMContext[Message]):
+    """
+    Streams a few deltas after a delay, recording what each attempt did. Spawned copies share the log.
+    """
+    def __init__(self, name: str, firstDelay: float, fail: bool = False, deltas: int = 3):
+        super().__init__(Model(name, name))
+        self.Name: str = name
+        self.FirstDelay: float = firstDelay
+        self.Fail: bool = fail
+        self.Deltas: int = deltas
+        self.Log: list[str] = []
+
+    def Take(self, message: Message | dict | None):
+        if message is not None:
+            self.Prompt(message)
+
+        self.Messages.append(self.MessageQueue[self.QueuePointer])
+        self.QueuePointer += 1
+        self.Log.append("start")
+
+    def Stream(self, message: Message | dict | None = None, *args, **kwargs):
+        self.Take(message)
+
+        try:
+            time.sleep(self.FirstDelay)
+
+            if self.Fail:
+                raise Exception(f"{self.Name} failed")
+
+            for index in range(self.Deltas):
+                self.Log.append("delta")
+                yield f"{self.Name}{index} "
+                time.sleep(0.01)
+
+            self.Messages.append(Message("assistant", "".join(f"{self.Name}{index} " for index in range(self.Deltas))))
+
+        finally:
+            self.Log.append("closed")
+
+    async def StreamAsync(self, message: Message | dict | None = None, *args, **kwargs):
+        self.Take(message)
+
+        try:
+            await asyncio.sleep(self.FirstDelay)
+
+            if self.Fail:
+                raise Exception(f"{self.Name} failed")
+
+            for index in range(self.Deltas):
+                self.Log.append("delta")
+                yield f"{self.Name}{index} "
+                await asyncio.sleep(0.01)
+
+            self.Messages.append(Message("assistant", "".join(f"{self.Name}{index} " for index in range(self.Deltas))))
+
+        except asyncio.CancelledError:
+            self.Log.append("cancelled")
+            raise
+
+
+def Hedged(*contexts: SlowContext, delay: float | None = 0.05) -> HedgedContext:
+    context = HedgedContext(list(contexts), delay=delay)
+    context.Deltas = []
+    context.OnGenerate = context.Deltas.append
+
+    return context
+
+
+def test_fast_primary_is_not_hedged():
+    primary, backup = SlowContext("p", 0), SlowContext("b", 0)
+    context = Hedged(primary, backup, delay=1)
+
+    context.Prompt(Message("user", "hi")).Run()
+
+    assert context.Top().Content == "p0 p1 p2 "
+    assert backup.Log == []
+    assert context.Stats()["hedges"] == 0
+
+
+def test_sync_losers_run_until_their_next_delta():
+    primary, backup = SlowContext("p", 0.5), SlowContext("b", 0)
+    context = Hedged(primary, backup)
+    started = time.monotonic()
+
+    context.Prompt(Message("user", "hi")).Run()
+
+    # The backup won without waiting for the primary
+    assert time.monotonic() - started < 0.4
+    assert context.Top().Content == "b0 b1 b2 "
+    assert context.Deltas == ["b0 ", "b1 ", "b2 "]
+    assert context.Stats()["hedge_wins"] == 1
+
+    # The primary's thread can't be interrupted while it waits, so it is still running
+    assert primary.Log == ["start"]
+
+    deadline = time.monotonic() + 5
+
+    while "closed" not in primary.Log and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # It stopped at its first delta, which was never passed on
+    assert primary.Log == ["start", "delta", "closed"]
+    assert context.Deltas == ["b0 ", "b1 ", "b2 "]
+    # Its time to first token was still recorded
+    assert len(context.FirstTokenTimes) == 1 and context.FirstTokenTimes[0] >= 0.5
+
+
+def test_async_losers_are_cancelled():
+    primary, backup = SlowContext("p", 5), SlowContext("b", 0)
+    context = Hedged(primary, backup)
+
+    async def Main():
+        started = time.monotonic()
+        await context.Prompt(Message("user", "hi")).RunAsync()
+        elapsed = time.monotonic() - started
+
+        # Let the cancellation be delivered
+        await asyncio.sleep(0.01)
+
+        return elapsed
+
+    assert asyncio.run(Main()) < 1
+    assert context.Top().Content == "b0 b1 b2 "
+    assert primary.Log == ["start", "cancelled"]
+    assert backup.Log == ["start", "delta", "delta", "delta"]
+    # A primary cancelled before its first token records how long it waited
+    assert len(context.FirstTokenTimes) == 1 and context.FirstTokenTimes[0] >= 0.05
+
+
+def test_failures_fail_over_at_once():
+    primary, backup = SlowContext("p", 0, fail=True), SlowContext("b", 0)
+    context = Hedged(primary, backup, delay=10)
+    started = time.monotonic()
+
+    context.Prompt(Message("user", "hi")).Run()
+
+    assert time.monotonic() - started < 1
+    assert context.Top().Content == "b0 b1 b2 "
+    assert context.Stats()["failures"] == 1
+
+
+@pytest.mark.parametrize("run", ["sync", "async"])
+def test_failed_turn_is_rolled_back(run):
+    context = Hedged(SlowContext("p", 0, fail=True), SlowContext("b", 0, fail=True))
+    context.Prompt(Message("user", "hi"))
+
+    with pytest.raises(Exception, match="failed"):
+        if run == "sync":
+            context.Run()
+        else:
+            asyncio.run(context.RunAsync())
+
+    assert len(context.Messages) == 0
+    assert context.QueuePointer == 0
+
+
+def test_hedge_delay_quantile():
+    context = HedgedContext([SlowContext("p", 0)], delay=None, quantile=0.95, window=100)
+
+    # Too few samples to take a quantile from
+    context.FirstTokenTimes.extend([0.1] * 9)
+
+    assert context.HedgeDelay() == 1.0
+
+    context.FirstTokenTimes.clear()
+    context.FirstTokenTimes.extend(index / 100 for index in range(100, 0, -1))
+
+    assert context.HedgeDelay() == 0.96
+
+    context.Quantile = 0.5
+
+    assert context.HedgeDelay() == 0.51
+
+    context.Quantile = 1.0
+
+    assert context.HedgeDelay() == 1.0
+
+    # Only the most recent times count
+    context.FirstTokenTimes.extend([0.2] * 100)
+
+    assert context.HedgeDelay() == 0.2
+    assert HedgedContext([SlowContext("p", 0)], delay=0.3).HedgeDelay() == 0.3
@@ -0,0 +1,85 @@
+import pytest
+
+from tinytune.llmcontext import Message, MessageHistory, SerializeMessage
+
+
+def MakeHistory(count: int = 5) -> MessageHistory:
+    history = MessageHistory(Message("user", f"message {i}") for i in range(count))
+    history.Wire()
+
+    return history
+
+
+def Expected(history: MessageHistory) -> list[dict]:
+    return [dict(SerializeMessage(message)) for message in history]
+
+
+@pytest.mark.parametrize("index", [slice(0, 0), slice(2, 2), slice(5, 5), slice(-1, -1), slice(10, 10)])
+def test_empty_slice_insert(index):
+    history = MakeHistory()
+    history[index] = [Message("assistant", "inserted")]
+
+    assert history.Wire() == Expected(history)
+
+
+@pytest.mark.parametrize("index", [slice(1, 3), slice(3, None), slice(-2, None), slice(None, 1)])
+def test_slice_replace(index):
+    history = MakeHistory()
+    history[index] = [Message("assistant", "a"), Message("assistant", "b"), Message("assistant", "c")]
+
+    assert history.Wire() == Expected(history)
+
+
+@pytest.mark.parametrize("index", [slice(1, 3), slice(3, None), slice(-2, None), slice(2, 2), slice(None, None)])
+def test_slice_delete(index):
+    history = MakeHistory()
+    del history[index]
+
+    assert history.Wire() == Expected(history)
+
+
+@pytest.mark.parametrize("index", [slice(None, None, 2), slice(1, None, 2), slice(None, None, -2), slice(4, 0, -3)])
+def test_extended_slice(index):
+    history = MakeHistory()
+    history[index] = [Message("assistant", f"extended {i}") for i in range(len(range(*index.indices(len(history)))))]
+
+    assert history.Wire() == Expected(history)
+
+    del history[index]
+
+    assert history.Wire() == Expected(history)
+
+
+def test_insert_and_pop():
+    history = MakeHistory()
+    history.insert(1, Message("assistant", "inserted"))
+    history.insert(-1, Message("assistant", "before last"))
+
+    assert history.Wire() == Expected(history)
+
+    history.pop(0)
+    history.pop()
+
+    assert history.Wire() == Expected(history)
+
+
+def test_digest_follows_mutations():
+    history = MakeHistory()
+    history.Digest()
+
+    history[2:2] = [Message("assistant", "inserted")]
+
+    assert history.Digest() == MessageHistory(list(history)).Digest()
+
+
+def test_edits_are_tracked_per_history():
+    history = MakeHistory()
+    other = MakeHistory()
+    history.Digest()
+    other.Digest()
+
+    history[1].Content = "edited"
+
+    assert history.Edits == 1
+    assert other.Edits == 0
+    assert history.Digest() == MessageHistory(list(history)).Digest()
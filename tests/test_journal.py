@@ -0,0 +1,151 @@
+import os
+
+import pytest
+
+from tinytune import journal as journalModule
+from tinytune.journal import MessageJournal
+from tinytune.llmcontext import LLMContext, Message, Model
+
+
+def Records(count: int, start: int = 0) -> list[dict]:
+    return [{"role": "user", "content": f"message {index}"} for index in range(start, start + count)]
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    fsync = os.fsync
+
+    def CountingFsync(fd):
+        calls.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(journalModule.os, "fsync", CountingFsync)
+
+    return calls
+
+
+def test_open_truncates_a_torn_record(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_bytes(b'{"role":"user","content":"first"}\n{"role":"user","content":"sec')
+
+    journal = MessageJournal(str(path))
+
+    # Readers skip the torn record even before the journal is opened for writing
+    assert list(journal.Read()) == [{"role": "user", "content": "first"}]
+    assert len(journal) == 1
+    assert path.read_bytes() == b'{"role":"user","content":"first"}\n'
+
+    journal.Append(Records(1))
+    journal.Close()
+
+    assert list(journal.Read()) == [{"role": "user", "content": "first"}, *Records(1)]
+
+
+def test_open_keeps_a_complete_file(tmp_path):
+    path = tmp_path / "history.jsonl"
+
+    with MessageJournal(str(path)) as journal:
+        journal.Append(Records(3))
+
+    size = path.stat().st_size
+
+    with MessageJournal(str(path)) as journal:
+        assert len(journal) == 3
+
+    assert path.stat().st_size == size
+
+
+def test_appends_are_synced_in_batches(tmp_path, fsyncs):
+    path = str(tmp_path / "history.jsonl")
+    journal = MessageJournal(path, syncEvery=4, syncInterval=None)
+
+    for record in Records(3):
+        journal.Append([record])
+
+    # Written through to the OS but not yet fsynced
+    assert len(fsyncs) == 0
+    assert journal.Pending == 3
+    assert len(list(MessageJournal(path).Read())) == 3
+
+    journal.Append(Records(1, 3))
+
+    assert len(fsyncs) == 1
+    assert journal.Pending == 0
+
+    journal.Append(Records(1, 4))
+    journal.Close()
+
+    # Closing syncs what is pending
+    assert len(fsyncs) == 2
+    assert len(list(journal.Read())) == 5
+
+
+def test_appends_are_synced_by_interval(tmp_path, fsyncs):
+    journal = MessageJournal(str(tmp_path / "history.jsonl"), syncEvery=1000, syncInterval=60)
+
+    journal.Append(Records(1))
+
+    assert len(fsyncs) == 0
+
+    journal.LastSync -= 60
+    journal.Append(Records(1))
+
+    assert len(fsyncs) == 1
+    journal.Close()
+
+
+def test_compact_replaces_the_journal(tmp_path):
+    path = tmp_path / "history.jsonl"
+    journal = MessageJournal(str(path))
+    journal.Append(Records(5))
+
+    journal.Compact(Records(2, 10))
+
+    assert list(journal.Read()) == Records(2, 10)
+    assert len(journal) == 2
+    assert not os.path.exists(f"{path}.compact")
+
+    # The journal stays open for appending
+    journal.Append(Records(1, 12))
+    journal.Close()
+
+    assert list(journal.Read()) == Records(3, 10)
+
+
+def test_failed_compact_leaves_the_journal_intact(tmp_path, monkeypatch):
+    path = tmp_path / "history.jsonl"
+    journal = MessageJournal(str(path))
+    journal.Append(Records(5))
+
+    def Fail(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(journalModule.os, "replace", Fail)
+
+    with pytest.raises(OSError):
+        journal.Compact(Records(2, 10))
+
+    assert list(MessageJournal(str(path)).Read()) == Records(5)
+
+
+def test_context_appends_and_compacts(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    context = LLMContext(Model("test", "test"))
+    context.Messages = [Message("user", "a"), Message("assistant", "b")]
+    context.Save(path)
+
+    context.Messages.append(Message("user", "c"))
+    context.Save(path)
+
+    assert [record["content"] for record in MessageJournal(path).Read()] == ["a", "b", "c"]
+
+    del context.Messages[0]
+    context.Save(path, sync=True)
+
+    assert [record["content"] for record in MessageJournal(path).Read()] == ["b", "c"]
+
+    loaded = LLMContext(Model("test", "test"))
+    loaded.LoadMessages(path)
+
+    assert [message.Content for message in loaded.Messages] == ["b", "c"]
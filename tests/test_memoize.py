@@ -0,0 +1,255 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from tinytune.llmcontext import LLMContext, Message, Model
+from tinytune.memoize import Memoized, memoize
+from tinytune.prompt import PromptJob
+
+
+class Counter:
+    def __init__(self):
+        self.Lock: threading.Lock = threading.Lock()
+        self.Calls: int = 0
+
+    def Add(self):
+        with self.Lock:
+            self.Calls += 1
+
+
+def test_calls_share_a_key_once_bound():
+    counter = Counter()
+
+    @memoize
+    def search(query: str, limit: int = 5, *, exact: bool = False):
+        counter.Add()
+        return [query, limit, exact]
+
+    assert search("cats") == search("cats", 5) == search(query="cats", limit=5, exact=False)
+    assert search("cats", 6) == ["cats", 6, False]
+    assert counter.Calls == 2
+    assert search.Stats() == {"hits": 2, "misses": 2, "shared": 0, "bypassed": 0}
+
+
+def test_unkeyable_arguments_bypass_the_cache():
+    counter = Counter()
+
+    @memoize(ignore=("handle",))
+    def lookup(value, handle=None):
+        counter.Add()
+        return value
+
+    lookup({"a", "b"})
+    lookup({"b", "a"})
+    lookup(object())
+    lookup(1, handle=object())
+    lookup(1, handle=object())
+
+    assert counter.Calls == 3
+    assert lookup.Stats()["bypassed"] == 1
+
+
+def test_concurrent_calls_are_deduplicated():
+    counter = Counter()
+
+    @memoize
+    def fetch(url: str):
+        counter.Add()
+        time.sleep(0.1)
+        return url.upper()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch("a"))) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert results == ["A"] * 8
+    assert counter.Calls == 1
+    assert fetch.Stats()["shared"] + fetch.Stats()["hits"] == 7
+
+
+def test_concurrent_tasks_are_deduplicated():
+    counter = Counter()
+
+    @memoize
+    async def fetch(url: str):
+        counter.Add()
+        await asyncio.sleep(0.05)
+        return url.upper()
+
+    async def Main():
+        return await asyncio.gather(*(fetch("a") for _ in range(8)), fetch("b"))
+
+    assert asyncio.run(Main()) == ["A"] * 8 + ["B"]
+    assert counter.Calls == 2
+    assert fetch.Stats()["shared"] == 7
+
+
+def test_ttl_expiry():
+    counter = Counter()
+
+    @memoize(ttl=0.05)
+    def now(key: str):
+        counter.Add()
+        return counter.Calls
+
+    assert now("a") == now("a") == 1
+
+    time.sleep(0.1)
+
+    assert now("a") == 2
+    assert counter.Calls == 2
+
+
+def test_failures_reach_every_waiter_and_arent_cached():
+    counter = Counter()
+    failing = [True]
+
+    @memoize
+    def flaky(key: str):
+        counter.Add()
+        time.sleep(0.1)
+
+        if failing[0]:
+            raise RuntimeError("unavailable")
+
+        return key
+
+    errors = []
+
+    def Call():
+        try:
+            flaky("a")
+
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=Call) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    # One call ran, and its error was handed to the calls waiting on it
+    assert counter.Calls == 1
+    assert len(errors) == 4 and all(error is errors[0] for error in errors)
+
+    failing[0] = False
+
+    assert flaky("a") == "a"
+    assert counter.Calls == 2
+
+
+def test_cancelled_leader_lets_waiters_retry():
+    counter = Counter()
+
+    @memoize
+    async def slow(key: str):
+        counter.Add()
+        await asyncio.sleep(0.05)
+        return key
+
+    async def Main():
+        leader = asyncio.create_task(slow("a"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(slow("a"))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        return await waiter
+
+    assert asyncio.run(Main()) == "a"
+    assert counter.Calls == 2
+
+
+class EchoContext(LLMContext[Message]):
+    def __init__(self, name: str = "echo"):
+        super().__init__(Model(name, name))
+
+    def OnRun(self, *args, **kwargs):
+        return Message("assistant", self.Messages[-1].Content)
+
+
+def test_jobs_are_keyed_by_their_state():
+    counter = Counter()
+
+    def Answer(id, context, prevResult, question: str):
+        counter.Add()
+        return f"{prevResult}:{question}:{len(context.Messages)}"
+
+    context = EchoContext()
+    job = PromptJob(Answer, "answer", context, "first")
+    memoized = Memoized(job)
+
+    assert memoized("q") == memoized(question="q") == "first:q:0"
+    assert counter.Calls == 1
+
+    # A different previous result is a different call
+    job.PrevResult = "second"
+
+    assert memoized("q") == "second:q:0"
+
+    # So is a context holding another conversation, or another model
+    context.Prompt(Message("user", "hi")).Run()
+
+    assert memoized("q") == "second:q:2"
+
+    job.LLM = EchoContext("other")
+
+    assert memoized("q") == "second:q:0"
+    assert counter.Calls == 4
+
+    job.LLM = context
+
+    assert memoized("q") == "second:q:2"
+    assert counter.Calls == 4
+
+
+def test_jobs_with_unkeyable_previous_results_bypass_the_cache():
+    counter = Counter()
+
+    def Answer(id, context, prevResult):
+        counter.Add()
+        return "answer"
+
+    memoized = Memoized(PromptJob(Answer, "answer", None, object()))
+
+    memoized()
+    memoized()
+
+    assert counter.Calls == 2
+    assert memoized.Stats()["bypassed"] == 2
+
+
+def test_tools_share_an_sqlite_cache(tmp_path):
+    path = str(tmp_path / "tools.db")
+
+    def Square(value: int):
+        return value * value
+
+    def Cube(value: int):
+        return value ** 3
+
+    square = Memoized(Square, cache=path)
+
+    assert square(3) == 9
+
+    # Keys are prefixed with the tool name, and results survive reopening the file
+    assert Memoized(Cube, cache=square.Cache)(3) == 27
+    square.Cache.Close()
+
+    reopened = Memoized(Square, cache=path)
+    reopened(3)
+
+    assert reopened.Stats() == {"hits": 1, "misses": 0, "shared": 0, "bypassed": 0}
+
+    with pytest.raises(TypeError):
+        reopened()
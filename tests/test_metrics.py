@@ -0,0 +1,192 @@
+import time
+
+import pytest
+
+from tinytune.llmcontext import LLMContext, Message, Model
+from tinytune.metrics import Dispatching, Histogram, Instrumentation, Instruments, MetricsRegistry, NoSpan, Span
+
+
+class EchoContext(LLMContext[Message]):
+    def __init__(self):
+        super().__init__(Model("echo", "echo"))
+
+    def OnRun(self, *args, **kwargs):
+        return Message("assistant", self.Messages[-1].Content)
+
+
+def test_span_timing():
+    registry = MetricsRegistry()
+    instrumentation = Instrumentation(registry).Enable()
+
+    span = instrumentation.Start("request", model="m", job=None)
+    time.sleep(0.02)
+    span.Dispatch()
+    time.sleep(0.02)
+    span.Dispatch()
+    span.First()
+    time.sleep(0.02)
+    span.First()
+    span.Finish(promptTokens=3, completionTokens=10)
+
+    assert isinstance(span, Span)
+    assert 0.02 <= span.QueueWait < span.TimeToFirstToken < span.Duration
+    assert span.TimeToFirstToken >= 0.04
+    # Generation speed is taken from the first token
+    assert span.TokensPerSecond == pytest.approx(10 / (span.Ended - span.FirstToken))
+
+    # Only the first call of each mark counts, and finishing twice records once
+    span.Finish(promptTokens=100)
+
+    assert registry.Get("request.latency", model="m").Count == 1
+    assert registry.Get("request.queue_wait", model="m").Sum == pytest.approx(span.QueueWait)
+    assert registry.Get("request.ttft", model="m").Count == 1
+    assert registry.Get("request.tokens_per_second", model="m").Count == 1
+    assert registry.Get("request.prompt_tokens", model="m") == 3
+    assert registry.Get("request.completion_tokens", model="m") == 10
+    # Labels without a value are left out
+    assert registry.Get("request.latency", model="m", job=None) is None
+
+
+def test_unstreamed_requests_are_timed_from_dispatch():
+    span = Instrumentation().Enable().Start("request")
+    span.Dispatch()
+    span.Finish(completionTokens=5)
+
+    assert span.TimeToFirstToken is None
+    assert span.TokensPerSecond == pytest.approx(5 / (span.Ended - span.Dispatched))
+
+
+def test_errors_are_counted():
+    registry = MetricsRegistry()
+    instrumentation = Instrumentation(registry).Enable()
+
+    with pytest.raises(ValueError):
+        with instrumentation.Start("callback"):
+            raise ValueError()
+
+    # A closed stream or a cancelled task isn't a failure
+    with pytest.raises(KeyboardInterrupt):
+        with instrumentation.Start("callback"):
+            raise KeyboardInterrupt()
+
+    assert registry.Get("callback.errors") == 1
+    assert registry.Get("callback.latency").Count == 2
+
+
+def test_histogram_summary():
+    histogram = Histogram(window=100)
+
+    assert histogram.Summary() == {"count": 0, "sum": 0.0, "mean": None, "min": None, "max": None, "p50": None, "p95": None, "p99": None}
+
+    for value in range(100, 0, -1):
+        histogram.Observe(value)
+
+    assert histogram.Summary() == {"count": 100, "sum": 5050, "mean": 50.5, "min": 1, "max": 100, "p50": 51, "p95": 96, "p99": 100}
+    assert histogram.Quantile(0) == 1 and histogram.Quantile(1) == 100
+
+
+def test_histogram_quantiles_follow_recent_values():
+    histogram = Histogram(window=10)
+
+    for value in range(100):
+        histogram.Observe(value)
+
+    # Totals cover every value, quantiles only the window
+    assert histogram.Count == 100 and histogram.Min == 0
+    assert histogram.Quantile(0) == 90
+    assert histogram.Quantile(0.5) == 95
+
+
+def test_registry_keys_and_snapshot():
+    registry = MetricsRegistry()
+    registry.Increment("requests", labels={"model": "a", "job": "x"})
+    registry.Increment("requests", 2, labels={"job": "x", "model": "a"})
+    registry.Increment("requests", labels={"model": "b"})
+    registry.Observe("latency", 0.5, labels={"model": "a"})
+
+    assert registry.Get("requests", model="a", job="x") == 3
+    assert registry.Get("requests", model="c") is None
+
+    snapshot = registry.Snapshot()
+
+    assert [(metric["name"], metric["labels"]) for metric in snapshot] == [
+        ("latency", {"model": "a"}),
+        ("requests", {"job": "x", "model": "a"}),
+        ("requests", {"model": "b"}),
+    ]
+    assert snapshot[0]["count"] == 1 and snapshot[1]["value"] == 3
+
+    registry.Reset()
+
+    assert registry.Snapshot() == []
+
+
+def test_hooks():
+    events = []
+    instrumentation = Instrumentation()
+
+    def Failing(event, span):
+        raise Exception("exporter failed")
+
+    instrumentation.AddHook(Failing)
+    instrumentation.AddHook(lambda event, span: events.append((event, span.Name)))
+
+    # Adding a hook enables instrumentation, and failing hooks don't fail the stage
+    with instrumentation.Start("job") as span:
+        span.First()
+
+    assert events == [("start", "job"), ("first_token", "job"), ("end", "job")]
+
+    instrumentation.RemoveHook(Failing)
+
+    assert len(instrumentation.Hooks) == 1
+
+
+def test_disabled_instrumentation_hands_out_the_null_span():
+    registry = MetricsRegistry()
+    instrumentation = Instrumentation(registry)
+    events = []
+
+    span = instrumentation.Start("request", model="m")
+
+    assert span is NoSpan
+
+    with span:
+        span.Dispatch()
+        span.First()
+        span.Finish(promptTokens=1)
+
+    instrumentation.AddHook(lambda event, span: events.append(event)).Disable()
+
+    assert instrumentation.Start("request") is NoSpan
+    assert registry.Snapshot() == [] and events == []
+
+
+def test_dispatching():
+    def Request():
+        return "response"
+
+    assert Dispatching(Request, NoSpan) is Request
+
+    span = Instrumentation().Enable().Start("request")
+    send = Dispatching(Request, span)
+
+    assert span.Dispatched is None
+    assert send() == "response"
+    assert span.Dispatched is not None
+
+
+def test_context_runs_are_recorded():
+    registry = MetricsRegistry()
+    previous = Instruments.Registry
+    Instruments.Enable(registry)
+
+    try:
+        EchoContext().Prompt(Message("user", "hi")).Then(lambda context, message: message).Run()
+
+    finally:
+        Instruments.Disable()
+        Instruments.Registry = previous
+
+    assert [metric["name"] for metric in registry.Snapshot()] == ["callback.latency", "request.latency", "request.queue_wait", "run.latency"]
+    assert all(metric["labels"] == {"model": "echo"} for metric in registry.Snapshot())
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fakeserver import FakeServer
+from tinytune.contexts.openaicontext import ChatMessage, OpenAICompatibleContext
+
+
+@pytest.fixture(scope="module")
+def fake():
+    with FakeServer(tokens=8) as server:
+        yield server
+
+
+@pytest.fixture
+def server(fake):
+    fake.ErrorRate, fake.ErrorStatus = 0.0, 500
+
+    return fake
+
+
+def Context(server: FakeServer) -> OpenAICompatibleContext:
+    return OpenAICompatibleContext("fake", "fake", baseUrl=server.URL)
+
+
+def Roles(context: OpenAICompatibleContext) -> list[str]:
+    return [message.Role for message in context.Messages]
+
+
+def test_failed_run_is_rolled_back(server):
+    server.ErrorRate, server.ErrorStatus = 1.0, 400
+    context = Context(server).Prompt(ChatMessage("user", "hello"))
+
+    with pytest.raises(Exception):
+        context.Run()
+
+    assert len(context.Messages) == 0
+    assert context.QueuePointer == 0
+
+    # The message is still queued and sent once
+    server.ErrorRate = 0.0
+    context.Run()
+
+    assert Roles(context) == ["user", "assistant"]
+    assert context.QueuePointer == 1
+
+
+def test_abandoned_stream_is_rolled_back(server):
+    context = Context(server)
+    stream = context.Stream(ChatMessage("user", "hello"))
+
+    next(stream)
+    next(stream)
+    stream.close()
+
+    assert len(context.Messages) == 0
+    assert context.QueuePointer == 0
+
+    deltas = list(context.Stream())
+
+    assert Roles(context) == ["user", "assistant"]
+    assert context.Top().Content == "".join(deltas)
+
+
+def test_failed_stream_async_is_rolled_back(server):
+    server.ErrorRate, server.ErrorStatus = 1.0, 400
+    context = Context(server).Prompt(ChatMessage("user", "hello"))
+
+    async def Consume():
+        return [delta async for delta in context.StreamAsync()]
+
+    with pytest.raises(Exception):
+        asyncio.run(Consume())
+
+    assert len(context.Messages) == 0
+
+    server.ErrorRate = 0.0
+    asyncio.run(Consume())
+
+    assert Roles(context) == ["user", "assistant"]
+
+
+def test_abandoned_stream_async_is_rolled_back(server):
+    context = Context(server)
+
+    async def Abandon():
+        stream = context.StreamAsync(ChatMessage("user", "hello"))
+        await anext(stream)
+        await stream.aclose()
+
+    asyncio.run(Abandon())
+
+    assert len(context.Messages) == 0
+    assert context.QueuePointer == 0
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+import time
+
+from tinytune.llmcontext import LLMContext, Model
+from tinytune.pipeline import Pipeline
+from tinytune.prompt import prompt_job
+
+
+def test_generator_job_stops_when_the_consumer_closes():
+    context = LLMContext(Model("test", "test"))
+    produced: list[int] = []
+    closed = threading.Event()
+
+    @prompt_job(id="count", context=context)
+    def Count(id, context, prevResult, *args):
+        try:
+            for i in range(1000):
+                produced.append(i)
+                time.sleep(0.01)
+                yield str(i)
+
+        finally:
+            closed.set()
+
+    pipeline = Pipeline(context)
+    pipeline.AddJob(Count)
+
+    async def Consume():
+        stream = pipeline.StreamAsync(source=[])
+        received = [await anext(stream) for _ in range(3)]
+        await stream.aclose()
+
+        return received
+
+    assert asyncio.run(Consume()) == ["0", "1", "2"]
+    assert closed.wait(1)
+
+    stoppedAt = len(produced)
+    time.sleep(0.1)
+
+    assert len(produced) == stoppedAt < 1000
@@ -0,0 +1,306 @@
+import asyncio
+import time
+
+import pytest
+
+from tinytune.llmcontext import LLMContext, Message, Model
+from tinytune.router import RouterContext
+
+
+class StatusError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"status {status}")
+        self.status_code = status
+
+
+class FakeClient:
+    """
+    Answers health checks like an OpenAI client listing models.
+    """
+    def __init__(self):
+        self.Down: bool = False
+        self.models = self
+
+    def with_options(self, **options):
+        return self
+
+    def list(self):
+        if self.Down:
+            raise ConnectionError("down")
+
+        return []
+
+
+class Backend(LLMContext[Message]):
+    """
+    Streams a reply naming the backend, or fails before or after its first delta. Spawned copies share the counters.
+    """
+    def __init__(self, name: str):
+        super().__init__(Model(name, name))
+        self.Name: str = name
+        self.Client: FakeClient = FakeClient()
+        self.Error: Exception | None = None
+        self.FailAfterFirst: bool = False
+        self.Served: list[int] = [0]
+
+    def Take(self, message: Message | dict | None):
+        if message is not None:
+            self.Prompt(message)
+
+        self.Messages.append(self.MessageQueue[self.QueuePointer])
+        self.QueuePointer += 1
+
+    def Deltas(self):
+        if self.Error is not None and not self.FailAfterFirst:
+            raise self.Error
+
+        self.Served[0] += 1
+
+        yield f"{self.Name}:"
+
+        if self.Error is not None:
+            raise self.Error
+
+        yield "reply"
+
+        self.Messages.append(Message("assistant", f"{self.Name}:reply"))
+
+    def Stream(self, message: Message | dict | None = None, *args, **kwargs):
+        self.Take(message)
+
+        yield from self.Deltas()
+
+    async def StreamAsync(self, message: Message | dict | None = None, *args, **kwargs):
+        self.Take(message)
+
+        for delta in self.Deltas():
+            await asyncio.sleep(0)
+            yield delta
+
+
+def Router(count: int = 2, **kwargs) -> tuple[RouterContext, list[Backend]]:
+    backends = [Backend(f"b{index}") for index in range(count)]
+
+    return RouterContext(backends, **kwargs), backends
+
+
+def Ask(router: RouterContext, content: str = "hi") -> str:
+    router.Prompt(Message("user", content)).Run()
+
+    return router.Top().Content
+
+
+def test_least_outstanding():
+    router, _ = Router(3, sticky=False)
+
+    first = router.Select()
+    second = router.Select()
+    third = router.Select()
+
+    # Each request goes to an idle endpoint
+    assert {first.Index, second.Index, third.Index} == {0, 1, 2}
+
+    router.Release(first, 0.1)
+    router.Release(third, 0.1)
+
+    assert router.Select().Index in (first.Index, third.Index)
+    assert router.Endpoints[second.Index].Outstanding == 1
+
+
+def test_ties_are_broken_round_robin():
+    router, _ = Router(3, sticky=False)
+    picked = []
+
+    for _ in range(6):
+        endpoint = router.Select()
+        picked.append(endpoint.Index)
+        router.Release(endpoint, 0.1)
+
+    assert sorted(picked) == [0, 0, 1, 1, 2, 2]
+
+
+def test_ewma_latency():
+    router, _ = Router(2, policy="ewma", sticky=False, decay=0.5)
+    slow, fast = router.Endpoints
+
+    # Endpoints without samples are tried first
+    router.Release(router.Select(), 1.0)
+
+    assert router.Select() is fast
+
+    router.Release(fast, 0.1)
+    router.Release(router.Select(), 0.3)
+
+    assert fast.Latency == pytest.approx(0.2)
+    assert slow.Latency == 1.0
+
+    # The fast endpoint is preferred until its queue outweighs its speed
+    held = [router.Select() for _ in range(5)]
+
+    assert all(endpoint is fast for endpoint in held)
+    assert router.Select() is slow
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Router(policy="random")
+
+
+def test_repeated_failures_eject_an_endpoint():
+    router, _ = Router(2, sticky=False, ejectAfter=2, ejectFor=60)
+    endpoint = router.Endpoints[0]
+
+    for _ in range(2):
+        endpoint.Outstanding += 1
+        router.Release(endpoint, None, StatusError(503))
+
+    assert not endpoint.Available(time.monotonic())
+    assert all(router.Select().Index == 1 for _ in range(4))
+    assert router.Stats()[0]["ejected"] and router.Stats()[0]["ejections"] == 1
+
+
+def test_request_errors_and_successes_dont_eject():
+    router, _ = Router(2, sticky=False, ejectAfter=2)
+    endpoint = router.Endpoints[0]
+
+    for error in (StatusError(503), None, StatusError(503), StatusError(400), ValueError()):
+        endpoint.Outstanding += 1
+        router.Release(endpoint, None, error)
+
+    # A success resets the count, and errors of the request itself don't count
+    assert endpoint.Available(time.monotonic())
+    assert endpoint.Failures == 1 and endpoint.Errors == 2
+
+
+def test_probe_readmits_an_ejected_endpoint():
+    router, backends = Router(2, sticky=False, ejectAfter=1, ejectFor=60)
+    endpoint = router.Endpoints[0]
+    endpoint.Outstanding += 1
+    router.Release(endpoint, None, ConnectionError())
+    backends[1].Client.Down = True
+
+    assert router.CheckHealth() == [True, False]
+    assert endpoint.Available(time.monotonic())
+    assert not router.Endpoints[1].Available(time.monotonic())
+
+    backends[1].Client.Down = False
+    router.CheckHealth()
+
+    assert all(endpoint.Available(time.monotonic()) for endpoint in router.Endpoints)
+
+
+def test_background_health_checks():
+    router, backends = Router(2, healthInterval=0.01)
+    backends[0].Client.Down = True
+
+    try:
+        deadline = time.monotonic() + 5
+
+        while router.Endpoints[0].Available(time.monotonic()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert not router.Endpoints[0].Available(time.monotonic())
+
+    finally:
+        router.Close()
+
+
+def test_all_ejected_picks_the_soonest_back():
+    router, _ = Router(2, sticky=False)
+    router.Endpoints[0].EjectedUntil = time.monotonic() + 60
+    router.Endpoints[1].EjectedUntil = time.monotonic() + 30
+
+    assert router.Select().Index == 1
+
+
+def test_conversations_stick_to_their_endpoint():
+    router, backends = Router(2)
+
+    assert Ask(router).startswith("b0")
+
+    # Busier than the other endpoint, but it holds the conversation's prefix
+    router.Endpoints[0].Outstanding += 5
+
+    assert Ask(router).startswith("b0")
+
+    fork = router.Fork()
+    spawned = router.Spawn()
+
+    assert Ask(fork).startswith("b0")
+    assert Ask(spawned).startswith("b1")
+
+    # An ejected endpoint gives the conversation up, and it sticks to the new one
+    router.Endpoints[0].EjectedUntil = time.monotonic() + 60
+
+    assert Ask(router).startswith("b1")
+
+    router.Endpoints[0].EjectedUntil = 0
+
+    assert Ask(router).startswith("b1")
+    assert len(router.Messages) == 8
+
+
+def test_affinity_is_bounded():
+    router, _ = Router(2, maxConversations=2)
+
+    for _ in range(3):
+        router.Spawn().Select()
+
+    assert len(router.Affinity) == 2
+
+
+def test_failover_before_the_first_delta():
+    router, backends = Router(2)
+    backends[0].Error = StatusError(503)
+    deltas = []
+    router.OnGenerate = deltas.append
+
+    assert Ask(router) == "b1:reply"
+    assert deltas == ["b1:", "reply"]
+    assert [endpoint["errors"] for endpoint in router.Stats()] == [1, 0]
+    assert all(endpoint.Outstanding == 0 for endpoint in router.Endpoints)
+
+
+def test_failover_async():
+    router, backends = Router(2)
+    backends[0].Error = ConnectionError()
+
+    asyncio.run(router.Prompt(Message("user", "hi")).RunAsync())
+
+    assert router.Top().Content == "b1:reply"
+
+
+def test_no_failover_after_the_first_delta():
+    router, backends = Router(2)
+    backends[0].Error = StatusError(503)
+    backends[0].FailAfterFirst = True
+
+    with pytest.raises(StatusError):
+        Ask(router)
+
+    assert backends[1].Served == [0]
+    assert len(router.Messages) == 0 and router.QueuePointer == 0
+
+
+def test_no_failover_for_request_errors():
+    router, backends = Router(2)
+    backends[0].Error = StatusError(400)
+
+    with pytest.raises(StatusError):
+        Ask(router)
+
+    assert backends[1].Served == [0]
+    assert all(endpoint.Outstanding == 0 for endpoint in router.Endpoints)
+
+
+def test_every_endpoint_failing():
+    router, backends = Router(2)
+
+    for backend in backends:
+        backend.Error = StatusError(503)
+
+    with pytest.raises(StatusError):
+        Ask(router)
+
+    assert [endpoint["errors"] for endpoint in router.Stats()] == [1, 1]
+    assert len(router.Messages) == 0
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+
+import pytest
+
+from tinytune.sandbox import ProcessSandbox, ProcessTool, cpu_bound
+
+
+# Run in the worker processes, which import them from this module
+def Square(value: int) -> int:
+    return value * value
+
+
+def Pid() -> int:
+    return os.getpid()
+
+
+def Spin():
+    while True:
+        pass
+
+
+def Exit(code: int):
+    os._exit(code)
+
+
+def Allocate(size: int) -> int:
+    return len(bytearray(size))
+
+
+def AddressLimit() -> tuple[int, int]:
+    import resource
+
+    return resource.getrlimit(resource.RLIMIT_AS)
+
+
+def Fail(reason: str):
+    raise RuntimeError(reason)
+
+
+@pytest.fixture
+def sandbox():
+    sandbox = ProcessSandbox(maxWorkers=1)
+
+    yield sandbox
+
+    sandbox.Close()
+
+
+def test_calls_run_in_a_worker(sandbox):
+    assert sandbox.Run(Square, (7,)) == 49
+    assert sandbox.Run(Pid) != os.getpid()
+
+    with pytest.raises(RuntimeError, match="broken"):
+        sandbox.Run(Fail, ("broken",))
+
+    # Errors of the function don't cost the worker
+    assert sandbox.Stats() == {"calls": 3, "timeouts": 0, "crashes": 0, "workers": 1}
+
+
+def test_functions_must_be_importable(sandbox):
+    def Local():
+        return 1
+
+    with pytest.raises(ValueError):
+        sandbox.Run(Local)
+
+    with pytest.raises(ValueError):
+        ProcessTool(lambda: 1)
+
+
+def test_timeout_kills_the_worker(sandbox):
+    pid = sandbox.Run(Pid)
+    worker = sandbox.Idle[0]
+    started = time.monotonic()
+
+    with pytest.raises(TimeoutError):
+        sandbox.Run(Spin, timeout=0.5)
+
+    assert time.monotonic() - started < 5
+    assert not worker.Process.is_alive()
+    assert sandbox.Stats() == {"calls": 1, "timeouts": 1, "crashes": 0, "workers": 0}
+
+    # The next call gets a new worker
+    assert sandbox.Run(Pid) != pid
+    assert sandbox.Stats()["workers"] == 1
+
+
+def test_crashed_worker_is_reported_and_replaced(sandbox):
+    pid = sandbox.Run(Pid)
+
+    with pytest.raises(Exception, match="exited with code 3"):
+        sandbox.Run(Exit, (3,))
+
+    assert sandbox.Stats()["crashes"] == 1
+    assert sandbox.Run(Pid) != pid
+
+
+def test_memory_limit(sandbox):
+    pytest.importorskip("resource")
+    limits = sandbox.Run(AddressLimit)
+    pid = sandbox.Run(Pid)
+
+    with pytest.raises(MemoryError):
+        sandbox.Run(Allocate, (2 << 30,), memoryLimit=512 << 20)
+
+    # The limit only held for that call, in the same worker
+    assert sandbox.Run(AddressLimit) == limits
+    assert sandbox.Run(Allocate, (64 << 20,)) == 64 << 20
+    assert sandbox.Run(Pid) == pid
+    assert sandbox.Stats()["crashes"] == 0
+
+
+def test_runaway_call_doesnt_hold_up_the_pool():
+    sandbox = ProcessSandbox(maxWorkers=2)
+    runaway = cpu_bound(timeout=1, sandbox=sandbox)(Spin)
+    square = cpu_bound(sandbox=sandbox)(Square)
+    errors = []
+
+    def Run():
+        try:
+            runaway()
+
+        except TimeoutError as e:
+            errors.append(e)
+
+    try:
+        thread = threading.Thread(target=Run)
+        thread.start()
+
+        # The other worker keeps serving calls while the runaway one spins
+        assert [square(value) for value in range(5)] == [0, 1, 4, 9, 16]
+
+        thread.join()
+
+        assert len(errors) == 1
+        assert square.__name__ == "Square"
+
+        # The killed worker is replaced as calls need it
+        assert [square(value) for value in range(5)] == [0, 1, 4, 9, 16]
+        assert sandbox.Stats() == {"calls": 10, "timeouts": 1, "crashes": 0, "workers": 1}
+
+    finally:
+        sandbox.Close()
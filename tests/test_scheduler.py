@@ -0,0 +1,180 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from benchmarks.fakeserver import FakeServer
+from tinytune.contexts.openaicontext import ChatMessage, OpenAICompatibleContext
+from tinytune.scheduler import RequestScheduler, TokenBucket
+
+
+class StatusError(Exception):
+    def __init__(self, status: int, headers: dict | None = None):
+        super().__init__(f"status {status}")
+        self.status_code = status
+        self.response = httpx.Response(status, headers=headers or {})
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(rate=10, capacity=10)
+
+    assert bucket.Reserve(10) == 0.0
+    # Overdrawn by 5 tokens, paid back at 10 per second
+    assert bucket.Reserve(5) == pytest.approx(0.5, abs=0.01)
+
+    bucket.Updated -= 1.0
+
+    assert bucket.Reserve(0) == 0.0
+    assert bucket.Tokens == pytest.approx(5, abs=0.1)
+
+    # Refills stop at the capacity
+    bucket.Updated -= 100
+
+    assert bucket.Reserve(0) == 0.0
+    assert bucket.Tokens == 10
+
+
+def test_concurrency_grows_additively():
+    scheduler = RequestScheduler(maxConcurrency=3, concurrency=2)
+
+    scheduler.OnSuccess(0.01, None, 0)
+
+    assert scheduler.Concurrency == pytest.approx(2.5)
+
+    for _ in range(10):
+        scheduler.OnSuccess(0.01, None, 0)
+
+    assert scheduler.Concurrency == 3
+
+
+def test_concurrency_shrinks_once_per_congestion_event():
+    scheduler = RequestScheduler(maxConcurrency=16, targetLatency=0.5)
+
+    scheduler.OnSuccess(1.0, None, 0)
+
+    assert scheduler.Concurrency == 8
+
+    # Within one round trip of the decrease, slow responses belong to the same event
+    scheduler.OnSuccess(1.0, None, 0)
+
+    assert scheduler.Concurrency == 8
+
+    scheduler.LastDecrease -= 10
+    scheduler.OnSuccess(1.0, None, 0)
+
+    assert scheduler.Concurrency == 4
+
+
+def test_rate_limits_shrink_and_honour_retry_after():
+    scheduler = RequestScheduler(maxConcurrency=8, baseDelay=0.001, maxDelay=10)
+
+    delay = scheduler.OnError(StatusError(429, {"retry-after": "3"}), 0)
+
+    assert delay == 3.0
+    assert scheduler.Concurrency == 4
+    assert scheduler.Stats()["rate_limited"] == 1
+
+    # Retry-After is capped at the maximum delay, and unparsable values are ignored
+    assert scheduler.OnError(StatusError(503, {"retry-after": "120"}), 0) == 10
+    assert scheduler.OnError(StatusError(503, {"retry-after": "soon"}), 0) <= 0.001
+
+    assert scheduler.OnError(StatusError(503), scheduler.MaxRetries) is None
+
+
+def test_retryable_errors():
+    scheduler = RequestScheduler()
+    request = httpx.Request("POST", "http://localhost")
+
+    assert scheduler.IsRetryable(StatusError(429))
+    assert scheduler.IsRetryable(StatusError(503))
+    assert not scheduler.IsRetryable(StatusError(400))
+    assert not scheduler.IsRetryable(StatusError(401))
+    assert scheduler.IsRetryable(ConnectionError())
+    assert scheduler.IsRetryable(TimeoutError())
+    assert scheduler.IsRetryable(openai.APIConnectionError(request=request))
+    assert scheduler.IsRetryable(openai.APITimeoutError(request=request))
+    assert not scheduler.IsRetryable(ValueError())
+
+
+def test_submit_retries_transient_errors():
+    scheduler = RequestScheduler(baseDelay=0.001)
+    errors = [StatusError(503), StatusError(429)]
+
+    def Request():
+        if errors:
+            raise errors.pop(0)
+
+        return "ok"
+
+    assert scheduler.Submit(Request) == "ok"
+    assert scheduler.Stats()["retries"] == 2
+    assert scheduler.InFlight == 0
+
+    with pytest.raises(StatusError):
+        scheduler.Submit(lambda: (_ for _ in ()).throw(StatusError(400)))
+
+    assert scheduler.InFlight == 0
+
+
+def test_held_slots_are_kept_until_released():
+    scheduler = RequestScheduler(maxConcurrency=1)
+
+    scheduler.Submit(lambda: "stream", hold=True)
+
+    assert scheduler.InFlight == 1
+
+    scheduler.Release()
+
+    assert scheduler.InFlight == 0
+
+
+def test_streams_release_their_slot():
+    with FakeServer(tokens=8) as server:
+        context = OpenAICompatibleContext("fake", "fake", baseUrl=server.URL)
+        context.Scheduler = RequestScheduler(maxConcurrency=1)
+
+        stream = context.Stream(ChatMessage("user", "hello"))
+        next(stream)
+
+        # The slot is held while the stream is read
+        assert context.Scheduler.InFlight == 1
+
+        stream.close()
+
+        assert context.Scheduler.InFlight == 0
+
+        list(context.Stream())
+
+        assert context.Scheduler.InFlight == 0
+
+        async def Consume():
+            return [delta async for delta in context.StreamAsync(ChatMessage("user", "again"))]
+
+        asyncio.run(Consume())
+
+        assert context.Scheduler.InFlight == 0
+
+
+def test_cancelled_waiters_dont_take_slots():
+    scheduler = RequestScheduler(maxConcurrency=1)
+
+    async def Main():
+        await scheduler.AcquireAsync()
+
+        waiter = asyncio.create_task(scheduler.AcquireAsync())
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        scheduler.Release()
+
+        # The cancelled waiter didn't keep the freed slot
+        await asyncio.wait_for(scheduler.AcquireAsync(), 1)
+        scheduler.Release()
+
+    asyncio.run(Main())
+
+    assert scheduler.InFlight == 0
@@ -0,0 +1,109 @@
+import pytest
+
+from tinytune.journal import EncodeRecord, MessageJournal
+from tinytune.llmcontext import Message, MessageHistory
+from tinytune.store import ConversationStore, StoredMessages
+
+
+def test_wire_and_digest_follow_appends(tmp_path):
+    path = str(tmp_path / "conversation.jsonl")
+    history = StoredMessages(ConversationStore(path))
+    history.extend([Message("user", "line\nbreak"), {"role": "assistant", "content": "ünïcode \"quoted\""}])
+
+    digest = history.Digest()
+
+    assert history.Wire() == [history.Store.Record(index) for index in range(len(history))]
+
+    history.append(Message("user", "more"))
+
+    assert history.Wire()[-1] == {"role": "user", "content": "more"}
+    assert history.Digest() != digest
+
+    history.Store.Close()
+    reopened = StoredMessages(ConversationStore(path))
+
+    assert reopened.Digest() == history.Digest()
+    assert reopened.Wire() == history.Wire()
+
+
+def test_trailing_messages_can_be_removed(tmp_path):
+    path = str(tmp_path / "conversation.jsonl")
+    history = StoredMessages(ConversationStore(path))
+    history.extend([Message("user", "a"), Message("assistant", "b"), Message("user", "c")])
+    digest = StoredMessages(ConversationStore(str(tmp_path / "other.jsonl")))
+    digest.extend([Message("user", "a")])
+
+    history.Wire()
+    history.Digest()
+
+    with pytest.raises(ValueError):
+        del history[0]
+
+    del history[1:]
+
+    assert [message.Content for message in history] == ["a"]
+    assert history.Wire() == [{"role": "user", "content": "a"}]
+    assert history.Digest() == digest.Digest()
+
+    history.append(Message("assistant", "d"))
+    history.Store.Close()
+    reopened = StoredMessages(ConversationStore(path))
+
+    assert [message.Content for message in reopened] == ["a", "d"]
+
+
+def test_digest_matches_message_history(tmp_path):
+    messages = [Message("user", "line\nbreak"), {"role": "assistant", "content": "ünïcode", "name": "x"}]
+    history = StoredMessages(ConversationStore(str(tmp_path / "conversation.jsonl")))
+    history.extend(messages)
+
+    assert history.Digest() == MessageHistory(messages).Digest()
+
+    history.append(Message("user", "more"))
+
+    assert history.Digest() == MessageHistory([*messages, Message("user", "more")]).Digest()
+
+
+def test_index_is_reused(tmp_path):
+    path = str(tmp_path / "conversation.jsonl")
+
+    with ConversationStore(path) as store:
+        store.Append([Message("user", f"message {index}") for index in range(5)])
+
+    with open(path, "ab") as fp:
+        fp.write(EncodeRecord(Message("user", "appended")))
+
+    with ConversationStore(path) as store:
+        # The index covered the first five records and was extended over the sixth
+        assert store.Indexed == 5
+        assert [store.Record(index)["content"] for index in range(len(store))][-2:] == ["message 4", "appended"]
+
+
+def test_index_is_rebuilt_after_compaction(tmp_path):
+    path = str(tmp_path / "conversation.jsonl")
+
+    with ConversationStore(path) as store:
+        store.Append([Message("user", f"message {index}") for index in range(5)])
+
+    # The compacted file is at least as long as the indexed one, but its records are laid out differently
+    with MessageJournal(path) as journal:
+        journal.Compact([Message("user", "a much longer first message " * 5), Message("user", "second")])
+
+    with ConversationStore(path) as store:
+        assert store.Indexed == 0
+        assert [store.Record(index)["content"] for index in range(len(store))] == ["a much longer first message " * 5, "second"]
+
+
+def test_index_is_rebuilt_after_rewrite_in_place(tmp_path):
+    path = str(tmp_path / "conversation.jsonl")
+
+    with ConversationStore(path) as store:
+        store.Append([Message("user", "ab"), Message("user", "cd")])
+
+    # Same file, same size, different record boundaries
+    with open(path, "r+b") as fp:
+        fp.write(b'{"role":"user","content":"abcdefghijklmnopqrstuvwxyz0123456"}\n')
+
+    with ConversationStore(path) as store:
+        assert len(store) == 1
+        assert store.Record(0)["content"] == "abcdefghijklmnopqrstuvwxyz0123456"
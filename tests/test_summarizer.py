@@ -0,0 +1,165 @@
+import threading
+
+from tinytune.llmcontext import LLMContext, Message, MessageHistory, Model
+from tinytune.summarizer import Summarizer
+
+
+class FakeContext(LLMContext[Message]):
+    """
+    Answers every prompt with a numbered summary and records what it was sent. Spawned copies share the records.
+    """
+    def __init__(self):
+        super().__init__(Model("test", "test"))
+        self.Prompts: list[str] = []
+        self.Sent: list[list[dict]] = []
+        self.Gate: threading.Event = threading.Event()
+        self.Gate.set()
+        self.Fail: bool = False
+
+    def OnRun(self, *args, **kwargs):
+        self.Gate.wait(5)
+
+        if self.Fail:
+            raise Exception("summary failed")
+
+        self.Sent.append(self.RequestMessages())
+        self.Prompts.append(self.Messages[-1].Content)
+
+        return Message("assistant", f"summary {len(self.Prompts)}")
+
+
+def Turns(count: int, start: int = 0) -> list[Message]:
+    return [Message("user" if index % 2 == 0 else "assistant", f"turn {index} " + "x" * 36) for index in range(start, start + count)]
+
+
+def Make(context: FakeContext, **kwargs) -> Summarizer:
+    # Every turn costs 15 tokens, so seven of them pass the threshold
+    return Summarizer(context, **{"threshold": 100, "keep": 2, "background": False, **kwargs})
+
+
+def test_history_below_threshold_is_sent_as_is():
+    summarizer = Make(FakeContext())
+    history = MessageHistory(Turns(6))
+
+    assert summarizer.Apply(history) is history.Wire()
+    assert summarizer.Summary is None
+
+
+def test_older_turns_are_summarized():
+    context = FakeContext()
+    summarizer = Make(context)
+    history = MessageHistory([Message("system", "rules"), *Turns(8)])
+
+    messages = summarizer.Apply(history)
+    wire = history.Wire()
+
+    assert messages == [
+        {"role": "system", "content": "rules"},
+        {"role": "system", "content": "Summary of the earlier conversation:\nsummary 1"},
+        *wire[-2:],
+    ]
+    assert summarizer.Start == len(wire) - 2 and summarizer.Summaries == 1
+
+    # System messages are kept beside the summary, not folded into it
+    assert "rules" not in context.Prompts[0]
+    assert "turn 0" in context.Prompts[0] and "turn 5" in context.Prompts[0] and "turn 6" not in context.Prompts[0]
+    assert len(history) == 9
+
+
+def test_previous_summary_is_folded_in():
+    context = FakeContext()
+    summarizer = Make(context)
+    history = MessageHistory(Turns(8))
+
+    summarizer.Apply(history)
+    history.extend(Turns(6, 8))
+    messages = summarizer.Apply(history)
+
+    assert summarizer.Summaries == 2
+    assert "summary 1" in context.Prompts[1]
+    assert "turn 5" not in context.Prompts[1] and "turn 6" in context.Prompts[1]
+    assert messages[0]["content"].endswith("summary 2")
+    assert messages[1:] == history.Wire()[-2:]
+
+
+def test_background_summary_is_picked_up_later():
+    context = FakeContext()
+    summarizer = Make(context, background=True)
+    history = MessageHistory(Turns(8))
+    context.Gate.clear()
+
+    # The turn that crosses the threshold goes out in full
+    assert summarizer.Apply(history) is history.Wire()
+    assert summarizer.Pending is not None
+
+    history.append(Message("user", "next"))
+
+    assert summarizer.Apply(history) is history.Wire()
+
+    context.Gate.set()
+    summarizer.Wait()
+    messages = summarizer.Apply(history)
+
+    # The summary covers the turns it was started for, and everything after them is sent verbatim
+    assert messages[0]["content"].endswith("summary 1")
+    assert messages[1:] == history.Wire()[6:]
+
+
+def test_failed_summary_is_retried():
+    context = FakeContext()
+    context.Fail = True
+    summarizer = Make(context)
+    history = MessageHistory(Turns(8))
+
+    assert summarizer.Apply(history) is history.Wire()
+    assert str(summarizer.Error) == "summary failed"
+
+    context.Fail = False
+    history.append(Message("user", "next"))
+
+    assert summarizer.Apply(history)[0]["content"].endswith("summary 1")
+
+
+def test_summary_is_dropped_when_covered_messages_change():
+    summarizer = Make(FakeContext())
+    history = MessageHistory(Turns(8))
+    summarizer.Apply(history)
+
+    del history[:2]
+
+    assert summarizer.Apply(history) is history.Wire()
+    assert summarizer.Summary is None
+
+    other = MessageHistory(Turns(3))
+
+    assert summarizer.Apply(other) is other.Wire()
+
+
+def test_contexts_send_the_summarized_history():
+    context = FakeContext()
+    context.Summarizer = Make(FakeContext())
+    context.Messages = Turns(8)
+
+    context.Prompt(Message("user", "question")).Run()
+
+    assert context.Sent[-1][0]["content"].endswith("summary 1")
+    assert context.Sent[-1][-1] == {"role": "user", "content": "question"}
+    assert len(context.Messages) == 10
+
+    # Spawned contexts get a summarizer of their own
+    spawned = context.Spawn()
+
+    assert spawned.Summarizer is not context.Summarizer
+    assert spawned.Summarizer.Summary is None and spawned.Summarizer.Threshold == 100
+
+
+def test_summarizers_share_their_threads():
+    context = FakeContext()
+    # Kept alive like the summarizers of spawned contexts still in use
+    summarizers = [Make(context.Spawn(), background=True) for _ in range(20)]
+
+    for summarizer in summarizers:
+        summarizer.Apply(MessageHistory(Turns(8)))
+        summarizer.Wait()
+
+    assert len([thread for thread in threading.enumerate() if thread.name.startswith("summarizer")]) <= 4
@@ -0,0 +1,68 @@
+import pytest
+
+from tinytune.prompt import prompt_job
+from tinytune.tool import Checker, ToolRegistry, TypeSchema
+
+
+def test_variable_length_tuple():
+    schema = TypeSchema(tuple[int, ...])
+
+    assert schema == {"type": "array", "items": {"type": "integer"}}
+
+    check = Checker(schema)
+
+    assert check([]) and check([1, 2, 3])
+    assert not check([1, "2"])
+
+
+def test_fixed_length_tuple():
+    schema = TypeSchema(tuple[int, str])
+
+    assert schema == {"type": "array", "prefixItems": [{"type": "integer"}, {"type": "string"}], "minItems": 2, "maxItems": 2}
+
+    check = Checker(schema)
+
+    assert check([1, "a"])
+    assert not check([1, 2])
+    assert not check([1])
+    assert not check([1, "a", "b"])
+
+
+def test_homogeneous_containers():
+    assert TypeSchema(list[str]) == {"type": "array", "items": {"type": "string"}}
+    assert TypeSchema(set[int]) == {"type": "array", "items": {"type": "integer"}}
+    assert TypeSchema(tuple) == {"type": "array"}
+
+
+def test_var_keyword_accepts_extra_arguments():
+    registry = ToolRegistry()
+
+    def search(query: str, **filters):
+        return query, filters
+
+    def lookup(query: str):
+        return query
+
+    registry.Register(search)
+    registry.Register(lookup)
+
+    assert registry.Dispatch("search", {"query": "q", "year": 2024}) == ("q", {"year": 2024})
+
+    with pytest.raises(ValueError):
+        registry.Dispatch("lookup", {"query": "q", "year": 2024})
+
+    with pytest.raises(ValueError):
+        registry.Dispatch("search", {"query": 1})
+
+
+def test_job_ids_are_sanitized():
+    registry = ToolRegistry()
+
+    @prompt_job(id="summarize text.v2")
+    def summarize(id, context, prevResult, text: str):
+        return text
+
+    assert registry.Register(summarize).Name == "summarize_text_v2"
+
+    with pytest.raises(ValueError, match="Invalid tool name"):
+        registry.Register(summarize, name="summarize text")
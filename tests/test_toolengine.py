@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+import time
+
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall, ChoiceDeltaToolCallFunction
+from openai.types.chat.chat_completion_message_tool_call import Function
+
+from tinytune.toolengine import ToolEngine
+
+
+def Call(id: str, name: str, arguments: dict | str) -> dict:
+    return {"id": id, "type": "function", "function": {"name": name, "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments)}}
+
+
+class Tracker:
+    """
+    Counts how many tool calls run at once.
+    """
+    def __init__(self):
+        self.Lock: threading.Lock = threading.Lock()
+        self.Running: int = 0
+        self.Peak: int = 0
+        self.Order: list[str] = []
+
+    def Enter(self, name: str):
+        with self.Lock:
+            self.Running += 1
+            self.Peak = max(self.Peak, self.Running)
+            self.Order.append(name)
+
+    def Exit(self):
+        with self.Lock:
+            self.Running -= 1
+
+
+def Engine(tracker: Tracker, **kwargs) -> ToolEngine:
+    def wait(name: str, seconds: float) -> str:
+        """Wait, then answer with the name."""
+        tracker.Enter(name)
+        time.sleep(seconds)
+        tracker.Exit()
+
+        return name
+
+    async def pause(name: str, seconds: float) -> dict:
+        """Wait on the event loop, then answer with the name."""
+        tracker.Enter(name)
+        await asyncio.sleep(seconds)
+        tracker.Exit()
+
+        return {"name": name}
+
+    def fail(reason: str) -> str:
+        """Always fail."""
+        raise RuntimeError(reason)
+
+    return ToolEngine([wait, pause, fail], **kwargs)
+
+
+def test_read_calls():
+    message = ChatCompletionMessage(
+        role="assistant",
+        content=None,
+        tool_calls=[
+            ChatCompletionMessageToolCall(id="a", type="function", function=Function(name="wait", arguments='{"name": "x"}')),
+            ChatCompletionMessageToolCall(id="b", type="function", function=Function(name="fail", arguments="{}")),
+        ],
+    )
+
+    assert ToolEngine.ReadCalls(message) == [Call("a", "wait", '{"name": "x"}'), Call("b", "fail", "{}")]
+    assert ToolEngine.ReadCalls(ChatCompletionMessage(role="assistant", content="no tools")) == []
+
+
+def test_accumulate_streamed_fragments():
+    def Fragment(index: int, id: str | None = None, name: str | None = None, arguments: str | None = None) -> ChoiceDeltaToolCall:
+        return ChoiceDeltaToolCall(index=index, id=id, type="function" if id else None, function=ChoiceDeltaToolCallFunction(name=name, arguments=arguments))
+
+    chunks = [
+        [Fragment(0, "a", "wait", "")],
+        [Fragment(0, arguments='{"name": '), Fragment(1, "b", "pause")],
+        [Fragment(1, arguments='{"name": "y", ')],
+        [Fragment(0, arguments='"x", "seconds": 0}'), Fragment(1, arguments='"seconds": 0}')],
+        [ChoiceDeltaToolCall(index=1)],
+    ]
+    calls: dict[int, dict] = {}
+
+    for chunk in chunks:
+        ToolEngine.Accumulate(calls, chunk)
+
+    assert [calls[index] for index in sorted(calls)] == [
+        Call("a", "wait", '{"name": "x", "seconds": 0}'),
+        Call("b", "pause", '{"name": "y", "seconds": 0}'),
+    ]
+
+
+def test_execute_keeps_call_order():
+    tracker = Tracker()
+    engine = Engine(tracker)
+    calls = [Call(str(index), "wait", {"name": str(index), "seconds": 0.05 * (4 - index)}) for index in range(4)]
+    started = time.monotonic()
+
+    results = engine.Execute(calls)
+
+    # The calls ran concurrently, and the results come back in the order of the calls
+    assert time.monotonic() - started < 0.4
+    assert tracker.Peak == 4
+    assert results == [{"role": "tool", "tool_call_id": str(index), "content": str(index)} for index in range(4)]
+
+
+def test_execute_is_bounded_by_max_workers():
+    tracker = Tracker()
+    engine = Engine(tracker, maxWorkers=2)
+
+    results = engine.Execute([Call(str(index), "wait", {"name": str(index), "seconds": 0.02}) for index in range(6)])
+
+    assert tracker.Peak == 2
+    assert [result["content"] for result in results] == [str(index) for index in range(6)]
+
+
+def test_sequential_execution():
+    tracker = Tracker()
+    engine = Engine(tracker, parallel=False)
+
+    engine.Execute([Call(str(index), "wait", {"name": str(index), "seconds": 0}) for index in range(3)])
+    asyncio.run(engine.ExecuteAsync([Call(str(index), "pause", {"name": str(index), "seconds": 0}) for index in range(3, 6)]))
+
+    assert tracker.Peak == 1
+    assert tracker.Order == [str(index) for index in range(6)]
+
+
+def test_errors_are_reported_to_the_model():
+    engine = Engine(Tracker())
+    calls = [
+        Call("a", "wait", {"name": "ok", "seconds": 0}),
+        Call("b", "wait", "{not json"),
+        Call("c", "wait", "[1]"),
+        Call("d", "missing", {}),
+        Call("e", "wait", {"name": 1, "seconds": 0}),
+        Call("f", "fail", {"reason": "broken"}),
+    ]
+
+    for results in (engine.Execute(calls), asyncio.run(engine.ExecuteAsync(calls))):
+        contents = [result["content"] for result in results]
+
+        assert [result["tool_call_id"] for result in results] == ["a", "b", "c", "d", "e", "f"]
+        assert contents[0] == "ok"
+        assert contents[1].startswith("Error: invalid JSON arguments")
+        assert contents[2] == "Error: arguments must be a JSON object."
+        assert contents[3] == 'Error: Unknown tool "missing".'
+        assert contents[4].startswith("Error:")
+        assert contents[5] == "Error: RuntimeError: broken"
+
+    assert engine.Stats() == {"calls": 12, "errors": 10}
+
+
+def test_execute_async():
+    tracker = Tracker()
+    engine = Engine(tracker, maxWorkers=3)
+    calls = [Call(str(index), "pause", {"name": str(index), "seconds": 0.05}) for index in range(6)]
+    calls.append(Call("blocking", "wait", {"name": "blocking", "seconds": 0.05}))
+
+    async def Main():
+        ticks = 0
+        task = asyncio.create_task(engine.ExecuteAsync(calls))
+
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+        return await task, ticks
+
+    results, ticks = asyncio.run(Main())
+
+    assert [result["content"] for result in results] == [json.dumps({"name": str(index)}) for index in range(6)] + ["blocking"]
+    assert tracker.Peak == 3
+    # Blocking tools run on a worker thread, so the loop kept running
+    assert ticks >= 10
+
+
+def test_coroutine_tools_run_from_sync_execute():
+    engine = Engine(Tracker())
+
+    assert engine.Execute([Call("a", "pause", {"name": "x", "seconds": 0})])[0]["content"] == '{"name": "x"}'
+
+
+def test_engines_share_their_threads():
+    engines = [Engine(Tracker()) for _ in range(20)]
+
+    for engine in engines:
+        engine.Execute([Call(str(index), "wait", {"name": str(index), "seconds": 0}) for index in range(4)])
+
+    assert len([thread for thread in threading.enumerate() if thread.name.startswith("tool")]) <= 32
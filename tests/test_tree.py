@@ -0,0 +1,181 @@
+import pytest
+
+from tinytune.llmcontext import LLMContext, Message, MessageHistory, Model, SerializeMessage
+from tinytune.tree import MessageNode, MessageTree
+
+
+def Messages(count: int = 5) -> list[Message]:
+    return [Message("user", f"message {i}") for i in range(count)]
+
+
+def Expected(messages: list) -> list[dict]:
+    return [dict(SerializeMessage(message)) for message in messages]
+
+
+def AssertMatches(tree: MessageTree, messages: list):
+    assert tree[:] == messages
+    assert tree.Wire() == Expected(messages)
+    assert tree.Digest() == MessageHistory(messages).Digest()
+
+
+def test_digest_matches_message_history():
+    messages = [*Messages(3), {"role": "assistant", "content": "dict", "name": "x"}]
+    tree = MessageTree(messages)
+
+    AssertMatches(tree, messages)
+    assert MessageTree().Digest() == MessageHistory().Digest() == ""
+
+
+def test_forks_share_their_prefix():
+    tree = MessageTree(Messages(3))
+
+    assert tree.PrefixKey() is None
+
+    fork = tree.Fork()
+
+    assert all(fork.Node(index) is tree.Node(index) for index in range(3))
+    assert fork.PrefixKey() == tree.PrefixKey() == tree.Digest()
+
+    tree.append(Message("assistant", "original"))
+    fork.append(Message("assistant", "fork"))
+
+    assert tree[-1].Content == "original" and fork[-1].Content == "fork"
+    assert len(tree) == len(fork) == 4
+    assert fork.Node(2) is tree.Node(2)
+
+    # Forks of forks share the prefix of the first fork
+    assert fork.Fork().PrefixKey() == tree.PrefixKey()
+    AssertMatches(fork, [*tree[:3], fork[-1]])
+
+
+def test_ancestor_jumps():
+    node = None
+    nodes = []
+
+    for index in range(1000):
+        node = MessageNode({"role": "user", "content": str(index)}, node)
+        nodes.append(node)
+
+    for head in (nodes[-1], nodes[500], nodes[63]):
+        for depth in range(1, head.Depth + 1):
+            assert head.Ancestor(depth) is nodes[depth - 1]
+
+        assert head.Ancestor(0) is nodes[0]
+
+    def Steps(node: MessageNode, depth: int) -> int:
+        steps = 0
+
+        while node.Depth > depth:
+            node = node.Jump if node.Jump is not None and node.Jump.Depth >= depth else node.Parent
+            steps += 1
+
+        return steps
+
+    # Reaching any ancestor takes a logarithmic number of hops
+    assert max(Steps(nodes[-1], depth) for depth in range(1, 1001)) <= 3 * 10
+
+
+@pytest.mark.parametrize("index", [slice(1, 3), slice(3, None), slice(0, 0), slice(5, 5), slice(None, None, 2), slice(4, 0, -3)])
+def test_slice_set(index):
+    messages = Messages()
+    shared = list(messages)
+    tree = MessageTree(messages)
+    fork = tree.Fork()
+    replacement = [Message("assistant", f"new {i}") for i in range(len(range(*index.indices(5))) if index.step else 3)]
+
+    tree[index] = replacement
+    messages[index] = replacement
+
+    AssertMatches(tree, messages)
+    # The fork keeps the messages it shared
+    AssertMatches(fork, shared)
+
+
+@pytest.mark.parametrize("index", [slice(1, 3), slice(3, None), slice(-2, None), slice(2, 2), slice(None, None), slice(None, None, 2)])
+def test_slice_delete(index):
+    messages = Messages()
+    tree = MessageTree(messages)
+    tree.Wire()
+
+    del tree[index]
+    del messages[index]
+
+    AssertMatches(tree, messages)
+
+
+def test_single_item_edits():
+    messages = Messages()
+    tree = MessageTree(messages)
+
+    tree[1] = Message("assistant", "replaced")
+    messages[1] = tree[1]
+    del tree[-1]
+    del messages[-1]
+    tree.insert(0, Message("system", "first"))
+    messages.insert(0, tree[0])
+
+    AssertMatches(tree, messages)
+    assert tree.pop().Content == "message 3"
+    assert len(tree) == 4
+
+
+def test_prefix_key_follows_edits_before_the_fork():
+    tree = MessageTree(Messages(3))
+    fork = tree.Fork()
+    key = tree.PrefixKey()
+
+    tree.append(Message("assistant", "later"))
+    tree[3] = Message("assistant", "changed later")
+
+    # Changes after the fork point keep the shared prefix
+    assert tree.PrefixKey() == key
+
+    del tree[1]
+
+    assert tree.PrefixKey() is None
+    assert fork.PrefixKey() == key
+
+
+def test_in_place_edits_are_followed():
+    messages = Messages(3)
+    tree = MessageTree(messages)
+    fork = tree.Fork()
+    key = tree.PrefixKey()
+    tree.Wire()
+    fork.Wire()
+
+    messages[2].Content = "edited"
+
+    AssertMatches(tree, messages)
+    AssertMatches(fork, messages)
+    assert tree.PrefixKey() is None
+
+    tree.append(Message("user", "after"))
+    messages[0].Content = "edited first"
+
+    assert tree.Digest() == MessageHistory([*messages, tree[-1]]).Digest()
+    assert key != fork.PrefixKey()
+
+
+def test_edited_dictionaries_keep_a_consistent_snapshot():
+    message = {"role": "user", "content": "original"}
+    tree = MessageTree([message])
+    digest = tree.Digest()
+
+    message["content"] = "edited"
+
+    # Dictionaries aren't watched, but what is sent always matches the digest
+    assert tree.Wire() == [{"role": "user", "content": "original"}]
+    assert tree.Digest() == digest
+
+
+def test_context_fork():
+    context = LLMContext(Model("test", "test"))
+    context.Messages = Messages(3)
+
+    fork = context.Fork()
+    fork.Messages.append(Message("assistant", "fork"))
+
+    assert isinstance(context.Messages, MessageTree)
+    assert len(context.Messages) == 3 and len(fork.Messages) == 4
+    assert context.PrefixKey() == fork.PrefixKey() == context.Messages.Digest()
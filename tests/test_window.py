@@ -0,0 +1,154 @@
+import random
+
+import pytest
+
+from tinytune.llmcontext import Message, MessageHistory
+from tinytune.window import ContextWindow, MessageOverhead
+
+
+def Window(maxTokens: int, **kwargs) -> ContextWindow:
+    # One token per character, so budgets can be worked out by hand
+    return ContextWindow(maxTokens, tokenizer=len, **kwargs)
+
+
+def User(content: str) -> dict:
+    return {"role": "user", "content": content}
+
+
+def System(content: str) -> dict:
+    return {"role": "system", "content": content}
+
+
+def Cost(*messages: dict) -> int:
+    return sum(len(message["content"]) + MessageOverhead for message in messages)
+
+
+def Reference(wire: list[dict], budget: int) -> list[dict]:
+    # Tries every cut, instead of searching the running sums
+    pinned = [index for index, message in enumerate(wire) if message["role"] == "system"]
+    budget -= Cost(*[wire[index] for index in pinned])
+
+    for cut in range(len(wire)):
+        if Cost(*[message for index, message in enumerate(wire[cut:], cut) if index not in pinned]) <= budget:
+            return [wire[index] for index in pinned if index < cut] + wire[cut:]
+
+    raise AssertionError("nothing fits")
+
+
+def test_history_that_fits_is_sent_as_is():
+    history = MessageHistory([User("a" * 6), User("b" * 6)])
+
+    assert Window(Cost(*history)).Apply(history) is history.Wire()
+
+
+def test_cut_boundaries():
+    history = MessageHistory([User("a" * 6), User("b" * 6), User("c" * 6)])
+    total = Cost(*history)
+
+    # One token over drops the oldest message, as does one token short of keeping two
+    assert Window(total - 1).Apply(history) == history[1:]
+    assert Window(Cost(*history[1:])).Apply(history) == history[1:]
+    assert Window(Cost(*history[1:]) - 1).Apply(history) == history[2:]
+    assert Window(Cost(history[2])).Apply(history) == history[2:]
+
+    with pytest.raises(Exception):
+        Window(Cost(history[2]) - 1).Apply(history)
+
+
+def test_reserve_is_kept_free():
+    history = MessageHistory([User("a" * 6), User("b" * 6)])
+
+    assert Window(Cost(*history) + 5, reserve=5).Apply(history) == history
+    assert Window(Cost(*history) + 5, reserve=6).Apply(history) == history[1:]
+
+
+def test_cut_matches_reference():
+    generator = random.Random(0)
+    wire = [
+        System("s" * generator.randint(0, 10)) if generator.random() < 0.2 else User("u" * generator.randint(0, 30))
+        for _ in range(40)
+    ]
+    wire.append(User("last"))
+    history = MessageHistory(wire)
+    pinned = Cost(*[message for message in wire if message["role"] == "system"])
+
+    for budget in range(pinned + Cost(wire[-1]), Cost(*wire) + 2):
+        assert Window(budget).Apply(history) == Reference(wire, budget), budget
+
+
+def test_pinned_system_messages_are_kept():
+    history = MessageHistory([System("rules"), User("a" * 20), System("more rules"), User("b" * 20), User("c")])
+    budget = Cost(history[0], history[2], history[4])
+
+    assert Window(budget).Apply(history) == [history[0], history[2], history[4]]
+    assert Window(budget + Cost(history[3])).Apply(history) == [history[0], history[2], history[3], history[4]]
+
+    # Unpinned, system messages are dropped like any other
+    assert Window(Cost(history[4]), pinSystem=False).Apply(history) == [history[4]]
+
+
+def test_pinned_message_after_the_cut():
+    history = MessageHistory([User("a" * 20), User("b"), System("late rules")])
+
+    assert Window(Cost(history[1], history[2])).Apply(history) == history[1:]
+    # Only the pinned message fits, and it is the latest one
+    assert Window(Cost(history[2])).Apply(history) == [history[2]]
+
+
+def test_pinned_message_that_alone_exceeds_the_budget():
+    history = MessageHistory([System("s" * 40), User("hi")])
+
+    with pytest.raises(Exception):
+        Window(Cost(history[0]) - 1).Apply(history)
+
+    # Exactly filled by the pinned message, there is no room left for the latest one
+    with pytest.raises(Exception):
+        Window(Cost(history[0])).Apply(history)
+
+    assert Window(Cost(*history)).Apply(history) == history
+
+
+def test_truncate_keeps_the_end_of_the_boundary_message():
+    history = MessageHistory([System("rules"), User("0123456789"), User("abc")])
+    budget = Cost(history[0], history[2]) + MessageOverhead + 4
+
+    messages = Window(budget, policy="truncate").Apply(history)
+
+    assert messages == [history[0], User("6789"), history[2]]
+    assert Cost(*messages) == budget
+
+    # Nothing is kept of a message when only its overhead would fit
+    assert Window(budget - 4, policy="truncate").Apply(history) == [history[0], history[2]]
+    assert Window(budget, policy="sliding").Apply(history) == [history[0], history[2]]
+
+
+def test_counts_are_kept_up_to_date():
+    calls = []
+
+    def Tokenizer(text: str) -> int:
+        calls.append(text)
+        return len(text)
+
+    window = ContextWindow(1000, tokenizer=Tokenizer)
+    history = MessageHistory([Message("user", "a"), Message("assistant", "b")])
+
+    assert window.Tokens(history) == Cost(User("a"), User("b"))
+
+    history.append(Message("user", "c"))
+    window.Tokens(history)
+
+    # Only the appended message was counted
+    assert calls == ["a", "b", "c"]
+
+    history[0].Content = "edited"
+
+    assert window.Tokens(history) == Cost(User("edited"), User("b"), User("c"))
+
+    del history[1]
+
+    assert window.Tokens(history) == Cost(User("edited"), User("c"))
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        ContextWindow(100, policy="summarize")